@@ -20,11 +20,14 @@ gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
 from gi.repository import Gdk
 
+import os.path
 import sys
 
 import workspace.workspace_viewgtk as view
 from workspace.workspace import Workspace
 from app.service_locator import ServiceLocator
+from app.automation_server import AutomationServer
+import helpers.metrics as metrics
 
 
 class MainApplicationController(Gtk.Application):
@@ -38,6 +41,9 @@ class MainApplicationController(Gtk.Application):
         # load settings
         self.settings = ServiceLocator.get_settings()
 
+        metrics.set_log_level(self.settings.get_value('metrics', 'log_level'))
+        metrics.registry.start_snapshots(os.path.expanduser('~') + '/.porto/metrics', self.settings.get_value('metrics', 'snapshot_interval'))
+
         # init view
         self.main_window = view.MainWindow(self)
         ServiceLocator.init_main_window(self.main_window)
@@ -56,9 +62,26 @@ class MainApplicationController(Gtk.Application):
         # controllers
         self.main_window.quit_action.connect('activate', self.on_quit_action)
 
+        self.automation_server = AutomationServer(self.workspace, os.path.expanduser('~') + '/.porto/automation.sock')
+        self.update_automation_server()
+        self.settings.register_observer(self)
+
         # watch changes in view
         self.observe_main_window()
 
+    def change_notification(self, change_code, notifying_object, parameter):
+
+        if change_code == 'settings_changed':
+            section, item, value = parameter
+            if (section, item) == ('preferences', 'automation_socket'):
+                self.update_automation_server()
+
+    def update_automation_server(self):
+        if self.settings.get_value('preferences', 'automation_socket'):
+            self.automation_server.start()
+        else:
+            self.automation_server.stop()
+
     def observe_main_window(self):
         self.main_window.connect('size-allocate', self.on_window_size_allocate)
         self.main_window.connect('window-state-event', self.on_window_state_event)
@@ -102,8 +125,19 @@ class MainApplicationController(Gtk.Application):
         active_notebook = self.workspace.get_active_notebook()
 
         if len(notebooks) == 0 or active_notebook == None or ServiceLocator.get_dialog('close_confirmation').run(notebooks)['all_save_to_close']: 
+            detach = False
+            number_of_kernels = self.workspace.get_number_of_detachable_kernels()
+            if number_of_kernels > 0:
+                response = ServiceLocator.get_dialog('detach_kernels').run(number_of_kernels)
+                if response == None: return
+                detach = (response == 'detach')
+
             self.save_window_state()
-            self.workspace.shutdown_all_kernels()
+            # kernels may take a moment to go down, don't leave a frozen window
+            self.main_window.hide()
+            self.workspace.shutdown_all_kernels(detach)
+            metrics.registry.stop_snapshots(write_last=True)
+            self.automation_server.stop()
             self.quit()
 
     def do_startup(self):
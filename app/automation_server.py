@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GLib, Gio
+
+import json
+import os
+import os.path
+import time
+
+import helpers.metrics as metrics
+import notebook.notebook as model_notebook
+
+
+class AutomationError(Exception):
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+
+
+class AutomationServer():
+    ''' JSON-RPC 2.0 on a Unix domain socket, one request or response per
+        line, for driving Porto from scripts. Requests are handled in the
+        main loop like any other event. Notebooks are named by pathname.
+
+        notebook.wait_idle answers once the notebook has no busy cells, no
+        batch running and a running kernel, other methods answer right
+        away. The socket is only accessible by the user. '''
+
+    def __init__(self, workspace, pathname):
+        self.workspace = workspace
+        self.pathname = pathname
+        self.service = None
+        self.connections = set()
+        self.logger = metrics.get_logger('automation')
+        self.requests_counter = metrics.counter('automation', 'requests')
+
+        self.methods = {
+            'workspace.list': self.list_notebooks,
+            'workspace.open': self.open_notebook,
+            'notebook.status': self.get_status,
+            'notebook.evaluate': self.evaluate,
+            'notebook.stop': self.stop_evaluation,
+            'notebook.wait_idle': self.wait_idle,
+            'notebook.save': self.save,
+            'notebook.close': self.close,
+            'notebook.restart_kernel': self.restart_kernel,
+            'notebook.timings': self.get_timings,
+            'metrics.snapshot': self.get_metrics
+        }
+
+    def start(self):
+        ''' without a socket, e.g. if a stale one can't be removed, the
+            server just stays off. '''
+
+        if self.service != None: return
+
+        service = Gio.SocketService()
+        address = Gio.UnixSocketAddress.new(self.pathname)
+
+        # the socket is created with mode 0600, never connectable by others
+        old_umask = os.umask(0o077)
+        try:
+            os.makedirs(os.path.dirname(self.pathname), exist_ok=True)
+            if os.path.exists(self.pathname):
+                os.remove(self.pathname)
+            service.add_address(address, Gio.SocketType.STREAM, Gio.SocketProtocol.DEFAULT, None)
+        except (OSError, GLib.Error) as e:
+            self.logger.warning('automation server disabled, could not listen on %s: %s', self.pathname, e)
+            return
+        finally:
+            os.umask(old_umask)
+
+        self.service = service
+        self.service.connect('incoming', self.on_incoming)
+        self.service.start()
+        self.logger.info('listening on %s', self.pathname)
+
+    def stop(self):
+        if self.service == None: return
+
+        self.service.stop()
+        self.service.close()
+        self.service = None
+        for connection in list(self.connections):
+            connection.close(None)
+        self.connections = set()
+        if os.path.exists(self.pathname):
+            os.remove(self.pathname)
+
+    def on_incoming(self, service, connection, source_object):
+        self.connections.add(connection)
+        input_stream = Gio.DataInputStream.new(connection.get_input_stream())
+        input_stream.read_line_async(GLib.PRIORITY_DEFAULT, None, self.on_line, connection)
+        return True
+
+    def on_line(self, input_stream, task, connection):
+        try: line, length = input_stream.read_line_finish_utf8(task)
+        except GLib.Error: line = None
+        if line == None:
+            self.connections.discard(connection)
+            connection.close(None)
+            return
+
+        if line.strip() != '':
+            self.handle_line(connection, line)
+        input_stream.read_line_async(GLib.PRIORITY_DEFAULT, None, self.on_line, connection)
+
+    def handle_line(self, connection, line):
+        self.requests_counter.inc()
+        try: request = json.loads(line)
+        except ValueError:
+            self.send_error(connection, None, -32700, 'parse error')
+            return
+        if not isinstance(request, dict) or not isinstance(request.get('method', None), str):
+            self.send_error(connection, None, -32600, 'invalid request')
+            return
+
+        request_id = request.get('id', None)
+        method = self.methods.get(request['method'], None)
+        if method == None:
+            self.send_error(connection, request_id, -32601, 'method not found: ' + request['method'])
+            return
+
+        params = request.get('params', dict())
+        if not isinstance(params, dict):
+            self.send_error(connection, request_id, -32602, 'params have to be an object')
+            return
+
+        # methods call respond with the result or raise AutomationError.
+        # methods answering later call respond(error=...) instead of raising.
+        def respond(result=None, error=None):
+            if error != None:
+                self.send_error(connection, request_id, error.code, error.message)
+            elif request_id != None:
+                self.send(connection, {'jsonrpc': '2.0', 'id': request_id, 'result': result})
+
+        try:
+            method(params, respond)
+        except AutomationError as e:
+            respond(error=e)
+        except Exception as e:
+            self.logger.exception('request %s failed', request_id)
+            self.send_error(connection, request_id, -32603, 'internal error: ' + str(e))
+
+    def send_error(self, connection, request_id, code, message):
+        self.logger.info('request %s failed: %s', request_id, message)
+        self.send(connection, {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}})
+
+    def send(self, connection, response):
+        if connection not in self.connections: return
+        try:
+            connection.get_output_stream().write_all((json.dumps(response) + '\n').encode('utf-8'), None)
+        except GLib.Error as e:
+            self.logger.info('could not send response: %s', e.message)
+            self.connections.discard(connection)
+            connection.close(None)
+
+    def get_notebook(self, params):
+        if not isinstance(params.get('pathname', None), str):
+            raise AutomationError(-32602, 'pathname missing')
+        notebook = self.workspace.get_notebook_by_pathname(os.path.abspath(params['pathname']))
+        if notebook == None:
+            raise AutomationError(-32000, 'notebook not open: ' + params['pathname'])
+        return notebook
+
+    def get_notebook_status(self, notebook):
+        return {
+            'pathname': notebook.get_pathname(),
+            'kernelname': notebook.get_kernelname(),
+            'kernel_state': notebook.get_kernel_state(),
+            'save_state': notebook.get_save_state(),
+            'cells': notebook.get_cell_count(),
+            'busy_cells': notebook.get_busy_cell_count(),
+            'queue_depth': notebook.get_queue_depth(),
+            'batch_progress': notebook.get_batch_progress(),
+            'output_counters': notebook.get_output_counters()
+        }
+
+    def is_idle(self, notebook):
+        return notebook.get_busy_cell_count() == 0 and notebook.get_batch_progress() == None and notebook.get_kernel_state() == 'running'
+
+    def list_notebooks(self, params, respond):
+        active_notebook = self.workspace.get_active_notebook()
+        active_pathname = active_notebook.get_pathname() if active_notebook != None else None
+        respond({'active': active_pathname, 'notebooks': [self.get_notebook_status(notebook) for notebook in self.workspace.open_notebooks]})
+
+    def open_notebook(self, params, respond):
+        if not isinstance(params.get('pathname', None), str):
+            raise AutomationError(-32602, 'pathname missing')
+        pathname = os.path.abspath(params['pathname'])
+        try:
+            notebook = self.workspace.controller.open_notebook(pathname)
+        except FileNotFoundError:
+            raise AutomationError(-32000, 'no such file: ' + pathname)
+        except model_notebook.KernelMissing as e:
+            raise AutomationError(-32000, 'kernel missing: ' + str(e))
+        if notebook == None:
+            raise AutomationError(-32000, 'not a notebook: ' + pathname)
+        respond(self.get_notebook_status(notebook))
+
+    def get_status(self, params, respond):
+        respond(self.get_notebook_status(self.get_notebook(params)))
+
+    def evaluate(self, params, respond):
+        ''' cells is 'all' (default) or 'stale'. '''
+
+        notebook = self.get_notebook(params)
+        cells = params.get('cells', 'all')
+        if cells == 'all':
+            notebook.evaluate_all_cells()
+        elif cells == 'stale':
+            notebook.evaluate_stale_cells()
+        else:
+            raise AutomationError(-32602, 'cells has to be "all" or "stale"')
+        respond(self.get_notebook_status(notebook))
+
+    def stop_evaluation(self, params, respond):
+        self.get_notebook(params).stop_evaluation()
+        respond(True)
+
+    def wait_idle(self, params, respond):
+        ''' answers with the status and the seconds waited, or an error
+            after timeout seconds (default 600). '''
+
+        notebook = self.get_notebook(params)
+        timeout = params.get('timeout', 600)
+        if not isinstance(timeout, (int, float)):
+            raise AutomationError(-32602, 'timeout has to be a number')
+        start_time = time.time()
+
+        def check():
+            if notebook not in self.workspace.open_notebooks:
+                respond(error=AutomationError(-32000, 'notebook closed: ' + notebook.get_pathname()))
+            elif self.is_idle(notebook):
+                status = self.get_notebook_status(notebook)
+                status['waited'] = time.time() - start_time
+                respond(status)
+            elif time.time() - start_time > timeout:
+                respond(error=AutomationError(-32001, 'timeout waiting for ' + notebook.get_pathname()))
+            else:
+                return True
+            return False
+
+        GLib.timeout_add(50, check)
+
+    def save(self, params, respond):
+        notebook = self.get_notebook(params)
+        notebook.save_to_disk()
+        respond(self.get_notebook_status(notebook))
+
+    def close(self, params, respond):
+        ''' closes without asking, unsaved changes are lost. '''
+
+        notebook = self.get_notebook(params)
+        self.workspace.controller.close_notebook(notebook)
+        respond(True)
+
+    def restart_kernel(self, params, respond):
+        notebook = self.get_notebook(params)
+        notebook.restart_kernel()
+        respond(self.get_notebook_status(notebook))
+
+    def get_timings(self, params, respond):
+        ''' latency histograms and per query phase durations, see
+            ExecutionStats. '''
+
+        execution_stats = self.get_notebook(params).get_execution_stats()
+        queries = list()
+        for query in execution_stats.queries:
+            phases = dict(execution_stats.get_phase_durations(query))
+            queries.append({'label': query.get_label(), 'lane': query.lane, 'phases': phases})
+        respond({'histograms_ms': execution_stats.get_histograms(), 'queries': queries})
+
+    def get_metrics(self, params, respond):
+        respond(metrics.registry.get_snapshot())
+
+
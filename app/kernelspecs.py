@@ -113,6 +113,12 @@ class Kernelspecs():
     def is_installed(self, name):
         return name in self.installed_kernels
 
+    def get_language(self, name):
+        if self.is_installed(name):
+            return self.installed_kernels[name].language
+        else:
+            return None
+
     def get_icon_from_filename(self, filename):
         return Gtk.Image.new_from_file(filename)
 
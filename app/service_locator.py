@@ -17,16 +17,26 @@
 
 import app.settings as settingscontroller
 import app.kernelspecs as kernelspecs
+import app.watchdog as watchdog
+import notebook.backend.kernel as kernel
+import notebook.backend.kernel_pool as kernel_pool
+import notebook.backend.detached_kernels as detached_kernels
+import notebook.backend.output_store as output_store
 import result_factory.result_factory as result_factory
 
 import dialogs.about.about as about_dialog
 import dialogs.close_confirmation.close_confirmation as close_confirmation_dialog
 import dialogs.create_notebook.create_notebook as create_notebook_dialog
 import dialogs.delete_notebook.delete_notebook as delete_notebook_dialog
+import dialogs.detach_kernels.detach_kernels as detach_kernels_dialog
+import dialogs.export_stalls.export_stalls as export_stalls_dialog
+import dialogs.export_trace.export_trace as export_trace_dialog
 import dialogs.keyboard_shortcuts.keyboard_shortcuts as keyboard_shortcuts_dialog
+import dialogs.namespace_report.namespace_report as namespace_report_dialog
 import dialogs.open_notebook.open_notebook as open_notebook_dialog
 import dialogs.overwrite_confirmation.overwrite_confirmation as overwrite_confirmation_dialog
 import dialogs.preferences.preferences as preferences_dialog
+import dialogs.restore_namespace.restore_namespace as restore_namespace_dialog
 import dialogs.save_as.save_as as save_as_dialog
 import dialogs.select_folder.select_folder as select_folder_dialog
 import dialogs.kernel_missing.kernel_missing as kernel_missing_dialog
@@ -41,6 +51,11 @@ class ServiceLocator(object):
     settings = None
     main_window = None
     kernelspecs = None
+    kernel_loop = None
+    kernel_pool = None
+    detached_kernels = None
+    output_store = None
+    watchdog = None
     result_factory = None
     ansi_escape_regex = re.compile('\\x1B\[[0-9]*[;]*[0-9]*[;]*[0-9]*[;]*[0-9]*[;]*[0-9]*m')
     ipython_message_escape_regex = re.compile('<ipython-input-[0-9]*-[0-9a-f]*>, ')
@@ -56,8 +71,13 @@ class ServiceLocator(object):
         ServiceLocator.dialogs['create_notebook'] = create_notebook_dialog.CreateNotebookDialog(main_window, kernelspecs, ServiceLocator.dialogs['overwrite_confirmation'], ServiceLocator.dialogs['select_folder'])
         ServiceLocator.dialogs['save_as'] = save_as_dialog.SaveAsDialog(workspace, main_window, ServiceLocator.dialogs['overwrite_confirmation'], ServiceLocator.dialogs['select_folder'])
         ServiceLocator.dialogs['delete_notebook'] = delete_notebook_dialog.DeleteNotebookDialog(main_window)
+        ServiceLocator.dialogs['detach_kernels'] = detach_kernels_dialog.DetachKernelsDialog(main_window)
         ServiceLocator.dialogs['keyboard_shortcuts'] = keyboard_shortcuts_dialog.KeyboardShortcutsDialog(main_window)
         ServiceLocator.dialogs['open_notebook'] = open_notebook_dialog.OpenNotebookDialog(main_window)
+        ServiceLocator.dialogs['export_trace'] = export_trace_dialog.ExportTraceDialog(main_window)
+        ServiceLocator.dialogs['export_stalls'] = export_stalls_dialog.ExportStallsDialog(main_window)
+        ServiceLocator.dialogs['namespace_report'] = namespace_report_dialog.NamespaceReportDialog(main_window)
+        ServiceLocator.dialogs['restore_namespace'] = restore_namespace_dialog.RestoreNamespaceDialog(main_window)
         ServiceLocator.dialogs['preferences'] = preferences_dialog.PreferencesDialog(main_window, settings)
     
     def init_main_window(main_window):
@@ -74,6 +94,33 @@ class ServiceLocator(object):
             ServiceLocator.kernelspecs = kernelspecs.Kernelspecs()
         return ServiceLocator.kernelspecs
 
+    def get_kernel_loop():
+        if ServiceLocator.kernel_loop == None:
+            ServiceLocator.kernel_loop = kernel.KernelLoop()
+        return ServiceLocator.kernel_loop
+
+    def get_kernel_pool():
+        if ServiceLocator.kernel_pool == None:
+            ServiceLocator.kernel_pool = kernel_pool.KernelPool(ServiceLocator.get_kernel_loop(), ServiceLocator.get_settings(), ServiceLocator.get_kernelspecs())
+        return ServiceLocator.kernel_pool
+
+    def get_detached_kernels():
+        if ServiceLocator.detached_kernels == None:
+            ServiceLocator.detached_kernels = detached_kernels.DetachedKernels(ServiceLocator.get_kernel_loop(), ServiceLocator.get_settings())
+        return ServiceLocator.detached_kernels
+
+    def get_output_store():
+        if ServiceLocator.output_store == None:
+            pathname = os.path.expanduser('~') + '/.porto/output_cache'
+            ServiceLocator.output_store = output_store.OutputStore(pathname, ServiceLocator.get_settings().get_value('output', 'cache_max_size'))
+        return ServiceLocator.output_store
+
+    def get_watchdog():
+        if ServiceLocator.watchdog == None:
+            settings = ServiceLocator.get_settings()
+            ServiceLocator.watchdog = watchdog.Watchdog(settings.get_value('watchdog', 'threshold'), settings.get_value('watchdog', 'max_stalls'))
+        return ServiceLocator.watchdog
+
     def get_settings():
         if ServiceLocator.settings == None:
             ServiceLocator.settings = settingscontroller.Settings()
@@ -57,6 +57,63 @@ class Settings(Observable):
         
         self.defaults['preferences'] = dict()
         self.defaults['preferences']['pretty_print'] = True
+        self.defaults['preferences']['pipelined_execution'] = False
+        self.defaults['preferences']['pipeline_depth'] = 8
+        self.defaults['preferences']['stop_batch_on_error'] = True
+        self.defaults['preferences']['kernel_shutdown_timeout'] = 3
+
+        # detachable kernels can be left running on quit, kernels of
+        # notebooks not reopened within max_age days are shut down
+        self.defaults['preferences']['detachable_kernels'] = False
+        self.defaults['preferences']['detached_kernels_max_age'] = 7
+
+        # offer to restore a saved kernel namespace when a notebook is
+        # opened. restoring unpickles the snapshot, so it is never done
+        # without asking.
+        self.defaults['preferences']['restore_namespace_on_start'] = False
+
+        # main loop stalls longer than threshold seconds are recorded, the
+        # last max_stalls of them are kept
+        self.defaults['preferences']['stall_watchdog'] = False
+
+        # JSON-RPC for scripts on ~/.porto/automation.sock
+        self.defaults['preferences']['automation_socket'] = False
+        self.defaults['watchdog'] = dict()
+        self.defaults['watchdog']['threshold'] = 0.2
+        self.defaults['watchdog']['max_stalls'] = 100
+
+        # log_level is 'debug', 'info', 'warning', 'error' or 'off'. a
+        # snapshot of the metrics goes to ~/.porto/metrics/metrics.json
+        # every snapshot_interval seconds, 0 turns it off.
+        self.defaults['metrics'] = dict()
+        self.defaults['metrics']['log_level'] = 'warning'
+        self.defaults['metrics']['snapshot_interval'] = 60
+
+        # warm_up_code maps kernelspec names to code run before a pooled
+        # kernel is handed over, e.g. {'python3': 'import numpy'}
+        self.defaults['kernel_pool'] = dict()
+        self.defaults['kernel_pool']['size'] = 1
+        self.defaults['kernel_pool']['number_of_kernelspecs'] = 1
+        self.defaults['kernel_pool']['warm_up_code'] = dict()
+
+        # in characters. save_policy decides what happens to stream output
+        # longer than max_saved_length when saving: 'truncate' keeps head
+        # and tail, 'externalise' writes it to a file next to the notebook,
+        # 'keep' saves it as it is.
+        self.defaults['output'] = dict()
+        self.defaults['output']['max_memory_per_cell'] = 20000000
+        self.defaults['output']['save_policy'] = 'truncate'
+        self.defaults['output']['max_saved_length'] = 1000000
+
+        # stream output of a kernel past these rates is coalesced, past
+        # max_pending_bytes (per stream of a cell) dropped. 0 means no limit.
+        self.defaults['output']['max_messages_per_second'] = 500
+        self.defaults['output']['max_bytes_per_second'] = 1000000
+        self.defaults['output']['max_pending_bytes'] = 1000000
+
+        # outputs of cells marked for caching, in ~/.porto/output_cache.
+        # in bytes, least recently used outputs go first.
+        self.defaults['output']['cache_max_size'] = 500000000
         
     def get_value(self, section, item):
         try: value = self.data[section][item]
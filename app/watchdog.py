@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GLib
+
+import collections
+import json
+import os.path
+import sys
+import threading
+import time
+import traceback
+
+
+class Watchdog():
+    ''' Heartbeats the GLib main loop with a timeout. A thread checks that
+        the heartbeat comes in time, when it's late by more than threshold
+        seconds it takes the Python stack of the main thread and keeps it,
+        with the change codes being dispatched and the callback the main
+        loop entered (the signal handler, idle or timeout function), in a
+        ring buffer of the last max_stalls stalls. '''
+
+    def __init__(self, threshold=0.2, max_stalls=100):
+        self.threshold = threshold
+        self.interval = min(0.05, threshold / 2)
+        self.stalls = collections.deque(maxlen=max_stalls)
+
+        self.main_thread_id = threading.main_thread().ident
+        self.base_path = os.path.dirname(os.path.realpath(__file__ + '/..')) + '/'
+        self.lock = threading.Lock()
+        self.last_tick = time.monotonic()
+        self.current_stall = None
+
+        self.timeout_id = None
+        self.stop_event = None
+
+    def start(self):
+        if self.is_running(): return
+
+        self.last_tick = time.monotonic()
+        self.timeout_id = GLib.timeout_add(int(self.interval * 1000), self.on_tick)
+        self.stop_event = threading.Event()
+        thread = threading.Thread(target=self.watch, args=(self.stop_event,), name='porto-watchdog', daemon=True)
+        thread.start()
+
+    def stop(self):
+        if not self.is_running(): return
+
+        GLib.source_remove(self.timeout_id)
+        self.timeout_id = None
+        self.stop_event.set()
+        self.stop_event = None
+        with self.lock:
+            self.current_stall = None
+
+    def is_running(self):
+        return self.timeout_id != None
+
+    def on_tick(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.current_stall != None:
+                self.current_stall['duration'] = now - self.last_tick
+                self.current_stall = None
+            self.last_tick = now
+        return True
+
+    def watch(self, stop_event):
+        while not stop_event.wait(self.interval):
+            with self.lock:
+                if self.current_stall == None and time.monotonic() - self.last_tick > self.threshold:
+                    self.current_stall = self.capture()
+                    self.stalls.append(self.current_stall)
+
+    def capture(self):
+        ''' what the main thread is doing, called from the watchdog thread. '''
+
+        stall = {'time': time.time(), 'duration': None, 'entry': None, 'change_codes': list(), 'stack': list()}
+        frame = sys._current_frames().get(self.main_thread_id, None)
+        if frame == None: return stall
+
+        # the main loop is entered from __main__ through Gio, the first frame
+        # of ours after that is the callback it dispatched to
+        for frame_summary in traceback.extract_stack(frame):
+            location = frame_summary.filename + ':' + str(frame_summary.lineno) + ' in ' + frame_summary.name
+            stall['stack'].append(location)
+            is_ours = frame_summary.filename.startswith(self.base_path) and not frame_summary.filename.endswith('__main__.py')
+            if stall['entry'] == None and is_ours:
+                stall['entry'] = location
+
+        while frame != None:
+            if frame.f_code.co_name == 'add_change_code':
+                local_variables = frame.f_locals
+                notifying_object = local_variables.get('self', None)
+                stall['change_codes'].insert(0, type(notifying_object).__name__ + ': ' + str(local_variables.get('change_code', None)))
+            frame = frame.f_back
+        return stall
+
+    def get_stalls(self):
+        with self.lock:
+            return [dict(stall) for stall in self.stalls]
+
+    def write_stalls(self, pathname):
+        ''' stalls as JSON, oldest first. stalls still going on have no
+            duration yet. '''
+
+        with open(pathname, 'w') as f:
+            json.dump({'threshold': self.threshold, 'stalls': self.get_stalls()}, f, indent=1)
+
+
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+
+''' Runs notebooks end to end in a running Porto, through the automation
+    socket (Preferences, Diagnostics): opens each notebook, runs all
+    cells, waits until it's idle and prints the wall time with the
+    latency histograms Porto collected, then closes it without saving.
+
+    usage: python3 benchmarks/automation_run_all.py notebook.ipynb [...] '''
+
+import json
+import os.path
+import socket
+import sys
+import time
+
+
+class Client():
+
+    def __init__(self, pathname):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.connect(pathname)
+        self.file = self.socket.makefile('rw', encoding='utf-8')
+        self.request_id = 0
+
+    def call(self, method, **params):
+        self.request_id += 1
+        self.file.write(json.dumps({'jsonrpc': '2.0', 'id': self.request_id, 'method': method, 'params': params}) + '\n')
+        self.file.flush()
+        response = json.loads(self.file.readline())
+        if 'error' in response:
+            raise RuntimeError(method + ': ' + response['error']['message'])
+        return response['result']
+
+
+def run(client, pathname):
+    pathname = os.path.abspath(pathname)
+    client.call('workspace.open', pathname=pathname)
+    client.call('notebook.wait_idle', pathname=pathname)
+
+    start_time = time.time()
+    client.call('notebook.evaluate', pathname=pathname, cells='all')
+    status = client.call('notebook.wait_idle', pathname=pathname)
+    total_time = time.time() - start_time
+
+    timings = client.call('notebook.timings', pathname=pathname)
+    client.call('notebook.close', pathname=pathname)
+    return total_time, status, timings
+
+
+if __name__ == '__main__':
+    client = Client(os.path.expanduser('~') + '/.porto/automation.sock')
+    for pathname in sys.argv[1:]:
+        total_time, status, timings = run(client, pathname)
+        print(pathname)
+        print('  cells:    ' + str(status['cells']))
+        print('  total:    ' + '{:.3f}'.format(total_time) + ' s')
+        for phase, histogram in sorted(timings['histograms_ms'].items()):
+            print('  ' + (phase + ':').ljust(14) + ' '.join(str(bound) + 'ms:' + str(count) for bound, count in histogram))
+
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+''' Measures completion latency: N complete requests for a word typed
+    one character at a time, sent to the kernel each time, and the same
+    answered from a CompletionCache, which asks the kernel for the first
+    character only. Once more while the kernel is busy running a cell:
+    the kernel answers only after the cell is done, the cache keeps
+    answering what it has.
+
+    usage: python3 benchmarks/completion_latency.py [N] [kernelname] '''
+
+import os.path
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import notebook.backend.kernel as kernel_module
+from notebook.backend.completion_cache import CompletionCache
+
+
+setup_code = 'import os\n' + '\n'.join('variable_' + str(i) + ' = ' + str(i) for i in range(200))
+word = 'variable_1'
+
+
+def wait_until_idle(kernel, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        kernel.reset_results_pending()
+        result = kernel.get_result()
+        while result != None:
+            message = result.result_msg
+            if message != None and message['header']['msg_type'] == 'status' and message['content'].get('execution_state', '') == 'idle' and result.query != None and result.query.cell != None:
+                return
+            result = kernel.get_result()
+        time.sleep(0.01)
+    raise TimeoutError('kernel not idle')
+
+
+def complete_word(kernel, cache, timeout=None):
+    ''' seconds per keystroke. '''
+
+    times = list()
+    for length in range(1, len(word) + 1):
+        code = word[:length]
+        start_time = time.time()
+        content = cache.get_completions(code, length) if cache != None else None
+        if content == None:
+            generation = cache.get_generation() if cache != None else None
+            content = kernel.complete(code, length).result(timeout)
+            if cache != None:
+                cache.add_completions(generation, code, length, content)
+        times.append(time.time() - start_time)
+    return times
+
+
+def format_times(times):
+    return 'median ' + '{:.2f}'.format(statistics.median(times) * 1000) + ' ms, max ' + '{:.2f}'.format(max(times) * 1000) + ' ms'
+
+
+if __name__ == '__main__':
+    number_of_runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    kernelname = sys.argv[2] if len(sys.argv) > 2 else 'python3'
+
+    kernel_loop = kernel_module.KernelLoop()
+    kernel = kernel_module.Kernel(kernelname, os.getcwd(), kernel_loop, lambda: None)
+    kernel.add_query(kernel_module.Query(object(), setup_code))
+    wait_until_idle(kernel)
+
+    uncached_times, cached_times = list(), list()
+    for i in range(number_of_runs):
+        uncached_times += complete_word(kernel, None)
+        cached_times += complete_word(kernel, CompletionCache())
+    print('keystrokes:    ' + str(len(uncached_times)))
+    print('kernel:        ' + format_times(uncached_times))
+    print('cache:         ' + format_times(cached_times))
+
+    cache = CompletionCache()
+    complete_word(kernel, cache)
+    kernel.add_query(kernel_module.Query(object(), 'import time\ntime.sleep(2)'))
+    time.sleep(0.5)
+    print('while busy:    ' + format_times(complete_word(kernel, cache, 1)))
+    start_time = time.time()
+    kernel.complete('os.pa', 5).result()
+    print('kernel busy:   ' + '{:.0f}'.format((time.time() - start_time) * 1000) + ' ms for one request')
+    kernel.shutdown().result()
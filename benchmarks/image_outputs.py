@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+
+''' Keeps N display_data outputs of a size in bytes each as Output
+    objects and prints the memory they hold on to, next to what keeping
+    the base64 string plus a decoded copy would take. Then exports them
+    like saving a notebook does.
+
+    usage: python3 benchmarks/image_outputs.py [N] [size] '''
+
+import base64
+import os
+import os.path
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import nbformat
+
+from cell.result_revealer.output import Output
+
+
+def get_message(size):
+    image_base64 = base64.b64encode(os.urandom(size)).decode('ascii')
+    return {'header': {'msg_type': 'display_data'}, 'content': {'data': {'image/png': image_base64, 'text/plain': '<Figure>'}, 'metadata': dict()}}
+
+
+def run(number_of_outputs, size):
+    tracemalloc.start()
+    outputs = list()
+    for i in range(number_of_outputs):
+        outputs.append(Output(nbformat.v4.output_from_msg(get_message(size))))
+    held = tracemalloc.get_traced_memory()[0]
+
+    start_time = time.time()
+    nodes = [output.export_nbformat() for output in outputs]
+    export_time = time.time() - start_time
+    tracemalloc.stop()
+
+    # base64 string in the node, decoded copy in the widget
+    base64_length = len(nodes[0]['data']['image/png'])
+    return held, number_of_outputs * (base64_length + size), export_time
+
+
+if __name__ == '__main__':
+    number_of_outputs = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    held, held_before, export_time = run(number_of_outputs, size)
+    print('outputs:        ' + str(number_of_outputs) + ' x ' + str(size) + ' bytes')
+    print('held:           ' + '{:.1f}'.format(held / 1000000) + ' MB')
+    print('base64 + copy:  ' + '{:.1f}'.format(held_before / 1000000) + ' MB')
+    print('export:         ' + '{:.3f}'.format(export_time) + ' s')
+
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+''' Runs N trivial cells against a local kernel and reports the per-cell
+    overhead of the query dispatch.
+
+    usage: python3 benchmarks/kernel_dispatch.py [N] [kernelname] '''
+
+import os.path
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import notebook.backend.kernel as kernel_module
+
+
+def wait_for_idle(kernel, results_available, cells, timeout=120):
+    ''' drain results until every cell in cells has gone idle. '''
+
+    pending = set(cells)
+    deadline = time.time() + timeout
+    while len(pending) > 0:
+        if time.time() > deadline:
+            raise TimeoutError(str(len(pending)) + ' cells still running')
+        results_available.clear()
+        kernel.reset_results_pending()
+        result = kernel.get_result()
+        if result == None:
+            results_available.wait(0.1)
+        elif result.result_msg != None and result.result_msg['header']['msg_type'] == 'status':
+            if result.result_msg['content'].get('execution_state', '') == 'idle':
+                pending.discard(result.cell)
+
+
+def run(number_of_cells, kernelname):
+    kernel_loop = kernel_module.KernelLoop()
+    results_available = threading.Event()
+    kernel = kernel_module.Kernel(kernelname, os.getcwd(), kernel_loop, results_available.set)
+
+    # warm up: wait for kernel start and the initial chdir queries
+    warm_up_cell = object()
+    kernel.add_query(kernel_module.Query(warm_up_cell, 'pass'))
+    wait_for_idle(kernel, results_available, [warm_up_cell])
+
+    cells = [object() for i in range(number_of_cells)]
+    start_time = time.time()
+    for cell in cells:
+        kernel.add_query(kernel_module.Query(cell, 'pass'))
+    wait_for_idle(kernel, results_available, cells)
+    total_time = time.time() - start_time
+
+    kernel.shutdown().result()
+    return total_time
+
+
+if __name__ == '__main__':
+    number_of_cells = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    kernelname = sys.argv[2] if len(sys.argv) > 2 else 'python3'
+
+    total_time = run(number_of_cells, kernelname)
+    print('cells:         ' + str(number_of_cells))
+    print('total:         ' + '{:.3f}'.format(total_time) + ' s')
+    print('per cell:      ' + '{:.2f}'.format(1000 * total_time / number_of_cells) + ' ms')
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+''' Starts N kernels, each busy with a long running cell, and measures how
+    long it takes to shut them all down, once one after the other (as
+    quitting used to do) and once all at once with a deadline, like
+    Workspace.shutdown_all_kernels does. With "stubborn" the cells ignore
+    SIGINT and SIGTERM, so the kernels have to be killed.
+
+    usage: python3 benchmarks/kernel_shutdown.py [N] [kernelname] [timeout] [stubborn] '''
+
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import notebook.backend.kernel as kernel_module
+
+
+busy_code = 'import time\ntime.sleep(1000)'
+stubborn_code = 'import signal\nsignal.signal(signal.SIGINT, signal.SIG_IGN)\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\n' + busy_code
+
+
+def start_kernels(kernel_loop, number_of_kernels, kernelname, code, timeout=120):
+    ''' start kernels and wait until each has begun running its cell. '''
+
+    kernels = list()
+    for i in range(number_of_kernels):
+        kernel = kernel_module.Kernel(kernelname, os.getcwd(), kernel_loop, lambda: None)
+        kernel.add_query(kernel_module.Query(object(), code))
+        kernels.append(kernel)
+
+    deadline = time.time() + timeout
+    busy = set()
+    while len(busy) < len(kernels):
+        if time.time() > deadline:
+            raise TimeoutError(str(len(kernels) - len(busy)) + ' kernels not busy')
+        for kernel in kernels:
+            kernel.reset_results_pending()
+            result = kernel.get_result()
+            while result != None:
+                if result.result_msg != None and result.result_msg['header']['msg_type'] == 'execute_input':
+                    busy.add(kernel)
+                result = kernel.get_result()
+        time.sleep(0.05)
+    return kernels
+
+
+def run_sequential(kernel_loop, number_of_kernels, kernelname, code):
+    kernels = start_kernels(kernel_loop, number_of_kernels, kernelname, code)
+    start_time = time.time()
+    for kernel in kernels:
+        kernel.shutdown().result()
+    return time.time() - start_time
+
+
+def run_parallel(kernel_loop, number_of_kernels, kernelname, code, timeout):
+    kernels = start_kernels(kernel_loop, number_of_kernels, kernelname, code)
+    start_time = time.time()
+    kernel_loop.shutdown_kernels(kernels, timeout).result()
+    return time.time() - start_time
+
+
+if __name__ == '__main__':
+    number_of_kernels = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    kernelname = sys.argv[2] if len(sys.argv) > 2 else 'python3'
+    timeout = float(sys.argv[3]) if len(sys.argv) > 3 else 3
+    code = stubborn_code if len(sys.argv) > 4 and sys.argv[4] == 'stubborn' else busy_code
+
+    kernel_loop = kernel_module.KernelLoop()
+    sequential_time = run_sequential(kernel_loop, number_of_kernels, kernelname, code)
+    parallel_time = run_parallel(kernel_loop, number_of_kernels, kernelname, code, timeout)
+    print('kernels:       ' + str(number_of_kernels))
+    print('sequential:    ' + '{:.3f}'.format(sequential_time) + ' s')
+    print('parallel:      ' + '{:.3f}'.format(parallel_time) + ' s')
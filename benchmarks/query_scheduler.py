@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+''' Stress test for the query scheduler: queues N queries on a kernel,
+    cancels every other cell while they run and checks that each
+    cancelled query got exactly one 'evaluation_stopped' result. Also
+    times the scheduler on its own with a large backlog.
+
+    usage: python3 benchmarks/query_scheduler.py [N] [kernelname] '''
+
+import collections
+import os.path
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+import notebook.backend.kernel as kernel_module
+from notebook.backend.query_scheduler import QueryScheduler
+
+
+def time_scheduler(number_of_queries):
+    ''' add, cancel by cell and pop, without a kernel. '''
+
+    scheduler = QueryScheduler()
+    cells = [object() for i in range(number_of_queries)]
+    lanes = QueryScheduler.lane_names
+
+    start_time = time.time()
+    for i, cell in enumerate(cells):
+        scheduler.add(kernel_module.Query(cell, 'pass', lanes[i % len(lanes)]))
+    add_time = time.time() - start_time
+
+    start_time = time.time()
+    for cell in cells[::2]:
+        scheduler.remove_by_cell(cell)
+    cancel_time = time.time() - start_time
+
+    start_time = time.time()
+    while scheduler.pop() != None: pass
+    pop_time = time.time() - start_time
+
+    return add_time, cancel_time, pop_time
+
+
+def run(number_of_queries, kernelname):
+    kernel_loop = kernel_module.KernelLoop()
+    results_available = threading.Event()
+    kernel = kernel_module.Kernel(kernelname, os.getcwd(), kernel_loop, results_available.set)
+
+    cells = [object() for i in range(number_of_queries)]
+    cancelled_cells = set(cells[1::2])
+    pending = set(cells)
+    stopped = collections.Counter()
+
+    start_time = time.time()
+    for i, cell in enumerate(cells):
+        kernel.add_query(kernel_module.Query(cell, 'pass', 'batch'))
+    for cell in cells[1::2]:
+        kernel.remove_queries_by_cell(cell)
+
+    deadline = time.time() + 600
+    while len(pending) > 0:
+        if time.time() > deadline:
+            raise TimeoutError(str(len(pending)) + ' cells still pending')
+        results_available.clear()
+        kernel.reset_results_pending()
+        result = kernel.get_result()
+        if result == None:
+            results_available.wait(0.1)
+        elif result.result_message == 'evaluation_stopped':
+            stopped[result.cell] += 1
+            pending.discard(result.cell)
+        elif result.result_msg != None and result.result_msg['header']['msg_type'] == 'status':
+            if result.result_msg['content'].get('execution_state', '') == 'idle':
+                pending.discard(result.cell)
+    total_time = time.time() - start_time
+
+    # late results would show up here
+    time.sleep(0.5)
+    result = kernel.get_result()
+    while result != None:
+        if result.result_message == 'evaluation_stopped':
+            stopped[result.cell] += 1
+        result = kernel.get_result()
+
+    kernel.shutdown().result()
+
+    wrong = [cell for cell in cells if stopped[cell] != (1 if cell in cancelled_cells else 0)]
+    return total_time, len(cancelled_cells), len(wrong)
+
+
+if __name__ == '__main__':
+    number_of_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    kernelname = sys.argv[2] if len(sys.argv) > 2 else 'python3'
+
+    add_time, cancel_time, pop_time = time_scheduler(100 * number_of_queries)
+    print('scheduler, ' + str(100 * number_of_queries) + ' queries:')
+    print('  add:         ' + '{:.3f}'.format(add_time) + ' s')
+    print('  cancel half: ' + '{:.3f}'.format(cancel_time) + ' s')
+    print('  pop rest:    ' + '{:.3f}'.format(pop_time) + ' s')
+
+    total_time, number_cancelled, number_wrong = run(number_of_queries, kernelname)
+    print('kernel, ' + str(number_of_queries) + ' queries:')
+    print('  total:       ' + '{:.3f}'.format(total_time) + ' s')
+    print('  cancelled:   ' + str(number_cancelled))
+    print('  stop count off for ' + str(number_wrong) + ' cells')
+    if number_wrong > 0:
+        sys.exit(1)
+
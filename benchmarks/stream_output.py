@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+''' Streams N lines into a StreamBuffer, one line per chunk, with a
+    progress bar redrawn by carriage returns after every 100 lines.
+    Prints the time per 10% of the lines, which should stay flat, also
+    with a memory cap (in characters) that makes the buffer spill.
+
+    usage: python3 benchmarks/stream_output.py [N] [max_memory] '''
+
+import os.path
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+from cell.result_revealer.stream.stream_buffer import StreamBuffer
+
+
+def apply_update(view_length, update):
+    if update['reset']:
+        return len(update['inserted'])
+    return view_length - update['trimmed'] - update['deleted'] + len(update['inserted'])
+
+
+def run(number_of_lines, max_memory=None):
+    stream_buffer = StreamBuffer(max_memory)
+    step = max(1, number_of_lines // 10)
+    step_times = list()
+
+    # what a view would do with the updates
+    view_length = 0
+
+    start_time = time.time()
+    step_start_time = start_time
+    for i in range(number_of_lines):
+        view_length = apply_update(view_length, stream_buffer.add('line ' + str(i) + '\n'))
+        if i % 100 == 99:
+            view_length = apply_update(view_length, stream_buffer.add('\r[' + '#' * (i * 20 // number_of_lines) + ']'))
+        if i % step == step - 1:
+            now = time.time()
+            step_times.append(now - step_start_time)
+            step_start_time = now
+    total_time = time.time() - start_time
+
+    text = stream_buffer.get_text()
+    if len(text) != view_length:
+        raise AssertionError('view out of sync: ' + str(view_length) + ' != ' + str(len(text)))
+    return total_time, step_times, len(text)
+
+
+if __name__ == '__main__':
+    number_of_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    max_memory = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    total_time, step_times, length = run(number_of_lines, max_memory)
+    print('lines:         ' + str(number_of_lines))
+    print('kept in view:  ' + str(length) + ' characters')
+    print('total:         ' + '{:.3f}'.format(total_time) + ' s')
+    print('per 10%:       ' + ' '.join('{:.3f}'.format(step_time) for step_time in step_times))
+
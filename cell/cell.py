@@ -19,6 +19,8 @@ import gi
 gi.require_version('GtkSource', '4')
 from gi.repository import GtkSource
 
+import datetime
+
 from helpers.observable import Observable
 from app.service_locator import ServiceLocator
 import cell.cell_controller as cell_controller
@@ -102,6 +104,22 @@ class CodeCell(Cell):
         # possible states: idle, ready_for_evaluation, queued_for_evaluation
         # evaluation_in_progress, evaluation_to_stop
         self.state = 'idle'
+
+        # of the last evaluation, execution_metadata is the 'execution'
+        # cell metadata of nbformat (timestamps in ISO 8601 format)
+        self.execution_count = None
+        self.execution_metadata = dict()
+        self.output_from_cache = False
+
+        # clear_output(wait=True) clears once the next output arrives
+        self.clear_output_pending = False
+
+        # outputs are taken from the output store if possible, see
+        # NotebookEvaluator.get_cache_key
+        self.cache_output = False
+
+        # output may be out of date, see NotebookEvaluator.update_stale_cells
+        self.stale = False
         
         # syntax highlighting
         self.set_language(self.get_notebook().get_source_language_code())
@@ -112,12 +130,81 @@ class CodeCell(Cell):
         self.presenter = cell_presenter.CodeCellPresenter(self)
         self.controller = cell_controller.CodeCellController(self, self.view, notebook)
 
+        self.connect('changed', self.on_changed)
+
+    def on_changed(self, buffer):
+        self.add_change_code('source_changed')
+
+    def set_stale(self, stale):
+        if stale != self.stale:
+            self.stale = stale
+            self.add_change_code('stale_changed', stale)
+
+    def is_stale(self):
+        return self.stale
+
     def evaluate(self):
         self.reset_streams()
         self.remove_result()
+        self.clear_output_pending = False
         self.stop_evaluation()
         self.change_state('ready_for_evaluation')
 
+    def set_clear_output_pending(self, pending):
+        self.clear_output_pending = pending
+
+    def is_clear_output_pending(self):
+        return self.clear_output_pending
+
+    def add_output(self, node, display_id=None, query=None):
+        output = self.result_revealer.add_output(node, display_id, query)
+        self.set_modified(True)
+        return output
+
+    def update_output(self, output, data):
+        self.result_revealer.update_output(output, data)
+        self.set_modified(True)
+
+    def get_outputs(self):
+        return self.result_revealer.get_outputs()
+
+    def has_error(self):
+        return any(output.is_error() for output in self.get_outputs())
+
+    def set_execution_info(self, execution_count, execution_metadata, output_from_cache=False):
+        self.execution_count = execution_count
+        self.execution_metadata = execution_metadata
+        self.output_from_cache = output_from_cache
+        self.add_change_code('execution_info_changed')
+
+    def is_output_from_cache(self):
+        return self.output_from_cache
+
+    def set_cache_output(self, cache_output):
+        if cache_output != self.cache_output:
+            self.cache_output = cache_output
+            self.add_change_code('cache_output_changed', cache_output)
+
+    def get_cache_output(self):
+        return self.cache_output
+
+    def get_execution_count(self):
+        return self.execution_count
+
+    def get_execution_metadata(self):
+        return self.execution_metadata
+
+    def get_execution_duration(self):
+        ''' seconds from execute_input (or busy) to idle (or the reply), None
+            if the metadata doesn't tell. '''
+
+        start = self.execution_metadata.get('iopub.execute_input', self.execution_metadata.get('iopub.status.busy', None))
+        end = self.execution_metadata.get('iopub.status.idle', self.execution_metadata.get('shell.execute_reply', None))
+        if start == None or end == None: return None
+        try: duration = datetime.datetime.fromisoformat(end) - datetime.datetime.fromisoformat(start)
+        except (ValueError, TypeError): return None
+        return max(0, duration.total_seconds())
+
     def change_state(self, state):
         self.state = state
         self.add_change_code('cell_state_change', self.state)
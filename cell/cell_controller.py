@@ -21,7 +21,11 @@ from gi.repository import GLib
 from gi.repository import Gdk
 from gi.repository import Gtk
 
+import re
+
 import cell.cell as model_cell
+import cell.cell_viewgtk as cell_view
+from app.service_locator import ServiceLocator
 
 
 class CellController(object):
@@ -172,10 +176,178 @@ class CellController(object):
 
 
 class CodeCellController(CellController):
+    ''' Tab completes the word before the cursor, Shift+Tab inspects it.
+        While the completion popover is open, matches are filtered as the
+        user types, from the cache of the backend if possible, otherwise
+        the kernel is asked once typing paused for debounce_time ms. '''
+
+    debounce_time = 80
+    word_before_cursor_regex = re.compile(r'[\w.]$')
+    call_before_cursor_regex = re.compile(r'[\w.(]$')
 
     def __init__(self, cell, cell_view, notebook):
         CellController.__init__(self, cell, cell_view, notebook)
 
+        # popovers are made on first use
+        self.completion_popover = None
+        self.inspection_popover = None
+        self.completion_request = None
+        self.inspection_request = None
+        self.completion_timeout = None
+        self.completion_start = None
+
+        self.cell.connect('changed', self.on_changed_for_completion)
+        self.cell_view.text_entry.connect('focus-out-event', self.on_focus_out_for_completion)
+
+    def observe_keyboard_keypress_events(self, widget, event):
+        modifiers = event.state & Gtk.accelerator_get_default_mod_mask()
+
+        if self.is_completion_shown():
+            if event.keyval in [Gdk.keyval_from_name('Up'), Gdk.keyval_from_name('Down')] and modifiers == 0:
+                self.completion_popover.select_next(1 if event.keyval == Gdk.keyval_from_name('Down') else -1)
+                return True
+            if event.keyval in [Gdk.keyval_from_name('Page_Up'), Gdk.keyval_from_name('Page_Down')] and modifiers == 0:
+                self.completion_popover.select_next(10 if event.keyval == Gdk.keyval_from_name('Page_Down') else -10)
+                return True
+            if event.keyval in [Gdk.keyval_from_name('Return'), Gdk.keyval_from_name('Tab')] and modifiers == 0:
+                self.insert_completion()
+                return True
+            if event.keyval == Gdk.keyval_from_name('Escape'):
+                self.hide_completion()
+                return True
+
+        if self.inspection_popover != None and self.inspection_popover.get_visible():
+            self.hide_inspection()
+            if event.keyval == Gdk.keyval_from_name('Escape'):
+                return True
+
+        # at the start of a line they indent and unindent as before
+        if event.keyval in [Gdk.keyval_from_name('Tab'), Gdk.keyval_from_name('ISO_Left_Tab')] and not self.cell.get_has_selection():
+            line = self.get_line_before_cursor()
+            if modifiers == 0 and self.word_before_cursor_regex.search(line):
+                self.request_completions()
+                return True
+            if modifiers == Gdk.ModifierType.SHIFT_MASK and self.call_before_cursor_regex.search(line):
+                self.request_inspection()
+                return True
+
+        return CellController.observe_keyboard_keypress_events(self, widget, event)
+
+    def get_line_before_cursor(self):
+        text_iter = self.cell.get_iter_at_mark(self.cell.get_insert())
+        line_start = text_iter.copy()
+        line_start.set_line_offset(0)
+        return self.cell.get_text(line_start, text_iter, False)
+
+    def get_code_and_cursor_pos(self):
+        return (self.cell.get_all_text(), self.cell.get_iter_at_mark(self.cell.get_insert()).get_offset())
+
+    def request_completions(self):
+        self.cancel_completion_request()
+        code, cursor_pos = self.get_code_and_cursor_pos()
+        self.completion_request = self.notebook.request_completions(code, cursor_pos, self.on_completions)
+
+    def cancel_completion_request(self):
+        if self.completion_timeout != None:
+            GLib.source_remove(self.completion_timeout)
+            self.completion_timeout = None
+        if self.completion_request != None:
+            self.completion_request.cancel()
+            self.completion_request = None
+
+    def on_completions(self, content):
+        self.completion_request = None
+        code, cursor_pos = self.get_code_and_cursor_pos()
+        if content == None or len(content['matches']) == 0 or content['cursor_end'] != cursor_pos:
+            self.hide_completion()
+            return
+
+        # one match only, nothing to choose from
+        if len(content['matches']) == 1 and not self.is_completion_shown():
+            self.completion_start = content['cursor_start']
+            self.replace_word(content['matches'][0])
+            return
+
+        if self.completion_popover == None:
+            self.completion_popover = cell_view.CompletionPopover(self.cell_view.text_entry)
+        self.completion_start = content['cursor_start']
+        self.completion_popover.show_matches(content['matches'], self.cell.get_iter_at_offset(self.completion_start))
+
+    def on_changed_for_completion(self, buffer):
+        ''' refilter the matches shown as the user types. '''
+
+        if not self.is_completion_shown(): return
+
+        code, cursor_pos = self.get_code_and_cursor_pos()
+        if cursor_pos < self.completion_start or not self.word_before_cursor_regex.search(self.get_line_before_cursor()):
+            self.hide_completion()
+            return
+
+        self.cancel_completion_request()
+        content = self.notebook.get_cached_completions(code, cursor_pos)
+        if content != None:
+            self.on_completions(content)
+        else:
+            self.completion_timeout = GLib.timeout_add(self.debounce_time, self.on_completion_timeout)
+
+    def on_completion_timeout(self):
+        self.completion_timeout = None
+        self.request_completions()
+        return False
+
+    def on_focus_out_for_completion(self, widget, event=None):
+        self.hide_completion()
+        self.hide_inspection()
+        return False
+
+    def is_completion_shown(self):
+        return self.completion_popover != None and self.completion_popover.get_visible()
+
+    def insert_completion(self):
+        match = self.completion_popover.get_selected_match()
+        self.hide_completion()
+        if match != None:
+            self.replace_word(match)
+
+    def replace_word(self, text):
+        ''' replace what is between the start of the completion and the
+            cursor by text. '''
+
+        self.cell.begin_user_action()
+        start_iter = self.cell.get_iter_at_offset(self.completion_start)
+        self.cell.delete(start_iter, self.cell.get_iter_at_mark(self.cell.get_insert()))
+        self.cell.insert_at_cursor(text)
+        self.cell.end_user_action()
+
+    def hide_completion(self):
+        self.cancel_completion_request()
+        if self.completion_popover != None:
+            self.completion_popover.popdown()
+
+    def request_inspection(self):
+        if self.inspection_request != None:
+            self.inspection_request.cancel()
+        code, cursor_pos = self.get_code_and_cursor_pos()
+        self.inspection_request = self.notebook.request_inspection(code, cursor_pos, self.on_inspection)
+
+    def on_inspection(self, content):
+        self.inspection_request = None
+        if content == None or not content.get('found', False) or 'text/plain' not in content.get('data', dict()):
+            self.hide_inspection()
+            return
+
+        text = ServiceLocator.get_ansi_escape_regex().sub('', content['data']['text/plain'])
+        if self.inspection_popover == None:
+            self.inspection_popover = cell_view.InspectionPopover(self.cell_view.text_entry)
+        self.inspection_popover.show_text(text, self.cell.get_iter_at_mark(self.cell.get_insert()))
+
+    def hide_inspection(self):
+        if self.inspection_request != None:
+            self.inspection_request.cancel()
+            self.inspection_request = None
+        if self.inspection_popover != None:
+            self.inspection_popover.popdown()
+
 
 class MarkdownCellController(CellController):
 
@@ -45,6 +45,38 @@ class CodeCellPresenter(CellPresenter):
     def __init__(self, cell):
         CellPresenter.__init__(self, cell)
 
+    def change_notification(self, change_code, notifying_object, parameter):
+        CellPresenter.change_notification(self, change_code, notifying_object, parameter)
+
+        if change_code == 'execution_info_changed' or change_code == 'cache_output_changed':
+            self.update_execution_info()
+
+        if change_code == 'stale_changed' or (change_code == 'cell_state_change' and parameter == 'idle'):
+            self.update_stale_display()
+
+    def update_stale_display(self):
+        if self.cell.state == 'idle':
+            if self.cell.is_stale():
+                self.cell.view.state_display.show_stale()
+            else:
+                self.cell.view.state_display.show_nothing()
+
+    def update_execution_info(self):
+        execution_count = self.cell.get_execution_count()
+        duration = self.cell.get_execution_duration()
+        text = ''
+        if execution_count != None:
+            text += '[' + str(execution_count) + ']'
+        if self.cell.is_output_from_cache():
+            text += 'cached'
+        if duration != None:
+            if duration < 1:
+                text += '\n' + str(int(duration * 1000)) + ' ms'
+            else:
+                text += '\n' + '{:.1f}'.format(duration) + ' s'
+        self.cell.view.execution_info.set_text(text)
+        self.cell.view.execution_info.set_tooltip_text('Outputs are cached' if self.cell.get_cache_output() else None)
+
 
 class MarkdownCellPresenter(CellPresenter):
 
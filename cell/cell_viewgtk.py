@@ -19,6 +19,7 @@ import gi
 gi.require_version('Gtk', '3.0')
 gi.require_version('GtkSource', '4')
 from gi.repository import Gtk
+from gi.repository import Gdk
 from gi.repository import GtkSource
 from gi.repository import GObject
 
@@ -110,6 +111,13 @@ class CellViewCode(CellView):
 
         self.vbox.pack_start(self.text_widget, False, False, 0)
 
+        # execution count and duration of the last evaluation
+        self.execution_info = Gtk.Label()
+        self.execution_info.set_valign(Gtk.Align.START)
+        self.execution_info.set_justify(Gtk.Justification.RIGHT)
+        self.execution_info.get_style_context().add_class('cellexecutioninfo')
+        self.pack_start(self.execution_info, False, False, 0)
+
         self.hbox = Gtk.HBox()
         self.border_left = CellBorder()
         self.border_left.set_size_request(1, -1)
@@ -241,6 +249,10 @@ class CellViewStateDisplay(Gtk.DrawingArea):
     def show_spinner(self):
         if self.state != 'spinner':
             self.state = 'spinner'
+
+    def show_stale(self):
+        if self.state != 'stale':
+            self.state = 'stale'
         
     def draw_spinner(self):
         self.spinner_state += 1
@@ -260,6 +272,10 @@ class CellViewStateDisplay(Gtk.DrawingArea):
                 cr.rectangle(0, i, 10, 10)
                 cr.fill()
                 i += 20
+        elif self.state == 'stale':
+            cr.set_source_rgba(0.9, 0.65, 0.04, 1)
+            cr.rectangle(0, 0, width, height)
+            cr.fill()
         return True
     
     def show_nothing(self):
@@ -285,3 +301,117 @@ class CellBorder(Gtk.DrawingArea):
         return False
     
 
+
+class CompletionPopover(Gtk.Popover):
+    ''' Matches of a complete request, below the cursor. Not modal, the
+        source view keeps the focus and CodeCellController hands on the
+        keys that move the selection. '''
+
+    max_rows = 200
+
+    def __init__(self, text_view):
+        Gtk.Popover.__init__(self)
+        self.text_view = text_view
+        self.set_relative_to(text_view)
+        self.set_modal(False)
+        self.set_position(Gtk.PositionType.BOTTOM)
+        self.get_style_context().add_class('completion')
+
+        self.list_box = Gtk.ListBox()
+        self.list_box.set_selection_mode(Gtk.SelectionMode.BROWSE)
+        self.list_box.set_can_focus(False)
+
+        self.scrolled_window = Gtk.ScrolledWindow()
+        self.scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        self.scrolled_window.set_max_content_height(240)
+        self.scrolled_window.set_propagate_natural_height(True)
+        self.scrolled_window.set_propagate_natural_width(True)
+        self.scrolled_window.add(self.list_box)
+        self.add(self.scrolled_window)
+        self.scrolled_window.show_all()
+
+        self.matches = list()
+
+    def show_matches(self, matches, text_iter):
+        ''' text_iter: where the completed word starts. '''
+
+        for row in self.list_box.get_children():
+            self.list_box.remove(row)
+        self.matches = matches[:self.max_rows]
+        for match in self.matches:
+            label = Gtk.Label(match)
+            label.set_xalign(0)
+            label.get_style_context().add_class('monospace')
+            label.show()
+            self.list_box.add(label)
+        self.list_box.select_row(self.list_box.get_row_at_index(0))
+        self.scrolled_window.get_vadjustment().set_value(0)
+
+        self.set_pointing_to(get_iter_rectangle(self.text_view, text_iter))
+        self.popup()
+
+    def select_next(self, offset):
+        row = self.list_box.get_selected_row()
+        index = min(max(row.get_index() + offset if row != None else 0, 0), len(self.matches) - 1)
+        row = self.list_box.get_row_at_index(index)
+        self.list_box.select_row(row)
+
+        allocation = row.get_allocation()
+        adjustment = self.scrolled_window.get_vadjustment()
+        if allocation.y < adjustment.get_value():
+            adjustment.set_value(allocation.y)
+        elif allocation.y + allocation.height > adjustment.get_value() + adjustment.get_page_size():
+            adjustment.set_value(allocation.y + allocation.height - adjustment.get_page_size())
+
+    def get_selected_match(self):
+        row = self.list_box.get_selected_row()
+        if row == None: return None
+        return self.matches[row.get_index()]
+
+
+class InspectionPopover(Gtk.Popover):
+    ''' Plain text of an inspect reply (signature and docstring). '''
+
+    def __init__(self, text_view):
+        Gtk.Popover.__init__(self)
+        self.text_view = text_view
+        self.set_relative_to(text_view)
+        self.set_modal(False)
+        self.set_position(Gtk.PositionType.BOTTOM)
+        self.get_style_context().add_class('inspection')
+
+        self.label = Gtk.Label()
+        self.label.set_xalign(0)
+        self.label.set_yalign(0)
+        self.label.set_line_wrap(True)
+        self.label.set_max_width_chars(80)
+        self.label.set_selectable(True)
+        self.label.set_can_focus(False)
+        self.label.get_style_context().add_class('monospace')
+
+        self.scrolled_window = Gtk.ScrolledWindow()
+        self.scrolled_window.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        self.scrolled_window.set_max_content_height(300)
+        self.scrolled_window.set_propagate_natural_height(True)
+        self.scrolled_window.set_propagate_natural_width(True)
+        self.scrolled_window.add(self.label)
+        self.add(self.scrolled_window)
+        self.scrolled_window.show_all()
+
+    def show_text(self, text, text_iter):
+        self.label.set_text(text)
+        self.scrolled_window.get_vadjustment().set_value(0)
+        self.set_pointing_to(get_iter_rectangle(self.text_view, text_iter))
+        self.popup()
+
+
+def get_iter_rectangle(text_view, text_iter):
+    ''' where text_iter is shown, in widget coordinates of text_view. '''
+
+    location = text_view.get_iter_location(text_iter)
+    x, y = text_view.buffer_to_window_coords(Gtk.TextWindowType.WIDGET, location.x, location.y)
+    rectangle = Gdk.Rectangle()
+    rectangle.x, rectangle.y, rectangle.width, rectangle.height = x, y, 1, location.height
+    return rectangle
+
+
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+import base64
+
+import nbformat
+
+
+# kept decoded in Output.node, base64 in notebooks and messages
+binary_mime_types = ('image/png', 'image/jpeg')
+
+
+def decode_data(data):
+    ''' replace base64 strings of binary mime types in data by the decoded
+        bytes, in place, so the strings can be freed. bytes-like values
+        (memoryviews of message buffers) are kept as they are. '''
+
+    for mime_type in binary_mime_types:
+        value = data.get(mime_type, None)
+        if isinstance(value, str):
+            data[mime_type] = base64.b64decode(value)
+    return data
+
+
+def encode_data(data):
+    ''' copy of data with binary mime types base64 encoded again. '''
+
+    encoded_data = dict(data)
+    for mime_type in binary_mime_types:
+        value = encoded_data.get(mime_type, None)
+        if value != None and not isinstance(value, str):
+            encoded_data[mime_type] = base64.b64encode(value).decode('ascii')
+    return encoded_data
+
+
+class Output():
+    ''' One execute_result, display_data or error output of a code cell,
+        kept as its nbformat output dict, with binary data decoded (see
+        decode_data). Widgets are made from it by
+        CodeResultRevealerPresenter, once per main loop iteration at most;
+        version goes up whenever the data changes in place. query is
+        stamped with 'result_built' and 'revealed' when the widget is first
+        shown, then dropped. '''
+
+    __slots__ = ('node', 'display_id', 'version', 'removed', 'query')
+
+    def __init__(self, node, display_id=None, query=None):
+        if 'data' in node:
+            decode_data(node['data'])
+        self.node = node
+        self.display_id = display_id
+        self.version = 0
+        self.removed = False
+        self.query = query
+
+    def get_output_type(self):
+        return self.node['output_type']
+
+    def is_error(self):
+        return self.node['output_type'] == 'error'
+
+    def update_data(self, data):
+        self.node['data'] = decode_data(data)
+        self.version += 1
+
+    def export_nbformat(self):
+        ''' node as it goes into a notebook, re-encoding binary data. '''
+
+        node = nbformat.NotebookNode(self.node)
+        if 'data' in node:
+            node['data'] = nbformat.NotebookNode(encode_data(node['data']))
+        return node
+
+
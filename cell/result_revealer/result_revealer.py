@@ -20,6 +20,8 @@ import cell.result_revealer.result_revealer_controller as result_revealer_contro
 import cell.result_revealer.result_revealer_presenter as result_revealer_presenter
 import cell.result_revealer.result_revealer_viewgtk as result_revealer_view
 import cell.result_revealer.stream.stream as stream
+from cell.result_revealer.output import Output
+from app.service_locator import ServiceLocator
 
 
 class ResultRevealer(Observable):
@@ -47,12 +49,17 @@ class CodeResultRevealer(ResultRevealer):
         ResultRevealer.__init__(self)
         self.cell = cell
 
+        # the memory cap of the cell is split between its streams
+        max_memory = ServiceLocator.get_settings().get_value('output', 'max_memory_per_cell') // 2
         self.streams = dict()
-        self.streams['stderr'] = stream.Stream('stderr')
-        self.streams['stdout'] = stream.Stream('stdout')
+        self.streams['stderr'] = stream.Stream('stderr', max_memory)
+        self.streams['stdout'] = stream.Stream('stdout', max_memory)
         self.stderr_stream_visible = False
         self.stdout_stream_visible = False
 
+        # shown below the streams, in order
+        self.outputs = list()
+
         self.view = result_revealer_view.ResultViewRevealerCode()
         cell.view.vbox.pack_start(self.view, False, False, 0)
         self.presenter = result_revealer_presenter.CodeResultRevealerPresenter(self, self.view)
@@ -76,6 +83,29 @@ class CodeResultRevealer(ResultRevealer):
             self.stdout_stream_visible = True
         self.add_change_code('stream_update', show_animation)
 
+    def add_output(self, node, display_id=None, query=None):
+        ''' node is an nbformat output dict, query the one it came from if
+            any. returns the Output. '''
+
+        output = Output(node, display_id, query)
+        self.outputs.append(output)
+        self.add_change_code('outputs_changed')
+        return output
+
+    def update_output(self, output, data):
+        output.update_data(data)
+        self.add_change_code('outputs_changed')
+
+    def get_outputs(self):
+        return self.outputs
+
+    def remove_result(self, show_animation=True):
+        if len(self.outputs) > 0:
+            for output in self.outputs:
+                output.removed = True
+            self.outputs = list()
+            self.add_change_code('outputs_changed')
+
 
 class MarkdownResultRevealer(ResultRevealer):
 
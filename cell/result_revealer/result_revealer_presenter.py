@@ -40,20 +40,32 @@ class ResultRevealerPresenter(object):
 
 
 class CodeResultRevealerPresenter(ResultRevealerPresenter):
+    ''' Result widgets are made from the outputs of the cell in one go,
+        right before the next redraw, so a cell getting many outputs in
+        one main loop iteration (or loading) builds each widget once.
+        Widgets of outputs removed meanwhile are updated in place for new
+        outputs of the same kind instead, as clear_output(wait=True)
+        followed by a new plot does. '''
 
     def __init__(self, result_revealer, view):
         ResultRevealerPresenter.__init__(self, result_revealer, view)
+        self.result_factory = ServiceLocator.get_result_factory()
+
+        # output -> (result view, version of the output it shows)
+        self.result_views = dict()
+        self.update_scheduled = False
 
     def change_notification(self, change_code, notifying_object, parameter):
 
-        if change_code == 'new_result':
-            self.add_result_view(parameter['result'], show_animation=parameter['show_animation'])
-            self.update_stream_visibility()
+        if change_code == 'outputs_changed':
+            if not self.update_scheduled:
+                self.update_scheduled = True
+                GLib.idle_add(self.update_result_views, priority=GLib.PRIORITY_HIGH_IDLE + 10)
 
         if change_code == 'stream_update':
             show_animation = parameter
 
-            if self.result_revealer.result == None and not self.result_revealer.stderr_stream_visible and not self.result_revealer.stdout_stream_visible:
+            if len(self.result_revealer.outputs) == 0 and not self.result_revealer.stderr_stream_visible and not self.result_revealer.stdout_stream_visible:
                 self.view.unreveal()
                 self.result_revealer.cell.view.text_widget.set_reveal_child(True)
                 self.result_revealer.cell.view.text_entry.set_editable(True)
@@ -71,26 +83,57 @@ class CodeResultRevealerPresenter(ResultRevealerPresenter):
         else:
             self.result_revealer.streams['stdout'].hide()
 
-    def add_result_view(self, result, show_animation=False):
-        cell_view_position = self.result_revealer.cell.get_notebook_position()
-        cell = self.result_revealer.cell
-                
-        # check if cell view is still present
-        if cell_view_position >= 0:
+    def update_result_views(self):
+        self.update_scheduled = False
+        outputs = self.result_revealer.outputs
+
+        recycled_views = list()
+        for output in list(self.result_views.keys()):
+            if output.removed:
+                recycled_views.append(self.result_views.pop(output)[0])
+
+        result_views = list()
+        built_outputs = list()
+        for output in outputs:
+            result_view, version = self.result_views.get(output, (None, None))
+            if result_view == None:
+                result_view = self.get_recycled_view(recycled_views, output)
+            elif version != output.version and not self.result_factory.update_result_from_output(result_view, output.node):
+                result_view = None
+            if result_view == None:
+                result_view = self.result_factory.get_result_from_output(output.node)
+                if result_view != None:
+                    result_view.scrolled_window.connect('scroll-event', self.result_on_scroll)
+            if result_view != None:
+                self.result_views[output] = (result_view, output.version)
+                result_views.append(result_view)
+                if output.query != None:
+                    output.query.set_timestamp('result_built')
+                    built_outputs.append(output)
+        self.view.set_results(result_views)
+        for output in built_outputs:
+            output.query.set_timestamp('revealed')
+            output.query = None
 
-            # add result
-            if result == None and not self.result_revealer.stderr_stream_visible and not self.result_revealer.stdout_stream_visible:
+        # check if cell view is still present
+        if self.result_revealer.cell.get_notebook_position() >= 0:
+            if len(result_views) == 0 and not self.result_revealer.stderr_stream_visible and not self.result_revealer.stdout_stream_visible:
                 self.view.unreveal()
-                self.view.set_result(result)
                 self.result_revealer.cell.view.text_widget.set_reveal_child(True)
                 self.result_revealer.cell.view.text_entry.set_editable(True)
             else:
-                self.view.set_result(result)
-                GLib.idle_add(lambda: self.view.reveal(show_animation))
-                result.scrolled_window.connect('scroll-event', self.result_on_scroll)
+                GLib.idle_add(lambda: self.view.reveal(True))
 
             # enable auto-scrolling for this cell (not enabled on startup)
             GLib.idle_add(lambda: self.view.set_autoscroll_on_reveal(True))
+        return False
+
+    def get_recycled_view(self, recycled_views, output):
+        for result_view in recycled_views:
+            if self.result_factory.update_result_from_output(result_view, output.node):
+                recycled_views.remove(result_view)
+                return result_view
+        return None
 
     def result_on_scroll(self, scrolled_window, event):
         if(abs(event.delta_y) > 0):
@@ -91,6 +91,10 @@ class ResultViewRevealerCode(ResultViewRevealer):
         self.revealer.add(self.box)
         self.superbox.pack_start(self.revealer, True, True, 0)
 
+        # below the streams
+        self.results_box = Gtk.VBox()
+        self.box.pack_end(self.results_box, False, False, 0)
+
         self.wrapper.set_center_widget(self.superbox)
         self.add(self.wrapper)
         self.revealer.set_reveal_child(False)
@@ -102,6 +106,20 @@ class ResultViewRevealerCode(ResultViewRevealer):
     def add_stream_view(self, view):
         self.box.pack_start(view, False, False, 0)
 
+    def set_results(self, result_views):
+        ''' show result_views in this order, those shown already stay. '''
+
+        children = self.results_box.get_children()
+        if children == result_views: return
+
+        for child in children:
+            if child not in result_views:
+                self.results_box.remove(child)
+        for position, result_view in enumerate(result_views):
+            if result_view.get_parent() == None:
+                self.results_box.pack_start(result_view, False, False, 0)
+            self.results_box.reorder_child(result_view, position)
+
     def reveal(self, show_animation=True, duration=250):
         self.revealer.set_transition_duration(duration)
         if show_animation == False:
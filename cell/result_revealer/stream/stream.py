@@ -18,18 +18,18 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk
+from gi.repository import Gio
 from gi.repository import GLib
-from gi.repository import Pango
 
 import nbformat
 
 from helpers.observable import Observable
-import cell.cell_viewgtk as cell_view
+from cell.result_revealer.stream.stream_buffer import StreamBuffer
 
 
 class Stream(Gtk.HBox, Observable):
 
-    def __init__(self, stream_type='stdout'):
+    def __init__(self, stream_type='stdout', max_memory=None):
         Gtk.HBox.__init__(self)
         Observable.__init__(self)
 
@@ -54,42 +54,92 @@ class Stream(Gtk.HBox, Observable):
 
         self.get_style_context().add_class('resultstreamview')
 
-        self.result_text = ''
+        self.stream_buffer = StreamBuffer(max_memory)
         self.stream_type = stream_type
 
-        self.label = Gtk.Label()
-        self.label.set_single_line_mode(False)
-        self.label.set_line_wrap_mode(Pango.WrapMode.CHAR)
-        self.label.set_line_wrap(True)
-        self.label.set_selectable(True)
-        self.label.set_justify(Gtk.Justification.LEFT)
-        self.label.set_xalign(0)
-        self.label.set_markup('')
+        # a trailing newline isn't shown, it goes in front of the next text
+        self.newline_withheld = False
+
+        self.text_view = Gtk.TextView()
+        self.text_view.set_editable(False)
+        self.text_view.set_cursor_visible(False)
+        self.text_view.set_wrap_mode(Gtk.WrapMode.CHAR)
+        self.text_view.set_monospace(True)
+        self.text_buffer = self.text_view.get_buffer()
+
+        # shown once the output got too big to keep all of it in memory
+        self.full_output_button = Gtk.Button.new_with_label('Open full output')
+        self.full_output_button.set_halign(Gtk.Align.START)
+        self.full_output_button.set_no_show_all(True)
+        self.full_output_button.connect('clicked', self.on_full_output_button_clicked)
 
         self.size_box = Gtk.VBox()
-        self.size_box.pack_start(self.label, False, False, 0)
-        self.centerbox.pack_start(self.size_box, False, False, 0)
+        self.size_box.pack_start(self.text_view, True, True, 0)
+        self.size_box.pack_start(self.full_output_button, False, False, 0)
+        self.centerbox.pack_start(self.size_box, True, True, 0)
     
     def add_text(self, text):
-        self.result_text += text
-        if not len(text) > 0: text = ''
-        #resolution = self.get_style_context().get_screen().get_resolution()
-        #rise_units = int(4*1024.0 * (max(resolution, 96)/72))
-        rise_units = 6144
-        self.label.set_markup('<span rise="' + str(rise_units) + '"><span font_desc="">' + GLib.markup_escape_text(self.result_text.rstrip()) + '</span></span>')
+        ''' only the new tail is inserted into the text view. '''
+
+        update = self.stream_buffer.add(text)
+        if update['reset']:
+            self.text_buffer.set_text('')
+            self.newline_withheld = False
+        else:
+            if update['trimmed'] > 0:
+                start_offset = self.stream_buffer.get_kept_head_length()
+                start_iter = self.text_buffer.get_iter_at_offset(start_offset)
+                end_iter = self.text_buffer.get_iter_at_offset(start_offset + update['trimmed'])
+                if self.text_buffer.get_char_count() - start_offset < update['trimmed']:
+                    self.newline_withheld = False
+                self.text_buffer.delete(start_iter, end_iter)
+            if update['deleted'] > 0:
+                end_iter = self.text_buffer.get_end_iter()
+                start_iter = end_iter.copy()
+                start_iter.backward_chars(update['deleted'])
+                self.text_buffer.delete(start_iter, end_iter)
+        self.insert_text(update['inserted'])
+        self.full_output_button.set_visible(self.stream_buffer.is_spilled())
+
+    def insert_text(self, text):
+        if len(text) > 0:
+            if self.newline_withheld:
+                text = '\n' + text
+            self.newline_withheld = text.endswith('\n')
+            if self.newline_withheld:
+                text = text[:-1]
+            self.text_buffer.insert(self.text_buffer.get_end_iter(), text)
+
+    def on_full_output_button_clicked(self, button):
+        pathname = self.stream_buffer.get_spill_pathname()
+        if pathname != None:
+            Gio.AppInfo.launch_default_for_uri(GLib.filename_to_uri(pathname, None), None)
 
     def get_text(self):
-        return self.result_text
+        return self.stream_buffer.get_text()
+
+    def get_full_text(self):
+        return self.stream_buffer.get_full_text()
+
+    def write_full_text(self, pathname):
+        self.stream_buffer.write_full_text(pathname)
+
+    def get_length(self):
+        return self.stream_buffer.get_length()
 
     def reset(self):
-        self.result_text = ''
-        self.label.set_markup('')
+        self.stream_buffer.reset()
+        self.newline_withheld = False
+        self.text_buffer.set_text('')
+        self.full_output_button.set_visible(False)
+
+    def export_nbformat(self, text=None):
+        ''' with text == None all of the output is exported. '''
 
-    def export_nbformat(self):
         return nbformat.v4.new_output(
             output_type='stream',
             name=self.stream_type,
-            text=self.result_text
+            text=self.get_full_text() if text == None else text
         )
             
 
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import collections
+import shutil
+import tempfile
+
+
+class StreamBuffer():
+    ''' Append only text of a stdout / stderr stream.
+
+        Finished lines are collected in pieces, joined to a chunk once
+        they add up to chunk_size characters, so adding text never copies
+        what came before. The current (last, unterminated) line is kept
+        apart: a carriage return starts it over, like it is done for
+        progress bars. As in Jupyter, text after the last carriage return
+        of a line replaces the whole line. It is kept in pieces as well, a
+        current line longer than max_line_length is taken as finished and
+        counts toward max_memory, a carriage return then only starts over
+        what came after.
+
+        With max_memory set, once the finished text grows past it, all of
+        it goes to a temporary file from then on. Only a head and a tail of
+        about max_memory / 2 characters each stay in memory, separated by
+        omission_marker. '''
+
+    chunk_size = 65536
+    omission_marker = '\n[... output truncated ...]\n\n'
+
+    def __init__(self, max_memory=None):
+        self.max_memory = max_memory
+        self.max_line_length = self.chunk_size if max_memory == None else max(1, min(self.chunk_size, max_memory // 2))
+
+        self.chunks = list()
+        self.pieces = list()
+        self.pieces_length = 0
+        self.line_pieces = list()
+        self.line_length = 0
+
+        # text ended with '\r', the next text starts the line over
+        self.carriage_return_pending = False
+
+        # length of all finished text, including what was spilled
+        self.length = 0
+
+        # only used after spilling
+        self.spill_file = None
+        self.head = ''
+        self.tail_pieces = collections.deque()
+        self.tail_length = 0
+
+    def add(self, text):
+        ''' returns a dict describing how to keep a view in sync. with
+            'reset' replace its text by 'inserted'. otherwise delete
+            'trimmed' characters after the first get_kept_head_length()
+            ones, then 'deleted' characters from the end, then append
+            'inserted'. '''
+
+        update = {'reset': False, 'trimmed': 0, 'deleted': 0, 'inserted': ''}
+
+        if not self.carriage_return_pending and '\r' not in text:
+            head, newline, tail = text.rpartition('\n')
+            if newline == '' and self.line_length + len(text) <= self.max_line_length:
+                self.line_pieces.append(text)
+                self.line_length += len(text)
+                update['inserted'] = text
+                return update
+            finished_text = self.get_current_line() + head + newline
+            current_line = tail
+        else:
+            text = self.get_current_line() + ('\r' if self.carriage_return_pending else '') + text
+            lines = text.replace('\r\n', '\n').split('\n')
+            finished_text = ''.join(self.resolve_carriage_returns(line) + '\n' for line in lines[:-1])
+            self.carriage_return_pending = lines[-1].endswith('\r')
+            current_line = self.resolve_carriage_returns(lines[-1].rstrip('\r'))
+
+        if len(current_line) > self.max_line_length:
+            finished_text += current_line
+            current_line = ''
+
+        update['deleted'] = self.line_length
+        self.line_pieces = [current_line] if current_line != '' else list()
+        self.line_length = len(current_line)
+        excess = self.add_finished_text(finished_text, update)
+        if update['reset']:
+            update['inserted'] = self.get_text()
+        else:
+            update['inserted'] = finished_text[excess:] + current_line
+        return update
+
+    def get_current_line(self):
+        ''' the last, unterminated line, joined from its pieces. '''
+
+        if len(self.line_pieces) > 1:
+            self.line_pieces = [''.join(self.line_pieces)]
+        return self.line_pieces[0] if len(self.line_pieces) > 0 else ''
+
+    def resolve_carriage_returns(self, line):
+        return line[line.rfind('\r') + 1:]
+
+    def add_finished_text(self, text, update):
+        ''' returns how many characters at the start of text were dropped
+            from the tail right away. '''
+
+        if len(text) == 0: return 0
+        self.length += len(text)
+
+        if self.is_spilled():
+            self.spill_file.write(text)
+            old_tail_length = self.tail_length
+            self.tail_pieces.append(text)
+            self.tail_length += len(text)
+            trimmed = self.trim_tail()
+            update['trimmed'] = min(trimmed, old_tail_length)
+            return max(0, trimmed - old_tail_length)
+
+        self.pieces.append(text)
+        self.pieces_length += len(text)
+        if self.pieces_length >= self.chunk_size:
+            self.chunks.append(''.join(self.pieces))
+            self.pieces = list()
+            self.pieces_length = 0
+
+        if self.max_memory != None and self.length > self.max_memory:
+            self.spill()
+            update['reset'] = True
+        return 0
+
+    def spill(self):
+        finished_text = ''.join(self.chunks) + ''.join(self.pieces)
+        self.chunks = list()
+        self.pieces = list()
+        self.pieces_length = 0
+
+        self.spill_file = tempfile.NamedTemporaryFile(mode='w+', encoding='utf-8', prefix='porto_output_', suffix='.txt')
+        self.spill_file.write(finished_text)
+
+        head_length = self.max_memory // 2
+        self.head = finished_text[:head_length]
+        self.tail_pieces = collections.deque([finished_text[head_length:]])
+        self.tail_length = len(finished_text) - head_length
+        self.trim_tail()
+
+    def trim_tail(self):
+        ''' drop text from the front of the tail, so no more than
+            max_memory / 2 characters remain. returns how many were dropped. '''
+
+        max_tail_length = self.max_memory - self.max_memory // 2
+        trimmed = 0
+        while self.tail_length > max_tail_length:
+            piece = self.tail_pieces.popleft()
+            excess = self.tail_length - max_tail_length
+            if len(piece) > excess:
+                self.tail_pieces.appendleft(piece[excess:])
+                piece = piece[:excess]
+            self.tail_length -= len(piece)
+            trimmed += len(piece)
+        return trimmed
+
+    def is_spilled(self):
+        return self.spill_file != None
+
+    def get_kept_head_length(self):
+        ''' characters at the start of the view that never change. '''
+
+        if self.is_spilled():
+            return len(self.head) + len(self.omission_marker)
+        return 0
+
+    def get_text(self):
+        ''' the text kept in memory, with omission_marker in place of what
+            went to the spill file only. '''
+
+        if self.is_spilled():
+            return self.head + self.omission_marker + ''.join(self.tail_pieces) + self.get_current_line()
+        return ''.join(self.chunks) + ''.join(self.pieces) + self.get_current_line()
+
+    def get_full_text(self):
+        ''' everything, read back from the spill file if need be. '''
+
+        if self.is_spilled():
+            self.spill_file.flush()
+            with open(self.spill_file.name, 'r', encoding='utf-8') as f:
+                return f.read() + self.get_current_line()
+        return self.get_text()
+
+    def write_full_text(self, pathname):
+        ''' like get_full_text, without reading it all into memory. '''
+
+        with open(pathname, 'w', encoding='utf-8') as f:
+            if self.is_spilled():
+                self.spill_file.flush()
+                with open(self.spill_file.name, 'r', encoding='utf-8') as spill_file:
+                    shutil.copyfileobj(spill_file, f)
+            else:
+                f.write(''.join(self.chunks) + ''.join(self.pieces))
+            f.write(self.get_current_line())
+
+    def get_spill_pathname(self):
+        ''' temporary file with all finished lines, None if not spilled. '''
+
+        if not self.is_spilled(): return None
+        self.spill_file.flush()
+        return self.spill_file.name
+
+    def get_length(self):
+        return self.length + self.line_length
+
+    def is_empty(self):
+        return self.get_length() == 0
+
+    def reset(self):
+        if self.spill_file != None:
+            self.spill_file.close()
+            self.spill_file = None
+        self.head = ''
+        self.tail_pieces = collections.deque()
+        self.tail_length = 0
+        self.length = 0
+
+        self.chunks = list()
+        self.pieces = list()
+        self.pieces_length = 0
+        self.line_pieces = list()
+        self.line_length = 0
+        self.carriage_return_pending = False
+
+
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+from dialogs.dialog import Dialog
+
+
+class DetachKernelsDialog(Dialog):
+    ''' asked on quit: keep kernels running or shut them down '''
+
+    def __init__(self, main_window):
+        self.main_window = main_window
+
+    def run(self, number_of_kernels):
+        ''' returns 'detach', 'shutdown' or None if the user canceled '''
+
+        self.setup(number_of_kernels)
+        response = self.view.run()
+        if response == Gtk.ResponseType.YES:
+            return_value = 'detach'
+        elif response == Gtk.ResponseType.NO:
+            return_value = 'shutdown'
+        else:
+            return_value = None
+        self.close()
+        return return_value
+
+    def setup(self, number_of_kernels):
+        self.view = Gtk.MessageDialog(self.main_window, 0, Gtk.MessageType.QUESTION)
+        if number_of_kernels == 1:
+            self.view.set_property('text', 'Keep the kernel running after quitting?')
+        else:
+            self.view.set_property('text', 'Keep ' + str(number_of_kernels) + ' kernels running after quitting?')
+        self.view.format_secondary_text('Kernels kept running hold on to their state. Notebooks reconnect to them when they are opened again.')
+        self.view.add_button('Cancel', Gtk.ResponseType.CANCEL)
+        self.view.add_button('Shut Down', Gtk.ResponseType.NO)
+        keep_button = self.view.add_button('Keep Running', Gtk.ResponseType.YES)
+        keep_button.get_style_context().add_class(Gtk.STYLE_CLASS_SUGGESTED_ACTION)
+        self.view.set_default_response(Gtk.ResponseType.YES)
+
+
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+from dialogs.dialog import Dialog
+
+
+class ExportTraceDialog(Dialog):
+    ''' File chooser for exporting the execution trace of the session '''
+
+    def __init__(self, main_window):
+        self.main_window = main_window
+
+    def run(self):
+        self.setup()
+        response = self.view.run()
+        if response == Gtk.ResponseType.OK:
+            return_value = self.view.get_filename()
+        else:
+            return_value = None
+        self.close()
+        return return_value
+
+    def setup(self):
+        action = Gtk.FileChooserAction.SAVE
+        buttons = ('_Cancel', Gtk.ResponseType.CANCEL, '_Export', Gtk.ResponseType.OK)
+        self.view = Gtk.FileChooserDialog('Export execution trace', self.main_window, action, buttons)
+        self.view.set_do_overwrite_confirmation(True)
+        self.view.set_current_name('porto_trace.json')
+
+        for widget in self.view.get_header_bar().get_children():
+            if isinstance(widget, Gtk.Button) and widget.get_label() == '_Export':
+                widget.get_style_context().add_class(Gtk.STYLE_CLASS_SUGGESTED_ACTION)
+                widget.set_can_default(True)
+                widget.grab_default()
+
+        file_filter1 = Gtk.FileFilter()
+        file_filter1.add_pattern('*.json')
+        file_filter1.set_name('Chrome Trace Files')
+        self.view.add_filter(file_filter1)
+
+
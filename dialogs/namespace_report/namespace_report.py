@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+from dialogs.dialog import Dialog
+
+
+class NamespaceReportDialog(Dialog):
+    ''' tells what a namespace snapshot or restore did, and what it skipped '''
+
+    max_listed_names = 12
+
+    def __init__(self, main_window):
+        self.main_window = main_window
+
+    def run(self, report):
+        self.setup(report)
+        self.view.run()
+        self.close()
+
+    def setup(self, report):
+        self.view = Gtk.MessageDialog(self.main_window, 0, Gtk.MessageType.INFO, Gtk.ButtonsType.OK)
+        if report['error'] != None or report['report'] == None:
+            self.view.set_property('message-type', Gtk.MessageType.ERROR)
+            self.view.set_property('text', 'Kernel namespace could not be saved or restored.')
+            if report['error'] != None:
+                self.view.format_secondary_text(report['error'])
+            return
+
+        names = report['report']['names']
+        skipped = report['report']['skipped']
+        if report['report']['action'] == 'snapshot':
+            self.view.set_property('text', 'Saved ' + str(len(names)) + ' names of the kernel namespace.')
+        else:
+            self.view.set_property('text', 'Restored ' + str(len(names)) + ' names of the kernel namespace.')
+        if len(skipped) > 0:
+            lines = [name + ' (' + reason + ')' for name, reason in sorted(skipped.items())[:self.max_listed_names]]
+            if len(skipped) > self.max_listed_names:
+                lines.append('and ' + str(len(skipped) - self.max_listed_names) + ' more')
+            self.view.format_secondary_text('Skipped:\n' + '\n'.join(lines))
+
+
@@ -36,7 +36,28 @@ class PreferencesDialog(Dialog):
         self.view.option_pretty_print.set_active(self.settings.get_value('preferences', 'pretty_print'))
         self.view.option_pretty_print.connect('toggled', self.on_button_toggle, 'pretty_print')
 
+        self.view.option_kernel_pool_size.set_value(self.settings.get_value('kernel_pool', 'size'))
+        self.view.option_kernel_pool_size.connect('value-changed', self.on_spin_button_change, 'kernel_pool', 'size')
+
+        self.view.option_pipelined_execution.set_active(self.settings.get_value('preferences', 'pipelined_execution'))
+        self.view.option_pipelined_execution.connect('toggled', self.on_button_toggle, 'pipelined_execution')
+        self.view.option_stop_batch_on_error.set_active(self.settings.get_value('preferences', 'stop_batch_on_error'))
+        self.view.option_stop_batch_on_error.connect('toggled', self.on_button_toggle, 'stop_batch_on_error')
+
+        self.view.option_detachable_kernels.set_active(self.settings.get_value('preferences', 'detachable_kernels'))
+        self.view.option_detachable_kernels.connect('toggled', self.on_button_toggle, 'detachable_kernels')
+        self.view.option_restore_namespace_on_start.set_active(self.settings.get_value('preferences', 'restore_namespace_on_start'))
+        self.view.option_restore_namespace_on_start.connect('toggled', self.on_button_toggle, 'restore_namespace_on_start')
+
+        self.view.option_stall_watchdog.set_active(self.settings.get_value('preferences', 'stall_watchdog'))
+        self.view.option_stall_watchdog.connect('toggled', self.on_button_toggle, 'stall_watchdog')
+        self.view.option_automation_socket.set_active(self.settings.get_value('preferences', 'automation_socket'))
+        self.view.option_automation_socket.connect('toggled', self.on_button_toggle, 'automation_socket')
+
     def on_button_toggle(self, button, preference_name):
         self.settings.set_value('preferences', preference_name, button.get_active())
 
+    def on_spin_button_change(self, button, section, preference_name):
+        self.settings.set_value(section, preference_name, button.get_value_as_int())
+
 
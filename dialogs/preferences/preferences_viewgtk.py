@@ -47,8 +47,12 @@ class Preferences(object):
         self.topbox.pack_start(self.notebook, True, True, 0)
 
         self.build_page_view()
+        self.build_page_kernels()
+        self.build_page_diagnostics()
 
         self.notebook.append_page(self.page_view, Gtk.Label('View'))
+        self.notebook.append_page(self.page_kernels, Gtk.Label('Kernels'))
+        self.notebook.append_page(self.page_diagnostics, Gtk.Label('Diagnostics'))
         
         self.dialog.show_all()
 
@@ -61,6 +65,48 @@ class Preferences(object):
 
         self.option_pretty_print = Gtk.CheckButton("Pretty print results with LaTeX")
         self.page_view.pack_start(self.option_pretty_print, False, False, 0)
+
+    def build_page_kernels(self):
+        self.page_kernels = Gtk.VBox()
+        self.page_kernels.set_margin_start(18)
+        self.page_kernels.set_margin_end(18)
+        self.page_kernels.set_margin_top(18)
+        self.page_kernels.set_margin_bottom(18)
+
+        self.option_kernel_pool_size_box = Gtk.HBox()
+        label = Gtk.Label('Kernels kept ready per language')
+        label.set_xalign(0)
+        self.option_kernel_pool_size = Gtk.SpinButton.new_with_range(0, 8, 1)
+        self.option_kernel_pool_size_box.pack_start(label, True, True, 0)
+        self.option_kernel_pool_size_box.pack_end(self.option_kernel_pool_size, False, False, 0)
+        self.page_kernels.pack_start(self.option_kernel_pool_size_box, False, False, 0)
+
+        self.option_pipelined_execution = Gtk.CheckButton('Send queued cells to the kernel ahead of time')
+        self.option_pipelined_execution.set_margin_top(12)
+        self.page_kernels.pack_start(self.option_pipelined_execution, False, False, 0)
+
+        self.option_stop_batch_on_error = Gtk.CheckButton('Stop running all cells at the first error')
+        self.page_kernels.pack_start(self.option_stop_batch_on_error, False, False, 0)
+
+        self.option_detachable_kernels = Gtk.CheckButton('Offer to keep kernels running after quitting')
+        self.option_detachable_kernels.set_margin_top(12)
+        self.page_kernels.pack_start(self.option_detachable_kernels, False, False, 0)
+
+        self.option_restore_namespace_on_start = Gtk.CheckButton('Offer to restore saved kernel namespaces when opening notebooks')
+        self.page_kernels.pack_start(self.option_restore_namespace_on_start, False, False, 0)
+
+    def build_page_diagnostics(self):
+        self.page_diagnostics = Gtk.VBox()
+        self.page_diagnostics.set_margin_start(18)
+        self.page_diagnostics.set_margin_end(18)
+        self.page_diagnostics.set_margin_top(18)
+        self.page_diagnostics.set_margin_bottom(18)
+
+        self.option_stall_watchdog = Gtk.CheckButton('Record where the user interface stalls')
+        self.page_diagnostics.pack_start(self.option_stall_watchdog, False, False, 0)
+
+        self.option_automation_socket = Gtk.CheckButton('Let scripts control Porto through a local socket')
+        self.page_diagnostics.pack_start(self.option_automation_socket, False, False, 0)
     
     def run(self):
         return self.dialog.run()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+from dialogs.dialog import Dialog
+
+
+class RestoreNamespaceDialog(Dialog):
+    ''' asked when a notebook with a saved kernel namespace is opened '''
+
+    def __init__(self, main_window):
+        self.main_window = main_window
+
+    def run(self, notebook_name):
+        ''' returns True if the namespace should be restored '''
+
+        self.setup(notebook_name)
+        response = self.view.run()
+        self.close()
+        return response == Gtk.ResponseType.YES
+
+    def setup(self, notebook_name):
+        self.view = Gtk.MessageDialog(self.main_window, 0, Gtk.MessageType.QUESTION)
+        self.view.set_property('text', 'Restore the saved kernel namespace of »' + notebook_name + '«?')
+        self.view.format_secondary_text('Restoring unpickles the saved snapshot in the kernel, which can run arbitrary code. Only restore snapshots you trust.')
+        self.view.add_button('Don\'t Restore', Gtk.ResponseType.NO)
+        restore_button = self.view.add_button('Restore', Gtk.ResponseType.YES)
+        restore_button.get_style_context().add_class(Gtk.STYLE_CLASS_SUGGESTED_ACTION)
+        self.view.set_default_response(Gtk.ResponseType.NO)
+
+
@@ -18,6 +18,8 @@
 
 import time
 
+import helpers.metrics as metrics
+
 
 def theme_color_to_css(style_context, color_string):
     rgba = style_context.lookup_color(color_string)[1]
@@ -44,7 +46,9 @@ def timer(original_function):
     def new_function(*args, **kwargs):
         start_time = time.time()
         return_value = original_function(*args, **kwargs)
-        print(original_function.__name__ + ': ' + str(time.time() - start_time) + ' seconds')
+        duration = time.time() - start_time
+        metrics.histogram('timer', original_function.__name__ + '_ms').observe(duration * 1000)
+        metrics.get_logger('timer').debug('%s: %s seconds', original_function.__name__, duration)
         return return_value
     
     return  new_function
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import collections
+import json
+import logging
+import math
+import os
+import os.path
+import threading
+import time
+
+
+class Counter():
+    ''' goes up only. '''
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def get_snapshot(self):
+        return {'type': 'counter', 'value': self.value}
+
+
+class Gauge():
+    ''' a value at the time of the snapshot. '''
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get_snapshot(self):
+        return {'type': 'gauge', 'value': self.value}
+
+
+class Histogram():
+    ''' counts of observed values by power of two buckets, like the
+        latency histograms of ExecutionStats. '''
+
+    __slots__ = ('count', 'sum', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+        self.buckets = collections.Counter()
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        self.buckets[1 if value <= 1 else 2 ** math.ceil(math.log2(value))] += 1
+
+    def get_snapshot(self):
+        return {'type': 'histogram', 'count': self.count, 'sum': self.sum, 'max': self.max, 'buckets': sorted(self.buckets.items())}
+
+
+class MetricsRegistry():
+    ''' Metrics by subsystem ('kernel', 'markdown', 'results', 'file_io')
+        and name. Code in hot paths gets its metrics once and keeps them,
+        updating one is an attribute change. Updates don't lock, the
+        kernel and markdown threads count too, a snapshot may be a step
+        behind. '''
+
+    def __init__(self):
+        self.metrics = dict()
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stop_event = None
+        self.snapshot_pathname = None
+
+    def get_metric(self, metric_class, subsystem, name):
+        with self.lock:
+            metric = self.metrics.get((subsystem, name), None)
+            if metric == None:
+                metric = metric_class()
+                self.metrics[(subsystem, name)] = metric
+        if not isinstance(metric, metric_class):
+            raise TypeError(subsystem + '.' + name + ' is a ' + type(metric).__name__)
+        return metric
+
+    def get_snapshot(self):
+        with self.lock:
+            metrics = list(self.metrics.items())
+
+        subsystems = dict()
+        for (subsystem, name), metric in sorted(metrics, key=lambda item: item[0]):
+            subsystems.setdefault(subsystem, dict())[name] = metric.get_snapshot()
+        return {'time': time.time(), 'pid': os.getpid(), 'subsystems': subsystems}
+
+    def write_snapshot(self, pathname):
+        ''' replaces pathname at once, readers never see half a file. '''
+
+        with self.write_lock:
+            with open(pathname + '.tmp', 'w') as f:
+                json.dump(self.get_snapshot(), f)
+            os.replace(pathname + '.tmp', pathname)
+
+    def start_snapshots(self, folder, interval):
+        ''' write folder/metrics.json every interval seconds, from a thread.
+            if folder can't be written to, there are no snapshots. '''
+
+        self.stop_snapshots()
+        if interval <= 0: return
+
+        pathname = folder + '/metrics.json'
+        try:
+            os.makedirs(folder, exist_ok=True)
+            self.write_snapshot(pathname)
+        except OSError as e:
+            get_logger('file_io').warning('metrics snapshots disabled, could not write %s: %s', pathname, e)
+            return
+        self.snapshot_pathname = pathname
+        self.stop_event = threading.Event()
+        thread = threading.Thread(target=self.write_snapshots, args=(self.snapshot_pathname, interval, self.stop_event), name='porto-metrics', daemon=True)
+        thread.start()
+
+    def write_snapshots(self, pathname, interval, stop_event):
+        while not stop_event.wait(interval):
+            try: self.write_snapshot(pathname)
+            except OSError as e:
+                get_logger('file_io').warning('could not write metrics snapshot: %s', e)
+
+    def stop_snapshots(self, write_last=False):
+        if self.stop_event != None:
+            self.stop_event.set()
+            self.stop_event = None
+            if write_last:
+                # called on quit, which must not fail on a full disk
+                try: self.write_snapshot(self.snapshot_pathname)
+                except OSError as e:
+                    get_logger('file_io').warning('could not write metrics snapshot: %s', e)
+
+
+registry = MetricsRegistry()
+
+
+def counter(subsystem, name):
+    return registry.get_metric(Counter, subsystem, name)
+
+
+def gauge(subsystem, name):
+    return registry.get_metric(Gauge, subsystem, name)
+
+
+def histogram(subsystem, name):
+    return registry.get_metric(Histogram, subsystem, name)
+
+
+def get_logger(subsystem):
+    ''' loggers of all subsystems are below 'porto'. pass arguments to
+        the log calls instead of formatting, then a message below the level
+        costs a comparison. '''
+
+    return logging.getLogger('porto.' + subsystem)
+
+
+def set_log_level(level_name):
+    ''' 'debug', 'info', 'warning', 'error' or 'off', messages go to stderr. '''
+
+    logger = logging.getLogger('porto')
+    if len(logger.handlers) == 0:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        logger.addHandler(handler)
+        logger.propagate = False
+    if level_name == 'off':
+        logger.setLevel(logging.CRITICAL + 1)
+    else:
+        logger.setLevel(getattr(logging, level_name.upper()))
+
+
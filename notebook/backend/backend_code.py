@@ -18,13 +18,17 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import GObject
+from gi.repository import GLib
 
-import jupyter_client
-import _thread as thread
-import queue
 import time
+import nbformat
 
+from notebook.backend.kernel import Kernel, Query
+import notebook.backend.namespace_snapshot as namespace_snapshot
+from notebook.backend.execution_stats import ExecutionStats
+from notebook.backend.completion_cache import CompletionCache
 from helpers.observable import Observable
+import helpers.metrics as metrics
 from app.service_locator import ServiceLocator
 
 
@@ -35,80 +39,343 @@ class BackendCode(Observable):
         self.kernel = None
         self.notebook = notebook
         self.continue_fetching = True
-        self.result_factory = ServiceLocator.get_result_factory()
-        self.fetch_func_id = GObject.timeout_add(50, self.fetch_results)
+        self.kernel_loop = ServiceLocator.get_kernel_loop()
+        self.kernel_pool = ServiceLocator.get_kernel_pool()
+        self.detached_kernels = ServiceLocator.get_detached_kernels()
+        self.settings = ServiceLocator.get_settings()
+        self.settings.register_observer(self)
+
+        self.execution_stats = ExecutionStats()
+
+        # most recent query of each cell still in the kernel
+        self.latest_queries = dict()
+
+        # namespace snapshot / restore query -> {'texts', 'error'}
+        self.namespace_queries = dict()
+
+        self.completion_cache = CompletionCache()
+
+        self.logger = metrics.get_logger('kernel')
+        self.messages_counter = metrics.counter('kernel', 'messages')
+        self.errors_counter = metrics.counter('kernel', 'errors')
+        self.fetch_histogram = metrics.histogram('kernel', 'fetch_ms')
+        self.query_histogram = metrics.histogram('kernel', 'query_ms')
+
+        # seconds per main loop iteration spent on handing on kernel results
+        self.fetch_time_budget = 0.02
+
+    def change_notification(self, change_code, notifying_object, parameter):
+
+        if change_code == 'settings_changed':
+            section, item, value = parameter
+            if (section, item) in [('preferences', 'pipelined_execution'), ('preferences', 'pipeline_depth')]:
+                self.update_pipeline_depth()
+            if section == 'output':
+                self.update_rate_limits()
+
+    def update_pipeline_depth(self):
+        if self.kernel != None:
+            if self.settings.get_value('preferences', 'pipelined_execution'):
+                self.kernel.set_pipeline_depth(self.settings.get_value('preferences', 'pipeline_depth'))
+            else:
+                self.kernel.set_pipeline_depth(1)
+
+    def update_rate_limits(self):
+        if self.kernel != None:
+            messages_per_second = self.settings.get_value('output', 'max_messages_per_second')
+            bytes_per_second = self.settings.get_value('output', 'max_bytes_per_second')
+            max_pending_bytes = self.settings.get_value('output', 'max_pending_bytes')
+            self.kernel.set_rate_limits(messages_per_second, bytes_per_second, max_pending_bytes)
+
+    def get_output_counters(self):
+        if self.kernel == None: return None
+        return self.kernel.get_output_counters()
+
+    def get_queue_depth(self):
+        ''' cells with queries in the kernel, queued or running. '''
+
+        return len(self.latest_queries)
+
+    def on_kernel_results(self):
+        ''' called from the kernel loop thread, hands over to the main loop. '''
+
+        GLib.idle_add(self.fetch_results)
 
     def fetch_results(self):
-        if self.kernel == None: return True
+        ''' drain the kernel result queue, stop when the time budget for
+            this main loop iteration is used up. consecutive stream
+            messages for the same cell are handed on as one chunk. '''
+
+        if self.kernel == None: return False
+        kernel = self.kernel
+        kernel.reset_results_pending()
+
+        start_time = time.time()
+        deadline = start_time + self.fetch_time_budget
+        stream_chunk = None
+        results_left = True
+        while time.time() < deadline:
+            result = kernel.get_result()
+            if result == None:
+                results_left = False
+                break
+            self.messages_counter.inc()
+
+            stream_output = self.get_stream_output(result)
+            if stream_output != None:
+                if stream_chunk != None and stream_chunk['cell'] == stream_output['cell'] and stream_chunk['stream_type'] == stream_output['stream_type']:
+                    stream_chunk['texts'].append(stream_output['text'])
+                else:
+                    self.add_stream_chunk(stream_chunk)
+                    stream_chunk = {'cell': stream_output['cell'], 'stream_type': stream_output['stream_type'], 'texts': [stream_output['text']]}
+            else:
+                self.add_stream_chunk(stream_chunk)
+                stream_chunk = None
+                self.handle_result(result)
+        self.add_stream_chunk(stream_chunk)
+        self.fetch_histogram.observe((time.time() - start_time) * 1000)
+        return results_left
+
+    def get_stream_output(self, result):
+        if result.result_msg == None or result.cell == None: return None
+        if result.result_msg['header']['msg_type'] != 'stream': return None
 
-        result = self.kernel.get_result()
-        if result:
-            if result.result_message == 'evaluation_stopped':
+        text = result.result_msg['content'].get('text', None)
+        stream_type = result.result_msg['content'].get('name', None)
+        if text == None or stream_type == None: return None
+        return {'cell': result.cell, 'text': text, 'stream_type': stream_type}
+
+    def add_stream_chunk(self, stream_chunk):
+        if stream_chunk != None:
+            self.add_change_code('stream_output', {'cell': stream_chunk['cell'], 'text': ''.join(stream_chunk['texts']), 'stream_type': stream_chunk['stream_type']})
+
+    def handle_result(self, result):
+
+        # whatever ran may have changed the namespace
+        if result.result_msg != None and result.result_msg['header']['msg_type'] == 'status' and result.result_msg['content'].get('execution_state', '') == 'idle':
+            self.completion_cache.invalidate()
+
+        if result.query != None and result.query in self.namespace_queries:
+            self.handle_namespace_result(result)
+
+        elif result.result_message == 'output_rate_limited':
+            self.add_change_code('stream_output', {'cell': result.cell, 'stream_type': 'stderr', 'text': '[output rate limited, some output was dropped]\n'})
+
+        elif result.result_message == 'evaluation_stopped':
+
+            # a cell evaluated again is still busy with the new query
+            if result.query == None or self.latest_queries.get(result.cell, None) == result.query:
+                self.latest_queries.pop(result.cell, None)
                 self.add_change_code('cell_evaluation_stopped', result.cell)
 
-            elif result.result_msg != None and result.cell != None:
-                result_msg = result.result_msg
-                msg_type = result_msg['header']['msg_type']
-
-                if msg_type == 'error':
-                    result_object = self.result_factory.get_error_from_result_message(result_msg)
-                    self.add_change_code('evaluation_result', {'cell': result.cell, 'result': result_object})
-
-                if msg_type == 'execute_input' and result.cell != None:
-                    self.add_change_code('evaluation_started', result)
-
-                if msg_type == 'stream':
-                    text = result_msg['content'].get('text', None)
-                    stream_type = result_msg['content'].get('name', None)
-                    if text != None and stream_type != None:
-                        self.add_change_code('stream_output', {'cell': result.cell, 'text': text, 'stream_type': stream_type})
-
-                if msg_type == 'execute_result':
-                    data = result_msg['content'].get('data', None)
-                    result_object = self.result_factory.get_result_from_blob(data)
-                    self.add_change_code('evaluation_result', {'cell': result.cell, 'result': result_object})
-
-                if msg_type == 'display_data':
-                    data = result_msg['content'].get('data', None)
-                    result_object = self.result_factory.get_result_from_blob(data)
-                    self.add_change_code('evaluation_result', {'cell': result.cell, 'result': result_object})
-
-                if msg_type == 'status':
-                    if result_msg['content'].get('execution_state', '') == 'idle':
-                        self.add_change_code('kernel_started')
-                        if result.cell != None:
+        elif result.result_msg != None and result.cell != None:
+            result_msg = result.result_msg
+            msg_type = result_msg['header']['msg_type']
+
+            if msg_type == 'execute_input' and result.cell != None:
+                if result.query != None:
+                    result.query.execution_count = result_msg['content'].get('execution_count', None)
+                    result.query.execution_metadata['iopub.execute_input'] = self.get_message_date(result_msg)
+                self.add_change_code('evaluation_started', result)
+
+            # widgets are made later from the nbformat output, see
+            # CodeResultRevealerPresenter
+            if msg_type == 'error':
+                self.errors_counter.inc()
+
+            if msg_type in ['execute_result', 'display_data', 'error']:
+                display_id = result_msg['content'].get('transient', dict()).get('display_id', None)
+                self.add_change_code('output', {'cell': result.cell, 'query': result.query, 'output': nbformat.v4.output_from_msg(result_msg), 'display_id': display_id})
+
+            if msg_type == 'update_display_data':
+                content = result_msg['content']
+                display_id = content.get('transient', dict()).get('display_id', None)
+                if display_id != None:
+                    self.add_change_code('update_display_data', {'display_id': display_id, 'data': content.get('data', None)})
+
+            if msg_type == 'clear_output':
+                self.add_change_code('clear_output', {'cell': result.cell, 'wait': result_msg['content'].get('wait', False)})
+
+            if msg_type == 'status':
+                if result_msg['content'].get('execution_state', '') == 'idle':
+                    self.add_change_code('kernel_started')
+                    if result.query != None:
+                        self.execution_stats.add_query(result.query)
+                        timestamps = result.query.timestamps
+                        if 'enqueued' in timestamps and 'idle' in timestamps:
+                            self.query_histogram.observe((timestamps['idle'] - timestamps['enqueued']) * 1000)
+                    if result.cell != None:
+                        if result.query != None and result.query.execution_count != None:
+                            result.query.execution_metadata['iopub.status.idle'] = self.get_message_date(result_msg)
+                            self.add_change_code('execution_info', {'cell': result.cell, 'query': result.query, 'execution_count': result.query.execution_count, 'execution': result.query.execution_metadata})
+
+                        # a cell evaluated again is still busy with the new query
+                        if result.query == None or self.latest_queries.get(result.cell, None) == result.query:
+                            self.latest_queries.pop(result.cell, None)
                             self.add_change_code('cell_evaluation_stopped', result.cell)
-                    else:
-                        print(result_msg['content'])
-        return True
+                elif result_msg['content'].get('execution_state', '') == 'busy':
+                    if result.query != None:
+                        result.query.execution_metadata['iopub.status.busy'] = self.get_message_date(result_msg)
+                else:
+                    self.logger.debug('kernel status: %s', result_msg['content'])
+
+    def handle_namespace_result(self, result):
+        namespace_query = self.namespace_queries[result.query]
+        done = False
+        if result.result_message == 'evaluation_stopped':
+            namespace_query['error'] = 'evaluation stopped'
+            done = True
+        elif result.result_msg != None:
+            result_msg = result.result_msg
+            msg_type = result_msg['header']['msg_type']
+            if msg_type == 'stream':
+                namespace_query['texts'].append(result_msg['content'].get('text', ''))
+            elif msg_type == 'error':
+                namespace_query['error'] = result_msg['content'].get('ename', '') + ': ' + result_msg['content'].get('evalue', '')
+            elif msg_type == 'status' and result_msg['content'].get('execution_state', '') == 'idle':
+                done = True
+
+        if done:
+            del(self.namespace_queries[result.query])
+            report = namespace_snapshot.get_report(''.join(namespace_query['texts']))
+            self.add_change_code('namespace_query_done', {'report': report, 'error': namespace_query['error']})
+
+    def get_message_date(self, result_msg):
+        ''' header.date in ISO 8601 format, jupyter_client hands it on as
+            datetime. '''
+
+        date = result_msg['header'].get('date', '')
+        return date.isoformat() if hasattr(date, 'isoformat') else str(date)
 
     def start_kernel(self):
+        kernelname = self.notebook.get_kernelname()
+        if self.kernel == None:
+            item = self.detached_kernels.get_item(self.notebook.get_pathname())
+            if item != None and item['kernelname'] == kernelname:
+                self.kernel = Kernel(kernelname, self.notebook.get_folder(), self.kernel_loop, self.on_kernel_results, item['connection_file'], attach=True)
+                self.detached_kernels.add_item(self.notebook.get_pathname(), kernelname, item['connection_file'])
+
+        # pooled kernels die with the application, detachable ones are
+        # started independently.
+        if self.kernel == None and self.settings.get_value('preferences', 'detachable_kernels'):
+            connection_file = self.detached_kernels.get_new_connection_file()
+            self.kernel = Kernel(kernelname, self.notebook.get_folder(), self.kernel_loop, self.on_kernel_results, connection_file)
+            self.detached_kernels.add_item(self.notebook.get_pathname(), kernelname, connection_file)
         if self.kernel == None:
-            self.kernel = Kernel(self.notebook.get_kernelname(), self.notebook.get_folder())
+            self.kernel = self.kernel_pool.claim(kernelname, self.notebook.get_folder(), self.on_kernel_results)
+        if self.kernel == None:
+            self.kernel = Kernel(kernelname, self.notebook.get_folder(), self.kernel_loop, self.on_kernel_results)
+        self.update_pipeline_depth()
+        self.update_rate_limits()
+        self.completion_cache.invalidate()
         self.add_change_code('kernel_started')
 
-    def run_cell(self, cell):
+    def is_namespace_snapshot_supported(self):
+        return namespace_snapshot.is_supported(ServiceLocator.get_kernelspecs().get_language(self.notebook.get_kernelname()))
+
+    def snapshot_namespace(self, pathname):
+        self.run_namespace_query(namespace_snapshot.get_snapshot_code(pathname))
+
+    def restore_namespace(self, pathname):
+        self.run_namespace_query(namespace_snapshot.get_restore_code(pathname))
+
+    def has_attached_kernel(self):
+        ''' attached kernels kept their namespace, there is nothing to
+            restore. '''
+
+        return self.kernel != None and self.kernel.attached
+
+    def run_namespace_query(self, code):
+        if self.kernel == None:
+            self.start_kernel()
+        query = Query(None, code, silent=True)
+        self.namespace_queries[query] = {'texts': list(), 'error': None}
+        self.kernel.add_query(query)
+
+    def run_cell(self, cell, lane='interactive'):
         if self.kernel == None:
             self.start_kernel()
-        query = Query(cell, cell.get_all_text().strip())
+        query = Query(cell, cell.get_all_text().strip(), lane)
+        self.latest_queries[cell] = query
         self.kernel.add_query(query)
         self.add_change_code('query_queued', query)
+        return query
+
+    def get_cached_completions(self, code, cursor_pos):
+        return self.completion_cache.get_completions(code, cursor_pos)
+
+    def request_completions(self, code, cursor_pos, callback):
+        ''' callback is called in the main loop with {'matches',
+            'cursor_start', 'cursor_end'}, or None if there are none.
+            returns a future to cancel the request by, None if callback was
+            called right away. '''
+
+        content = self.completion_cache.get_completions(code, cursor_pos)
+        if content != None or self.kernel == None:
+            callback(content)
+            return None
+
+        generation = self.completion_cache.get_generation()
+        future = self.kernel.complete(code, cursor_pos)
+        future.add_done_callback(lambda future: GLib.idle_add(self.on_completion_reply, future, generation, code, cursor_pos, callback))
+        return future
+
+    def on_completion_reply(self, future, generation, code, cursor_pos, callback):
+        if future.cancelled(): return False
+
+        content = future.result()
+        self.completion_cache.add_completions(generation, code, cursor_pos, content)
+        if content == None or content.get('status', None) != 'ok':
+            callback(None)
+        else:
+            callback({'matches': content.get('matches', []), 'cursor_start': content.get('cursor_start', cursor_pos), 'cursor_end': content.get('cursor_end', cursor_pos)})
+        return False
+
+    def request_inspection(self, code, cursor_pos, callback):
+        ''' like request_completions, callback gets the content of the
+            inspect_reply. '''
+
+        content = self.completion_cache.get_inspection(code, cursor_pos)
+        if content != None or self.kernel == None:
+            callback(content)
+            return None
+
+        generation = self.completion_cache.get_generation()
+        future = self.kernel.inspect(code, cursor_pos)
+        future.add_done_callback(lambda future: GLib.idle_add(self.on_inspection_reply, future, generation, code, cursor_pos, callback))
+        return future
+
+    def on_inspection_reply(self, future, generation, code, cursor_pos, callback):
+        if future.cancelled(): return False
+
+        content = future.result()
+        self.completion_cache.add_inspection(generation, code, cursor_pos, 0, content)
+        callback(content if content != None and content.get('status', None) == 'ok' else None)
+        return False
 
     def stop_evaluation_of_cell(self, cell):
         if self.kernel != None:
             self.kernel.remove_queries_by_cell(cell)
 
+    def drop_evaluation_of_cell(self, cell):
+        ''' like stop_evaluation_of_cell, but the caller takes care of the
+            cell's state: no cell_evaluation_stopped follows. '''
+
+        self.latest_queries.pop(cell, None)
+        self.stop_evaluation_of_cell(cell)
+
     def stop_evaluation(self):
         if self.kernel != None:
             self.kernel.remove_all_queries()
-            self.kernel.kernel_manager.interrupt_kernel()
+            self.kernel.interrupt()
 
     def shutdown_for_real(self):
         if self.notebook.get_busy_cell_count() == 0:
             if self.kernel != None:
                 self.kernel.shutdown()
-                self.kernel.kernel_manager.finish_shutdown()
                 self.kernel = None
+                self.latest_queries = dict()
+                self.namespace_queries = dict()
             return False
         return True
 
@@ -116,8 +383,9 @@ class BackendCode(Observable):
         if self.notebook.get_busy_cell_count() == 0:
             if self.kernel != None:
                 self.kernel.shutdown()
-                self.kernel.kernel_manager.finish_shutdown()
                 self.kernel = None
+                self.latest_queries = dict()
+                self.namespace_queries = dict()
             self.start_kernel()
             return False
         return True
@@ -130,150 +398,17 @@ class BackendCode(Observable):
         self.stop_evaluation()
         shutdown_func_id = GObject.timeout_add(50, self.restart_for_real)
 
-    def shutdown_now(self):
-        if self.kernel != None:
-            self.kernel.shutdown()
-            self.kernel.kernel_manager.finish_shutdown()
-            self.kernel = None
-
-
-class Query():
-
-    def __init__(self, cell, code):
-        self.cell = cell
-        self.code = code
-
+    def has_detachable_kernel(self):
+        return self.kernel != None and self.kernel.connection_file != None
 
-class Kernel():
+    def take_kernel(self):
+        ''' detach the kernel, so the caller can shut it down along with
+            others. returns None if there is none. '''
 
-    def __init__(self, kernel_name, cwd):
-        self.query_queue = list()
-        self.query_queue_lock = thread.allocate_lock()
-        self.active_queries = dict()
-        self.active_queries_lock = thread.allocate_lock()
-        self.result_queue = queue.Queue()
-        self.kernel_name = kernel_name
-        self.cwd = cwd
-        self.kernel_started = False
-        thread.start_new_thread(self.run_queries, ())
-
-    def start_kernel(self):
-        self.kernel_manager = jupyter_client.KernelManager()
-        self.kernel_manager.kernel_name = self.kernel_name
-        self.kernel_manager.start_kernel()
-        self.client = self.kernel_manager.blocking_client()
-        self.client.start_channels()
-        try: self.client.wait_for_ready()
-        except RuntimeError: pass
-        else:
-            query_id = self.client.comm_info()
-
-            with self.active_queries_lock:
-                self.active_queries[query_id] = None
-
-            self.add_query(Query(None, 'import os'))
-            self.add_query(Query(None, 'os.chdir("' + self.cwd + '")'))
-
-    def start_fetching(self):
-        thread.start_new_thread(self.fetch_results, ())
-
-    def add_query(self, query):
-        with self.query_queue_lock:
-            self.query_queue.append(query)
-
-    def get_result(self):
-        try:
-            result = self.result_queue.get(block=False)
-        except queue.Empty:
-            return None
-        else:
-            if result.query_id in self.active_queries:
-                if result.result_msg['content'].get('execution_state', '') == 'idle':
-                    del(self.active_queries[result.query_id])
-                return result
-
-    def run_queries(self):
-        while True:
-            time.sleep(0.05)
-            with self.active_queries_lock:
-                nothing_running = (len(self.active_queries) == 0)
-            if not self.kernel_started:
-                self.kernel_started = True
-                self.start_kernel()
-                self.start_fetching()
-            elif nothing_running:
-                with self.query_queue_lock:
-                    try: query = self.query_queue.pop(0)
-                    except IndexError: query = None
-                if query != None:
-                    query_id = self.client.execute(query.code)
-                    with self.active_queries_lock:
-                        self.active_queries[query_id] = query
-
-    def remove_queries_by_cell(self, cell):
-        with self.query_queue_lock:
-            for query in self.query_queue:
-                if query.cell == cell:
-                    self.query_queue.remove(query)
-
-        with self.active_queries_lock:
-            del_ids = list()
-            for query_id, query in self.active_queries.items():
-                if query.cell == cell:
-                    self.kernel_manager.interrupt_kernel()
-                    del_ids.append(query_id)
-            for query_id in del_ids:
-                del(self.active_queries[query_id])
-
-    def remove_all_queries(self):
-        with self.query_queue_lock:
-            queue_empty = (len(self.query_queue) == 0)
-        while not queue_empty:
-            with self.query_queue_lock:
-                try: query = self.query_queue.pop(0)
-                except IndexError: query = None
-            if query != None:
-                result = Result(query.cell)
-                result.result_message = 'evaluation_stopped'
-                self.result_queue.put(result)
-                with self.query_queue_lock:
-                    queue_empty = (len(self.query_queue) == 0)
-
-    def fetch_results(self):
-        while True:
-            '''try: print(self.client.get_stdin_msg(timeout=0.1))
-            except queue.Empty: pass
-            try: print(self.client.get_shell_msg(timeout=0.1))
-            except queue.Empty: pass'''
-            try: result = self.client.get_iopub_msg(timeout=1)
-            except queue.Empty: pass
-            else:
-                try: query_id = result['parent_header']['msg_id']
-                except KeyError: pass
-                else:
-                    if result['parent_header']['msg_type'] == 'shutdown_request':
-                        return
-                    else:
-                        with self.active_queries_lock:
-                            if query_id in self.active_queries:
-                                if self.active_queries[query_id] != None:
-                                    cell = self.active_queries[query_id].cell
-                                else:
-                                    cell = None
-                                result_object = Result(cell, query_id)
-                                result_object.result_msg = result
-                                self.result_queue.put(result_object)
-
-    def shutdown(self):
-        self.client.shutdown()
-
-
-class Result():
-
-    def __init__(self, cell, query_id=None):
-        self.cell = cell
-        self.query_id = query_id
-        self.result_msg = None
-        self.result_message = None
+        kernel = self.kernel
+        self.kernel = None
+        self.latest_queries = dict()
+        self.namespace_queries = dict()
+        return kernel
 
 
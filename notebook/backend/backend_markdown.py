@@ -25,6 +25,8 @@ import queue
 import bleach
 import pypandoc
 
+import helpers.metrics as metrics
+
 
 def evaluate_markdown(text):
 
@@ -220,7 +222,9 @@ class MarkdownQuery():
 
     def evaluate(self):
         self.state = 'busy'
+        start_time = time.time()
         html = evaluate_markdown(self.query_string)
+        metrics.histogram('markdown', 'render_ms').observe((time.time() - start_time) * 1000)
         self.state = 'idle'
         return {'cell': self.cell, 'result_blob': html}
     
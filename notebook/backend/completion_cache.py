@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import collections
+import re
+
+
+class CompletionCache():
+    ''' Replies to complete and inspect requests, for the current
+        generation of the kernel namespace. Running code may change the
+        namespace, so whoever runs it calls invalidate, replies to requests
+        sent before are dropped then.
+
+        Completions are kept by the code before the cursor. While a word is
+        typed on, the matches for its beginning are filtered instead of
+        asking the kernel again. '''
+
+    identifier_regex = re.compile(r'^\w*$')
+
+    def __init__(self, max_items=200):
+        self.max_items = max_items
+        self.generation = 0
+
+        # code before the cursor -> {'matches', 'cursor_start'}
+        self.completions = collections.OrderedDict()
+
+        # (code, cursor_pos, detail_level) -> content of the inspect_reply
+        self.inspections = collections.OrderedDict()
+
+    def invalidate(self):
+        self.generation += 1
+        self.completions.clear()
+        self.inspections.clear()
+
+    def get_generation(self):
+        return self.generation
+
+    def get_completions(self, code, cursor_pos):
+        ''' {'matches', 'cursor_start', 'cursor_end'} as in complete_reply,
+            None if the kernel has to be asked. '''
+
+        prefix = code[:cursor_pos]
+        item = self.completions.get(prefix, None)
+        if item != None:
+            self.completions.move_to_end(prefix)
+            return {'matches': item['matches'], 'cursor_start': item['cursor_start'], 'cursor_end': cursor_pos}
+
+        # the longest cached prefix typed on by word characters only
+        for length in range(len(prefix) - 1, -1, -1):
+            if not self.identifier_regex.match(prefix[length:]): break
+            item = self.completions.get(prefix[:length], None)
+            if item != None and item['cursor_start'] <= length:
+                word = prefix[item['cursor_start']:]
+                matches = [match for match in item['matches'] if match.startswith(word)]
+                return {'matches': matches, 'cursor_start': item['cursor_start'], 'cursor_end': cursor_pos}
+        return None
+
+    def add_completions(self, generation, code, cursor_pos, content):
+        ''' content of a complete_reply to a request sent in generation. '''
+
+        if generation != self.generation or content == None or content.get('status', None) != 'ok': return
+        if content.get('cursor_end', cursor_pos) != cursor_pos: return
+
+        self.completions[code[:cursor_pos]] = {'matches': list(content.get('matches', [])), 'cursor_start': content.get('cursor_start', cursor_pos)}
+        self.completions.move_to_end(code[:cursor_pos])
+        while len(self.completions) > self.max_items:
+            self.completions.popitem(last=False)
+
+    def get_inspection(self, code, cursor_pos, detail_level=0):
+        key = (code, cursor_pos, detail_level)
+        content = self.inspections.get(key, None)
+        if content != None:
+            self.inspections.move_to_end(key)
+        return content
+
+    def add_inspection(self, generation, code, cursor_pos, detail_level, content):
+        if generation != self.generation or content == None or content.get('status', None) != 'ok': return
+
+        self.inspections[(code, cursor_pos, detail_level)] = content
+        while len(self.inspections) > self.max_items:
+            self.inspections.popitem(last=False)
+
+
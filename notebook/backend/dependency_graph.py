@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import ast
+import re
+
+
+class CellAnalysis():
+    ''' Names a code cell binds at top level (definitions) and names it
+        reads that may come from cells before it (uses). Cells that can't
+        be parsed, or star imports, make it unknown: such a cell is taken to
+        define and use everything. '''
+
+    # IPython syntax that isn't Python: magics, shell commands, help
+    ipython_line_regex = re.compile(r'^\s*(%|!|\?)|\?\s*$')
+
+    scope_types = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda, ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)
+
+    def __init__(self, source):
+        self.source = source
+        self.definitions = set()
+        self.uses = set()
+        self.unknown = False
+
+        if source.lstrip().startswith('%%'):
+            self.unknown = True
+            return
+        lines = ['pass' if self.ipython_line_regex.search(line) else line for line in source.split('\n')]
+        try: module = ast.parse('\n'.join(lines))
+        except (SyntaxError, ValueError):
+            self.unknown = True
+            return
+
+        # in statement order, so 'x = x + 1' uses the x of an earlier cell
+        for statement in module.body:
+            self.add_names(statement, self.definitions, self.uses)
+
+    def get_names(self, node):
+        ''' (bound, read) names of node, as seen from the enclosing scope.
+            names are read only if they aren't bound before within node,
+            so 'for i in range(3): print(i)' doesn't read i. '''
+
+        definitions, uses = set(), set()
+
+        if isinstance(node, self.scope_types):
+            for child in self.get_outer_nodes(node):
+                self.add_names(child, definitions, uses)
+            definitions_inner, uses_inner = self.get_inner_names(node)
+
+            # a function body runs when called, after its name is bound
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                definitions.add(node.name)
+            uses |= uses_inner - definitions
+            definitions |= definitions_inner
+            if isinstance(node, ast.ClassDef):
+                definitions.add(node.name)
+            return definitions, uses
+
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                uses.add(node.id)
+            else:
+                definitions.add(node.id)
+            return definitions, uses
+
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == '*':
+                    self.unknown = True
+                else:
+                    definitions.add(alias.asname if alias.asname != None else alias.name.split('.')[0])
+            return definitions, uses
+
+        if isinstance(node, ast.AugAssign):
+            definitions_target, uses_target = self.get_names(node.target)
+            uses |= definitions_target | uses_target
+            self.add_names(node.value, definitions, uses)
+            definitions |= definitions_target
+            return definitions, uses
+
+        if isinstance(node, ast.ExceptHandler):
+            if node.type != None:
+                self.add_names(node.type, definitions, uses)
+            if node.name != None:
+                definitions.add(node.name)
+            for child in node.body:
+                self.add_names(child, definitions, uses)
+            return definitions, uses
+
+        # a.b = c and a[b] = c change a
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(node.ctx, ast.Load):
+            base = node.value
+            while isinstance(base, (ast.Attribute, ast.Subscript)):
+                base = base.value
+            if isinstance(base, ast.Name):
+                definitions.add(base.id)
+                uses.add(base.id)
+
+        for child in self.get_child_nodes(node):
+            self.add_names(child, definitions, uses)
+        return definitions, uses
+
+    def add_names(self, node, definitions, uses):
+        ''' names of node, evaluated after what is in definitions and uses
+            already. '''
+
+        definitions_child, uses_child = self.get_names(node)
+        uses |= uses_child - definitions
+        definitions |= definitions_child
+
+    def get_child_nodes(self, node):
+        ''' children of node in the order they are evaluated in, as far as
+            binding goes: values come before the targets they are bound to. '''
+
+        if isinstance(node, ast.Assign):
+            return [node.value] + node.targets
+        if isinstance(node, ast.AnnAssign):
+            return [node.annotation] + ([node.value] if node.value != None else []) + [node.target]
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            return [node.iter, node.target] + node.body + node.orelse
+        if hasattr(ast, 'NamedExpr') and isinstance(node, ast.NamedExpr):
+            return [node.value, node.target]
+        return ast.iter_child_nodes(node)
+
+    def get_outer_nodes(self, node):
+        ''' parts of a scope node evaluated in the enclosing scope. '''
+
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            return [node.generators[0].iter]
+        outer_nodes = list()
+        if not isinstance(node, ast.Lambda):
+            outer_nodes += node.decorator_list
+        if isinstance(node, ast.ClassDef):
+            outer_nodes += node.bases + [keyword.value for keyword in node.keywords]
+        else:
+            outer_nodes += node.args.defaults + [default for default in node.args.kw_defaults if default != None]
+        return outer_nodes
+
+    def get_inner_names(self, node):
+        ''' (bound, read) names of the scope of node, as seen from the
+            enclosing scope. '''
+
+        if isinstance(node, ast.ClassDef):
+            return self.get_scope_names(node.body, set(), is_class=True)
+        if isinstance(node, ast.Lambda):
+            return self.get_scope_names([node.body], self.get_parameters(node.args))
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return self.get_scope_names(node.body, self.get_parameters(node.args))
+
+        inner_nodes = list()
+        for generator in node.generators:
+            if generator != node.generators[0]:
+                inner_nodes.append(generator.iter)
+            inner_nodes.append(generator.target)
+            inner_nodes += generator.ifs
+        inner_nodes += [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        return self.get_scope_names(inner_nodes, set())
+
+    def get_scope_names(self, nodes, parameters, is_class=False):
+        ''' names of a nested scope: its free names are uses of the
+            enclosing one, only names declared global are bound there.
+            names bound in a function are local all through it, names bound
+            in a class body only from there on and not in its methods. '''
+
+        local_definitions, local_uses = set(parameters), set()
+        global_names = set()
+        for node in nodes:
+            for child in ast.walk(node):
+                if isinstance(child, (ast.Global, ast.Nonlocal)):
+                    global_names |= set(child.names)
+            if is_class:
+                local_uses |= self.get_nested_uses(node)
+            self.add_names(node, local_definitions, local_uses)
+        if not is_class:
+            local_uses -= local_definitions - global_names
+        return local_definitions & global_names, local_uses
+
+    def get_nested_uses(self, node):
+        ''' free names of the scopes in node, node included. '''
+
+        uses = set()
+        if isinstance(node, self.scope_types):
+            uses |= self.get_inner_names(node)[1]
+            children = self.get_outer_nodes(node)
+        else:
+            children = ast.iter_child_nodes(node)
+        for child in children:
+            uses |= self.get_nested_uses(child)
+        return uses
+
+    def get_parameters(self, arguments):
+        parameters = set()
+        for argument in getattr(arguments, 'posonlyargs', []) + arguments.args + arguments.kwonlyargs:
+            parameters.add(argument.arg)
+        if arguments.vararg != None: parameters.add(arguments.vararg.arg)
+        if arguments.kwarg != None: parameters.add(arguments.kwarg.arg)
+        return parameters
+
+
+class DependencyGraph():
+    ''' Def/use relations between the code cells of a notebook. Analyses
+        are cached per cell and redone only when its source changed. '''
+
+    def __init__(self):
+        self.analyses = dict()
+
+    def get_analysis(self, cell, source):
+        analysis = self.analyses.get(cell, None)
+        if analysis == None or analysis.source != source:
+            analysis = CellAnalysis(source)
+            self.analyses[cell] = analysis
+        return analysis
+
+    def remove_cell(self, cell):
+        self.analyses.pop(cell, None)
+
+    def get_dependents(self, cell, cells_and_sources, changed_names=None):
+        ''' cells after cell (from cells_and_sources, a list of (cell, source)
+            in notebook order) that read what cell binds, directly or through
+            other dependents. changed_names are taken as bound by cell in
+            addition, e.g. names it bound before an edit. '''
+
+        position = [item[0] for item in cells_and_sources].index(cell)
+        analysis = self.get_analysis(cell, cells_and_sources[position][1])
+        changed = set(analysis.definitions) | (changed_names or set())
+        everything_changed = analysis.unknown
+
+        dependents = list()
+        for other_cell, source in cells_and_sources[position + 1:]:
+            other = self.get_analysis(other_cell, source)
+            if everything_changed or other.unknown or len(changed & other.uses) > 0:
+                dependents.append(other_cell)
+                changed |= other.definitions
+                everything_changed = everything_changed or other.unknown
+            else:
+                # bound anew here, later cells see this cell's value
+                changed -= other.definitions
+        return dependents
+
+    def get_dependencies(self, cell, cells_and_sources):
+        ''' cells before cell that bind what it reads, directly or through
+            other dependencies, in notebook order. only the last cell binding
+            a name counts. '''
+
+        position = [item[0] for item in cells_and_sources].index(cell)
+        analysis = self.get_analysis(cell, cells_and_sources[position][1])
+        needed = set(analysis.uses)
+        everything_needed = analysis.unknown
+
+        dependencies = list()
+        for other_cell, source in reversed(cells_and_sources[:position]):
+            other = self.get_analysis(other_cell, source)
+            if everything_needed or other.unknown or len(needed & other.definitions) > 0:
+                dependencies.append(other_cell)
+                needed = (needed - other.definitions) | other.uses
+                everything_needed = everything_needed or other.unknown
+        dependencies.reverse()
+        return dependencies
+
+
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import os
+import os.path
+import pickle
+import time
+import uuid
+
+from notebook.backend.kernel import Kernel
+
+
+class DetachedKernels(object):
+    ''' Keeps track of kernels that outlive the application, so notebooks
+        can attach to them again when they are reopened. Items are stored
+        by notebook pathname next to the recently opened list, the
+        connection files of their kernels go to ~/.porto/kernels. '''
+
+    def __init__(self, kernel_loop, settings):
+        self.kernel_loop = kernel_loop
+        self.settings = settings
+
+        self.pathname = os.path.expanduser('~') + '/.porto'
+        self.kernels_folder = self.pathname + '/kernels'
+
+        # notebook pathname -> {'pathname', 'kernelname', 'connection_file', 'date'}
+        self.items = dict()
+        self.populate_from_disk()
+
+    def get_new_connection_file(self):
+        if not os.path.isdir(self.kernels_folder):
+            os.makedirs(self.kernels_folder)
+        return self.kernels_folder + '/kernel-' + str(uuid.uuid4()) + '.json'
+
+    def get_item(self, pathname):
+        ''' None if there is no kernel left for the notebook at pathname. '''
+
+        try: item = self.items[pathname]
+        except KeyError: return None
+        if not os.path.isfile(item['connection_file']):
+            self.remove_item(pathname)
+            return None
+        return item
+
+    def add_item(self, pathname, kernelname, connection_file):
+        if pathname == None: return
+        self.items[pathname] = {'pathname': pathname, 'kernelname': kernelname, 'connection_file': connection_file, 'date': time.time()}
+        self.save_to_disk()
+
+    def remove_item(self, pathname):
+        try: del(self.items[pathname])
+        except KeyError: pass
+        else: self.save_to_disk()
+
+    def collect_garbage(self):
+        ''' forget items whose kernel is gone. kernels of notebooks that
+            don't exist any more, or that weren't reopened for more than
+            detached_kernels_max_age days, are shut down in the background,
+            along with kernels of connection files no item refers to. '''
+
+        max_age = self.settings.get_value('preferences', 'detached_kernels_max_age') * 86400
+        stale_connection_files = list()
+        for pathname, item in list(self.items.items()):
+            if not os.path.isfile(item['connection_file']):
+                del(self.items[pathname])
+            elif not os.path.isfile(pathname) or time.time() - item['date'] > max_age:
+                stale_connection_files.append(item['connection_file'])
+                del(self.items[pathname])
+        self.save_to_disk()
+
+        if os.path.isdir(self.kernels_folder):
+            connection_files = set(item['connection_file'] for item in self.items.values())
+            for filename in os.listdir(self.kernels_folder):
+                connection_file = self.kernels_folder + '/' + filename
+                if connection_file not in connection_files and connection_file not in stale_connection_files:
+                    stale_connection_files.append(connection_file)
+
+        # without kernelname, attaching doesn't fall back to a new kernel
+        kernels = list()
+        for connection_file in stale_connection_files:
+            kernels.append(Kernel(None, None, self.kernel_loop, None, connection_file, attach=True))
+        if len(kernels) > 0:
+            self.kernel_loop.shutdown_kernels(kernels, self.settings.get_value('preferences', 'kernel_shutdown_timeout'))
+
+    def populate_from_disk(self):
+        try: filehandle = open(self.pathname + '/detached_kernels.pickle', 'rb')
+        except IOError: pass
+        else:
+            try: self.items = pickle.load(filehandle)
+            except EOFError: pass
+
+    def save_to_disk(self):
+        try: filehandle = open(self.pathname + '/detached_kernels.pickle', 'wb')
+        except IOError: pass
+        else:
+            pickle.dump(self.items, filehandle)
+
+
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import collections
+import json
+import math
+
+
+class ExecutionStats():
+    ''' Latency breakdown of the queries of one notebook, built from the
+        timestamps each Query collects on its way from run_cell to the
+        result being revealed. '''
+
+    # name, from timestamp, to timestamp
+    phases = [
+        ('queued', 'enqueued', 'sent'),
+        ('waiting', 'sent', 'execute_input'),
+        ('running', 'execute_input', 'idle'),
+        ('first_output', 'execute_input', 'first_output'),
+        ('delivery', 'first_output', 'result_built'),
+        ('rendering', 'result_built', 'revealed'),
+        ('total', 'enqueued', 'idle')
+    ]
+
+    def __init__(self, max_queries=10000):
+        self.queries = collections.deque(maxlen=max_queries)
+
+        # phase name -> Counter of upper bucket bounds in ms (powers of two)
+        self.histograms = dict()
+        for phase in self.phases:
+            self.histograms[phase[0]] = collections.Counter()
+
+    def add_query(self, query):
+        ''' call when the kernel is done with query. phases ending in
+            timestamps set after that, like rendering, are added by
+            add_timestamp. '''
+
+        self.queries.append(query)
+        query.execution_stats = self
+        for name, duration in self.get_phase_durations(query):
+            self.histograms[name][self.get_bucket(duration)] += 1
+
+    def add_timestamp(self, query, timestamp_name):
+        ''' count the phases timestamp_name, just set on query, completes. '''
+
+        for name, start, end in self.phases:
+            if timestamp_name in (start, end) and start in query.timestamps and end in query.timestamps:
+                duration = max(0, query.timestamps[end] - query.timestamps[start])
+                self.histograms[name][self.get_bucket(duration)] += 1
+
+    def get_phase_durations(self, query):
+        ''' (phase name, seconds) for all phases query went through. '''
+
+        durations = list()
+        for name, start, end in self.phases:
+            if start in query.timestamps and end in query.timestamps:
+                durations.append((name, max(0, query.timestamps[end] - query.timestamps[start])))
+        return durations
+
+    def get_bucket(self, duration):
+        ''' smallest power of two in ms that is >= duration. '''
+
+        milliseconds = duration * 1000
+        if milliseconds <= 1: return 1
+        return 2 ** math.ceil(math.log2(milliseconds))
+
+    def get_histograms(self):
+        ''' phase name -> sorted list of (bucket upper bound in ms, count). '''
+
+        return {name: sorted(histogram.items()) for name, histogram in self.histograms.items()}
+
+    def get_trace_events(self, pid):
+        ''' queries as Chrome trace events, one thread per phase. '''
+
+        events = list()
+        for tid, (name, start, end) in enumerate(self.phases):
+            if name == 'total': continue
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}})
+            for query in self.queries:
+                if start in query.timestamps and end in query.timestamps:
+                    events.append({
+                        'name': query.get_label(),
+                        'cat': name,
+                        'ph': 'X',
+                        'ts': int(query.timestamps[start] * 1000000),
+                        'dur': max(0, int((query.timestamps[end] - query.timestamps[start]) * 1000000)),
+                        'pid': pid,
+                        'tid': tid,
+                        'args': {'lane': query.lane}
+                    })
+        return events
+
+
+def write_chrome_trace(pathname, stats_by_name):
+    ''' write the stats of several notebooks (name -> ExecutionStats) as
+        Chrome trace event JSON, one process per notebook. the histograms
+        go into the metadata. '''
+
+    events = list()
+    histograms = dict()
+    for pid, (name, stats) in enumerate(sorted(stats_by_name.items()), 1):
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': name}})
+        events.extend(stats.get_trace_events(pid))
+        histograms[name] = stats.get_histograms()
+
+    with open(pathname, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'metadata': {'histograms_ms': histograms}}, f)
+
+
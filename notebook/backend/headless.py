@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import argparse
+import concurrent.futures
+import json
+import os
+import os.path
+import threading
+import time
+
+import nbformat
+
+from notebook.backend.kernel import KernelLoop, Kernel, Query
+from notebook.backend.execution_stats import ExecutionStats
+import notebook.backend.notebook_format as notebook_format
+from cell.result_revealer.stream.stream_buffer import StreamBuffer
+from cell.result_revealer.output import Output
+
+
+class HeadlessCell():
+    ''' What a cell of Notebook keeps, without the views. '''
+
+    # per stream, half the default of output.max_memory_per_cell
+    max_stream_memory = 10000000
+
+    def __init__(self, cell_type, source):
+        self.cell_type = cell_type
+        self.source = source
+
+        self.in_edit_mode = False
+        self.execution_count = None
+        self.execution_metadata = dict()
+        self.cache_output = False
+
+        # same order as CodeResultRevealer.streams
+        self.streams = {'stderr': StreamBuffer(self.max_stream_memory), 'stdout': StreamBuffer(self.max_stream_memory)}
+        self.outputs = list()
+        self.clear_output_pending = False
+
+    def add_outputs(self, outputs):
+        streams, outputs = notebook_format.split_outputs(outputs)
+        for name, text in streams:
+            self.streams[name].add(text)
+        for output in outputs:
+            self.outputs.append(Output(output))
+
+    def clear_output(self):
+        for stream_buffer in self.streams.values():
+            stream_buffer.reset()
+        for output in self.outputs:
+            output.removed = True
+        self.outputs = list()
+        self.clear_output_pending = False
+
+    def apply_pending_clear(self):
+        if self.clear_output_pending:
+            self.clear_output()
+
+    def has_error(self):
+        return any(output.is_error() for output in self.outputs)
+
+    def get_outputs(self, max_saved_length=None):
+        outputs = list()
+        for name, stream_buffer in self.streams.items():
+            if stream_buffer.is_empty(): continue
+            if max_saved_length != None and stream_buffer.get_length() > max_saved_length:
+                text = notebook_format.truncate_text(stream_buffer.get_text(), max_saved_length)
+            else:
+                text = stream_buffer.get_full_text()
+            outputs.append(nbformat.v4.new_output(output_type='stream', name=name, text=text))
+        outputs += [output.export_nbformat() for output in self.outputs]
+        return outputs
+
+
+class HeadlessNotebook():
+    ''' Runs the code cells of a notebook on a Kernel, one after another,
+        without GTK. Notebooks are read and written like Notebook does,
+        outputs are handled like NotebookEvaluator does. '''
+
+    def __init__(self, pathname):
+        self.pathname = pathname
+        self.kernelname = None
+        self.cells = list()
+
+        # display_id -> outputs, for update_display_data
+        self.displays = dict()
+
+        self.execution_stats = ExecutionStats()
+        self.results_available = threading.Event()
+
+    def load(self):
+        nb = nbformat.read(self.pathname, nbformat.current_nbformat)
+        self.kernelname = nb.metadata['kernelspec']['name']
+        for node in nb.cells:
+            if node.cell_type == 'markdown':
+                cell = HeadlessCell('markdown', node.source)
+                cell.in_edit_mode = len(node.source) == 0 or notebook_format.is_markdown_in_edit_mode(node)
+                self.cells.append(cell)
+            elif node.cell_type == 'code':
+                cell = HeadlessCell('code', node.source)
+                cell.execution_count, cell.execution_metadata, cell.cache_output = notebook_format.get_execution_info(node)
+                cell.add_outputs(node.outputs)
+                self.cells.append(cell)
+
+    def save(self, pathname, max_saved_length=None):
+        cell_nodes = list()
+        for cell in self.cells:
+            if cell.cell_type == 'code':
+                cell_nodes.append(notebook_format.new_code_cell(cell.source, cell.execution_count, cell.execution_metadata, cell.cache_output, cell.get_outputs(max_saved_length)))
+            else:
+                cell_nodes.append(notebook_format.new_markdown_cell(cell.source, cell.in_edit_mode))
+        with open(pathname, 'w') as f:
+            nbformat.write(notebook_format.new_notebook(cell_nodes, self.kernelname), f)
+
+    def run(self, kernel_loop, timeout, allow_errors=False, kernelname=None):
+        ''' returns the status: 'ok', 'error' (a cell failed), 'timeout' or
+            'kernel_died'. cells after a failing one only run with
+            allow_errors. '''
+
+        if kernelname != None:
+            self.kernelname = kernelname
+        deadline = time.time() + timeout
+        kernel = Kernel(self.kernelname, os.path.dirname(os.path.abspath(self.pathname)), kernel_loop, self.results_available.set)
+        try:
+            try: kernel.start_future.result(max(0, deadline - time.time()))
+            except concurrent.futures.TimeoutError:
+                return 'timeout'
+            if kernel.state != 'running':
+                return 'kernel_died'
+
+            status = 'ok'
+            for cell in self.cells:
+                if cell.cell_type != 'code': continue
+                cell_status = self.run_cell(kernel, cell, deadline)
+                if cell_status == 'error':
+                    status = 'error'
+                    if not allow_errors: break
+                elif cell_status != 'ok':
+                    kernel.interrupt()
+                    return cell_status
+            return status
+        finally:
+            kernel_loop.shutdown_kernels([kernel], 3).result()
+
+    def run_cell(self, kernel, cell, deadline):
+        cell.execution_count = None
+        cell.execution_metadata = dict()
+        cell.clear_output()
+        self.forget_displays(cell)
+
+        query = Query(cell, cell.source, lane='batch')
+        kernel.add_query(query)
+        while True:
+            if not self.results_available.wait(max(0, deadline - time.time())):
+                return 'timeout'
+            self.results_available.clear()
+            kernel.reset_results_pending()
+
+            result = kernel.get_result()
+            while result != None:
+                if result.result_message == 'kernel_died':
+                    return 'kernel_died'
+                if result.query == query and result.result_msg != None and self.handle_message(cell, query, result.result_msg):
+                    self.execution_stats.add_query(query)
+                    return 'error' if cell.has_error() else 'ok'
+                result = kernel.get_result()
+
+    def handle_message(self, cell, query, message):
+        ''' returns True once the kernel is done with query. '''
+
+        msg_type = message['header']['msg_type']
+        content = message['content']
+
+        if msg_type == 'stream':
+            cell.apply_pending_clear()
+            cell.streams[content.get('name', 'stdout')].add(content.get('text', ''))
+        elif msg_type == 'execute_input':
+            query.execution_count = content.get('execution_count', None)
+            query.execution_metadata['iopub.execute_input'] = get_message_date(message)
+        elif msg_type in ['execute_result', 'display_data', 'error']:
+            cell.apply_pending_clear()
+            display_id = content.get('transient', dict()).get('display_id', None)
+            output = Output(nbformat.v4.output_from_msg(message), display_id)
+            cell.outputs.append(output)
+            if display_id != None:
+                self.displays.setdefault(display_id, list()).append((cell, output))
+        elif msg_type == 'update_display_data':
+            display_id = content.get('transient', dict()).get('display_id', None)
+            for other_cell, output in self.displays.get(display_id, list()):
+                if not output.removed:
+                    output.update_data(content.get('data', dict()))
+        elif msg_type == 'clear_output':
+            if content.get('wait', False):
+                cell.clear_output_pending = True
+            else:
+                cell.clear_output()
+        elif msg_type == 'status':
+            if content.get('execution_state', '') == 'busy':
+                query.execution_metadata['iopub.status.busy'] = get_message_date(message)
+            elif content.get('execution_state', '') == 'idle':
+                if query.execution_count != None:
+                    query.execution_metadata['iopub.status.idle'] = get_message_date(message)
+                    cell.execution_count = query.execution_count
+                    cell.execution_metadata = query.execution_metadata
+                return True
+        return False
+
+    def forget_displays(self, cell):
+        for display_id, displays in list(self.displays.items()):
+            displays = [item for item in displays if item[0] != cell]
+            if len(displays) > 0:
+                self.displays[display_id] = displays
+            else:
+                del(self.displays[display_id])
+
+    def get_timings(self):
+        ''' per code cell phase durations in seconds, see ExecutionStats. '''
+
+        timings = list()
+        for query in self.execution_stats.queries:
+            timings.append({'cell': self.cells.index(query.cell), 'label': query.get_label(), 'phases': dict(self.execution_stats.get_phase_durations(query))})
+        return timings
+
+
+def get_message_date(message):
+    date = message['header'].get('date', '')
+    return date.isoformat() if hasattr(date, 'isoformat') else str(date)
+
+
+def run_notebook(pathname, output_pathname, timeout, allow_errors=False, kernelname=None, max_saved_length=None):
+    ''' run one notebook in a kernel loop of its own, returns its summary.
+        outputs are written even if a cell failed or timed out. '''
+
+    start_time = time.time()
+    summary = {'pathname': pathname, 'output_pathname': output_pathname, 'status': None, 'error': None, 'kernelname': kernelname, 'seconds': None, 'cells': list(), 'histograms_ms': dict()}
+    headless_notebook = HeadlessNotebook(pathname)
+    try:
+        headless_notebook.load()
+        summary['kernelname'] = kernelname or headless_notebook.kernelname
+        summary['status'] = headless_notebook.run(KernelLoop(), timeout, allow_errors, kernelname)
+        headless_notebook.save(output_pathname, max_saved_length)
+    except Exception as e:
+        summary['status'] = 'failed'
+        summary['error'] = type(e).__name__ + ': ' + str(e)
+    summary['cells'] = headless_notebook.get_timings()
+    summary['histograms_ms'] = headless_notebook.execution_stats.get_histograms()
+    summary['seconds'] = time.time() - start_time
+    return summary
+
+
+def get_output_pathname(pathname, output_dir):
+    if output_dir == None: return pathname
+    return os.path.join(output_dir, os.path.basename(pathname))
+
+
+def main(argv=None):
+    ''' run notebooks in parallel processes, print or write a JSON summary.
+        exits with 1 if a notebook didn't run through. '''
+
+    parser = argparse.ArgumentParser(description='Run notebooks without the user interface and write their outputs back.')
+    parser.add_argument('notebooks', nargs='+', metavar='NOTEBOOK')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='notebooks run at the same time')
+    parser.add_argument('-t', '--timeout', type=float, default=600, help='seconds per notebook, kernel start included')
+    parser.add_argument('-k', '--kernel', default=None, help='kernel to use instead of the one of the notebook')
+    parser.add_argument('-o', '--output-dir', default=None, help='write notebooks here instead of overwriting them')
+    parser.add_argument('--allow-errors', action='store_true', help='keep going after a cell failed')
+    parser.add_argument('--max-saved-length', type=int, default=None, help='truncate longer streams when saving, in characters')
+    parser.add_argument('--summary', default=None, help='write the summary here instead of stdout')
+    args = parser.parse_args(argv)
+
+    if args.output_dir != None and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    start_time = time.time()
+    summaries = list()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = list()
+        for pathname in args.notebooks:
+            futures.append(executor.submit(run_notebook, pathname, get_output_pathname(pathname, args.output_dir), args.timeout, args.allow_errors, args.kernel, args.max_saved_length))
+        for future in futures:
+            summaries.append(future.result())
+
+    statuses = dict()
+    for summary in summaries:
+        statuses[summary['status']] = statuses.get(summary['status'], 0) + 1
+    report = {'seconds': time.time() - start_time, 'jobs': args.jobs, 'statuses': statuses, 'notebooks': summaries}
+
+    if args.summary != None:
+        with open(args.summary, 'w') as f:
+            json.dump(report, f, indent=1)
+    else:
+        print(json.dumps(report, indent=1))
+    return 0 if statuses.get('ok', 0) == len(summaries) else 1
+
+
@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import asyncio
+import collections
+import concurrent.futures
+import json
+import os
+import signal
+import threading
+import time
+
+import jupyter_client.asynchronous
+import jupyter_client.connect
+import jupyter_client.manager
+
+from notebook.backend.query_scheduler import QueryScheduler
+from notebook.backend.rate_limiter import RateLimiter
+
+
+class KernelLoop():
+    ''' One asyncio event loop, running in a thread of its own, that
+        drives the kernels of all open notebooks. It sleeps until a kernel
+        socket becomes readable or a call is scheduled on it, so it doesn't
+        cost anything while idle, no matter how many kernels are running. '''
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, name='kernel_loop', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call_soon(self, function, *args):
+        ''' thread safe, schedule function to be called in the loop. '''
+
+        self.loop.call_soon_threadsafe(function, *args)
+
+    def run_coroutine(self, coroutine):
+        ''' thread safe, returns a concurrent.futures.Future. '''
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def shutdown_kernels(self, kernels, timeout):
+        ''' thread safe, shut kernels down all at once. those not done after
+            timeout seconds are killed. returns a concurrent.futures.Future. '''
+
+        return self.run_coroutine(self.shutdown_kernels_in_loop(kernels, timeout))
+
+    async def shutdown_kernels_in_loop(self, kernels, timeout):
+        if len(kernels) == 0: return
+        tasks = dict()
+        for kernel in kernels:
+            tasks[asyncio.ensure_future(kernel.shutdown_in_loop())] = kernel
+        done, pending = await asyncio.wait(tasks.keys(), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*[tasks[task].kill_in_loop() for task in pending])
+
+
+class Kernel():
+    ''' Runs queries on a jupyter kernel, one after another.
+
+        Query bookkeeping happens inside the kernel loop only. Results are
+        put on result_queue and on_results is called (from the kernel loop
+        thread) whenever results become available, the main loop then
+        drains them with get_result. '''
+
+    def __init__(self, kernel_name, cwd, kernel_loop, on_results=None, connection_file=None, attach=False):
+        ''' with cwd == None the kernel stays in the working directory of
+            the application until hand_over is called.
+
+            with connection_file the kernel is detachable: it is started
+            independent of the application and its connection info is
+            written to connection_file. with attach, the kernel described by
+            connection_file is used instead, if it is still alive. '''
+
+        self.kernel_name = kernel_name
+        self.cwd = cwd
+        self.kernel_loop = kernel_loop
+        self.on_results = on_results
+        self.connection_file = connection_file
+
+        # attached kernels aren't our child processes, they are
+        # interrupted and shut down by messages, not by signals.
+        self.attached = False
+        self.pid = None
+
+        # only accessed from inside the kernel loop
+        self.query_queue = QueryScheduler()
+        self.active_queries = dict()
+        self.kernel_manager = None
+        self.client = None
+        self.fetch_task = None
+        self.shell_task = None
+
+        # msg_id -> concurrent.futures.Future of complete / inspect requests
+        self.shell_requests = dict()
+
+        # number of queries sent to the kernel ahead of time, kernels run
+        # them one after another anyway. with more than one, an error
+        # aborts the remaining queries (stop_on_error).
+        self.pipeline_depth = 1
+
+        # possible states: starting, running, dead, shut_down
+        self.state = 'starting'
+
+        # filled in the kernel loop, drained from the main loop
+        self.result_queue = collections.deque()
+        self.results_pending = False
+
+        # stream output past the rate limit, or while the consumer is
+        # behind by more than max_queued_results, is held back here per
+        # (query_id, stream name) and handed on in one message later.
+        self.rate_limiter = RateLimiter()
+        self.max_queued_results = 1000
+        self.pending_streams = collections.OrderedDict()
+        self.flush_scheduled = False
+
+        if attach:
+            self.start_future = self.kernel_loop.run_coroutine(self.attach())
+        else:
+            self.start_future = self.kernel_loop.run_coroutine(self.start())
+
+    async def start(self):
+        self.kernel_manager = jupyter_client.manager.AsyncKernelManager(kernel_name=self.kernel_name)
+        await self.kernel_manager.start_kernel(independent=(self.connection_file != None))
+        self.pid = getattr(self.kernel_manager.provisioner, 'pid', None)
+        if self.connection_file != None:
+            info = self.kernel_manager.get_connection_info()
+            jupyter_client.connect.write_connection_file(self.connection_file, kernel_name=self.kernel_name, pid=self.pid, **info)
+        self.client = self.kernel_manager.client()
+        self.client.start_channels()
+        try: await self.client.wait_for_ready()
+        except RuntimeError:
+            self.state = 'dead'
+            result = Result(None)
+            result.result_message = 'kernel_died'
+            self.put_result(result)
+            return
+        self.set_running()
+
+    async def attach(self):
+        ''' connect to the detached kernel of connection_file, start a new
+            one if it's gone. without kernel_name the kernel is just dead
+            then. '''
+
+        try:
+            with open(self.connection_file, 'r') as f:
+                self.pid = json.load(f).get('pid', None)
+            self.client = jupyter_client.asynchronous.AsyncKernelClient(connection_file=self.connection_file)
+            self.client.load_connection_file()
+            self.client.start_channels()
+
+            # a kernel busy with a long running cell doesn't reply
+            try: await self.client.wait_for_ready(timeout=10)
+            except RuntimeError:
+                if not self.client.hb_channel.is_beating(): raise
+        except (OSError, ValueError, RuntimeError):
+            if self.client != None:
+                self.client.stop_channels()
+                self.client = None
+            if self.kernel_name != None:
+                await self.start()
+            else:
+                self.state = 'dead'
+        else:
+            self.attached = True
+            self.set_running()
+
+    def set_running(self):
+        if self.state == 'starting':
+            self.state = 'running'
+            self.fetch_task = asyncio.ensure_future(self.fetch_results())
+            self.shell_task = asyncio.ensure_future(self.fetch_shell_replies())
+            self.active_queries[self.client.comm_info()] = None
+
+            # these go in front of queries added while the kernel was starting
+            if self.cwd != None:
+                for query in reversed(self.get_chdir_queries(self.cwd)):
+                    self.query_queue.add(query, front=True)
+
+    def get_chdir_queries(self, cwd):
+        ''' silent, so the first cell of a notebook still gets execution
+            count 1. '''
+
+        return [Query(None, 'import os', silent=True), Query(None, 'os.chdir("' + cwd + '")', silent=True)]
+
+    def hand_over(self, cwd, on_results):
+        ''' pass a kernel started without cwd (see KernelPool) on to a
+            notebook. results so far are dropped. '''
+
+        self.on_results = on_results
+        self.result_queue.clear()
+        self.results_pending = False
+        self.cwd = cwd
+        for query in reversed(self.get_chdir_queries(cwd)):
+            self.add_query(query, front=True)
+
+    def add_query(self, query, front=False):
+        query.set_timestamp('enqueued')
+        self.kernel_loop.call_soon(self.add_query_in_loop, query, front)
+
+    def add_query_in_loop(self, query, front=False):
+        self.query_queue.add(query, front)
+        self.dispatch()
+
+    def set_pipeline_depth(self, depth):
+        self.kernel_loop.call_soon(self.set_pipeline_depth_in_loop, depth)
+
+    def set_pipeline_depth_in_loop(self, depth):
+        self.pipeline_depth = max(1, depth)
+        self.dispatch()
+
+    def dispatch(self):
+        ''' send queries as soon as there is room in the pipeline, by
+            default whenever the kernel went idle. '''
+
+        if self.state != 'running': return
+        while len(self.active_queries) < self.pipeline_depth and len(self.query_queue) > 0:
+            query = self.query_queue.pop()
+            query.set_timestamp('sent')
+            self.active_queries[self.client.execute(query.code, silent=query.silent, stop_on_error=True)] = query
+
+    def is_pipelined(self):
+        return self.pipeline_depth > 1
+
+    def put_result(self, result):
+        self.result_queue.append(result)
+        if not self.results_pending:
+            self.results_pending = True
+            if self.on_results != None:
+                self.on_results()
+
+    def reset_results_pending(self):
+        ''' called by the consumer before draining the result queue, so
+            results arriving from then on trigger on_results again. '''
+
+        self.results_pending = False
+
+    def get_result(self):
+        ''' output of removed queries is skipped, their 'evaluation_stopped'
+            result is not. '''
+
+        while True:
+            try: result = self.result_queue.popleft()
+            except IndexError: return None
+            else:
+                if result.query == None or not result.query.removed or result.result_message == 'evaluation_stopped':
+                    return result
+
+    async def fetch_results(self):
+        while True:
+            message = await self.client.get_iopub_msg()
+            query_id = message['parent_header'].get('msg_id', None)
+            if query_id in self.active_queries:
+                query = self.active_queries[query_id]
+                cell = query.cell if query != None else None
+                if query != None:
+                    self.set_query_timestamps(query, message)
+
+                if message['msg_type'] == 'stream' and query != None:
+                    self.add_stream_message(query_id, query, message)
+                    continue
+
+                self.flush_pending_streams(query_id)
+                result = Result(cell, query_id, query)
+                result.result_msg = message
+                self.put_result(result)
+
+                # the kernel aborts queries sent after the failing one,
+                # those not sent yet are dropped here. errors of removed
+                # queries come from interrupting them, not from failing.
+                if message['msg_type'] == 'error' and self.is_pipelined() and (query == None or not query.removed):
+                    self.remove_all_queries_in_loop()
+
+                if message['msg_type'] == 'status' and message['content'].get('execution_state', '') == 'idle':
+                    del(self.active_queries[query_id])
+                    self.dispatch()
+
+    def set_rate_limits(self, messages_per_second, bytes_per_second, max_pending_bytes):
+        self.kernel_loop.call_soon(self.rate_limiter.set_limits, messages_per_second, bytes_per_second, max_pending_bytes)
+
+    def get_output_counters(self):
+        ''' thread safe, counters of the stream rate limiter. '''
+
+        return self.rate_limiter.get_counters()
+
+    def add_stream_message(self, query_id, query, message):
+        text = message['content'].get('text', '')
+        if not self.has_pending_streams(query_id) and self.has_room_for_results() and self.rate_limiter.allow(len(text)):
+            self.put_stream_message(query_id, query, message)
+            return
+
+        key = (query_id, message['content'].get('name', ''))
+        if key not in self.pending_streams:
+            self.pending_streams[key] = {'query': query, 'message': message, 'texts': list(), 'length': 0}
+        pending = self.pending_streams[key]
+        if pending['length'] + len(text) <= self.rate_limiter.max_pending_bytes:
+            pending['texts'].append(text)
+            pending['length'] += len(text)
+            self.rate_limiter.count_coalesced()
+        else:
+            self.rate_limiter.count_dropped(len(text))
+            if not query.output_dropped:
+                query.output_dropped = True
+                result = Result(query.cell, query_id, query)
+                result.result_message = 'output_rate_limited'
+                self.put_result(result)
+        self.schedule_flush()
+
+    def has_pending_streams(self, query_id):
+        return any(key[0] == query_id for key in self.pending_streams)
+
+    def has_room_for_results(self):
+        return len(self.result_queue) < self.max_queued_results
+
+    def put_stream_message(self, query_id, query, message):
+        result = Result(query.cell, query_id, query)
+        result.result_msg = message
+        self.put_result(result)
+
+    def schedule_flush(self):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.kernel_loop.loop.call_later(0.05, self.on_flush_timeout)
+
+    def on_flush_timeout(self):
+        self.flush_scheduled = False
+        self.flush_pending_streams()
+        if len(self.pending_streams) > 0:
+            self.schedule_flush()
+
+    def flush_pending_streams(self, query_id=None):
+        ''' hand on held back output as long as the limits allow, in order.
+            output of query_id goes out in any case, so it comes before the
+            next message of that query. '''
+
+        for key in list(self.pending_streams.keys()):
+            pending = self.pending_streams[key]
+            if key[0] == query_id:
+                self.rate_limiter.force(pending['length'])
+            elif not (self.has_room_for_results() and self.rate_limiter.allow(pending['length'])):
+                continue
+            del(self.pending_streams[key])
+            message = dict(pending['message'])
+            message['content'] = dict(message['content'], text=''.join(pending['texts']))
+            self.put_stream_message(key[0], pending['query'], message)
+
+    def set_query_timestamps(self, query, message):
+        msg_type = message['msg_type']
+        if msg_type == 'execute_input':
+            query.set_timestamp('execute_input')
+        elif msg_type in ['stream', 'execute_result', 'display_data', 'error']:
+            query.set_timestamp('first_output')
+        elif msg_type == 'status' and message['content'].get('execution_state', '') == 'idle':
+            query.set_timestamp('idle')
+
+    async def fetch_shell_replies(self):
+        while True:
+            message = await self.client.get_shell_msg()
+            query_id = message['parent_header'].get('msg_id', None)
+            if query_id in self.shell_requests:
+                self.set_shell_request_result(self.shell_requests.pop(query_id), message['content'])
+            elif message['msg_type'] == 'execute_reply' and query_id in self.active_queries:
+                if message['content'].get('status', '') == 'aborted':
+                    query = self.active_queries[query_id]
+                    del(self.active_queries[query_id])
+                    if query != None and not query.removed:
+                        self.stop_query(query)
+                    self.dispatch()
+
+    def complete(self, code, cursor_pos):
+        ''' thread safe, returns a concurrent.futures.Future for the content
+            of the complete_reply, or None if the kernel isn't running. '''
+
+        return self.send_shell_request('complete', code, cursor_pos)
+
+    def inspect(self, code, cursor_pos, detail_level=0):
+        ''' like complete, for the inspect_reply. '''
+
+        return self.send_shell_request('inspect', code, cursor_pos, detail_level)
+
+    def send_shell_request(self, method, *args):
+        ''' the request goes out right away, past the query queue. the
+            kernel answers it once it's done with what it is running. cancel
+            the future to have the reply dropped. '''
+
+        future = concurrent.futures.Future()
+        self.kernel_loop.call_soon(self.send_shell_request_in_loop, future, method, args)
+        return future
+
+    def send_shell_request_in_loop(self, future, method, args):
+        if future.cancelled(): return
+        if self.state != 'running':
+            self.set_shell_request_result(future, None)
+            return
+        msg_id = getattr(self.client, method)(*args)
+        self.shell_requests[msg_id] = future
+
+    def set_shell_request_result(self, future, content):
+        try: future.set_result(content)
+        except concurrent.futures.InvalidStateError: pass
+
+    def drop_shell_requests(self):
+        for future in self.shell_requests.values():
+            self.set_shell_request_result(future, None)
+        self.shell_requests = dict()
+
+    def remove_queries_by_cell(self, cell):
+        self.kernel_loop.call_soon(self.remove_queries_by_cell_in_loop, cell)
+
+    def remove_queries_by_cell_in_loop(self, cell):
+        for query in self.query_queue.remove_by_cell(cell):
+            self.stop_query(query)
+
+        # only the oldest active query is running, others sent ahead of
+        # time can't be taken back, their output is dropped though. they
+        # keep their place in active_queries until the kernel is done
+        # with them, so the next query isn't hit by the interrupt.
+        running_query = next(iter(self.active_queries.values()), None)
+        for query in self.active_queries.values():
+            if query != None and query.cell == cell and not query.removed:
+                self.stop_query(query)
+        if running_query != None and running_query.cell == cell:
+            self.interrupt_in_loop()
+
+    def remove_all_queries(self):
+        self.kernel_loop.call_soon(self.remove_all_queries_in_loop)
+
+    def remove_all_queries_in_loop(self):
+        for query in self.query_queue.remove_all():
+            self.stop_query(query)
+
+    def stop_query(self, query):
+        ''' mark query as removed and put its one 'evaluation_stopped'
+            result. '''
+
+        query.removed = True
+        result = Result(query.cell, None, query)
+        result.result_message = 'evaluation_stopped'
+        self.put_result(result)
+
+    def interrupt(self):
+        self.kernel_loop.call_soon(self.interrupt_in_loop)
+
+    def interrupt_in_loop(self):
+        if self.state == 'running':
+            if self.attached:
+                self.client.control_channel.send(self.client.session.msg('interrupt_request', {}))
+            else:
+                asyncio.ensure_future(self.kernel_manager.interrupt_kernel())
+
+    def shutdown(self, now=False):
+        ''' thread safe, returns a concurrent.futures.Future that is done
+            when the kernel process is gone and all sockets are closed. '''
+
+        return self.kernel_loop.run_coroutine(self.shutdown_in_loop(now))
+
+    async def shutdown_in_loop(self, now=False):
+        if self.state == 'shut_down': return
+        self.state = 'shut_down'
+
+        try: await asyncio.wrap_future(self.start_future)
+        except Exception: pass
+
+        for task in [self.fetch_task, self.shell_task]:
+            if task != None:
+                task.cancel()
+                try: await task
+                except asyncio.CancelledError: pass
+        self.drop_shell_requests()
+        if self.attached:
+            await self.shutdown_attached_in_loop(now)
+        if self.client != None:
+            self.client.stop_channels()
+            self.client = None
+        if self.kernel_manager != None:
+            await self.kernel_manager.shutdown_kernel(now=now)
+            self.kernel_manager = None
+        self.remove_connection_file()
+
+    async def shutdown_attached_in_loop(self, now=False, wait_time=5):
+        ''' ask the kernel to quit, kill it if it's still there after
+            wait_time seconds. '''
+
+        if not now:
+            self.client.shutdown()
+            for i in range(wait_time * 10):
+                if not self.is_process_alive(): return
+                await asyncio.sleep(0.1)
+        self.kill_process()
+
+    async def kill_in_loop(self):
+        ''' last resort for a kernel that doesn't shut down in time. '''
+
+        self.state = 'shut_down'
+        for task in [self.fetch_task, self.shell_task]:
+            if task != None:
+                task.cancel()
+        self.drop_shell_requests()
+        if self.client != None:
+            self.client.stop_channels()
+            self.client = None
+        if self.attached:
+            self.kill_process()
+        if self.kernel_manager != None:
+            try: await self.kernel_manager.shutdown_kernel(now=True)
+            except Exception: pass
+            self.kernel_manager = None
+        self.remove_connection_file()
+
+    def detach(self):
+        ''' thread safe, disconnect from a detachable kernel, leaving it
+            running. returns a concurrent.futures.Future. '''
+
+        return self.kernel_loop.run_coroutine(self.detach_in_loop())
+
+    async def detach_in_loop(self):
+        if self.state == 'shut_down': return
+        self.state = 'shut_down'
+
+        try: await asyncio.wrap_future(self.start_future)
+        except Exception: pass
+
+        for task in [self.fetch_task, self.shell_task]:
+            if task != None:
+                task.cancel()
+                try: await task
+                except asyncio.CancelledError: pass
+        self.drop_shell_requests()
+        if self.client != None:
+            self.client.stop_channels()
+            self.client = None
+        self.kernel_manager = None
+
+    def is_process_alive(self):
+        ''' for attached kernels, whose process isn't ours to wait for. '''
+
+        if self.pid == None: return False
+
+        # reap it in case it's our child after all, started this session
+        try: os.waitpid(self.pid, os.WNOHANG)
+        except ChildProcessError: pass
+        try: os.kill(self.pid, 0)
+        except ProcessLookupError: return False
+        except PermissionError: return True
+        return True
+
+    def kill_process(self):
+        if self.is_process_alive():
+            try: os.kill(self.pid, signal.SIGKILL)
+            except OSError: pass
+
+    def remove_connection_file(self):
+        if self.connection_file != None:
+            try: os.remove(self.connection_file)
+            except OSError: pass
+
+
+class Query():
+
+    def __init__(self, cell, code, lane='interactive', silent=False):
+        ''' lane is one of QueryScheduler.lane_names. silent queries don't
+            count as executions of the kernel and don't show up in its
+            history. '''
+
+        self.cell = cell
+        self.code = code
+        self.lane = lane
+        self.silent = silent
+        self.removed = False
+        self.output_dropped = False
+
+        # name -> time.time(), see ExecutionStats for the names
+        self.timestamps = dict()
+
+        # set by ExecutionStats.add_query, which is told about timestamps
+        # set later on, like 'revealed'
+        self.execution_stats = None
+
+        # filled in by the consumer of the results, execution_metadata
+        # follows the 'execution' cell metadata of nbformat
+        self.execution_count = None
+        self.execution_metadata = dict()
+
+    def set_timestamp(self, name):
+        ''' only the first time counts. '''
+
+        if name not in self.timestamps:
+            self.timestamps[name] = time.time()
+            if self.execution_stats != None:
+                self.execution_stats.add_timestamp(self, name)
+
+    def get_label(self):
+        lines = self.code.strip().splitlines()
+        return lines[0] if len(lines) > 0 else ''
+
+
+class Result():
+
+    def __init__(self, cell, query_id=None, query=None):
+        self.cell = cell
+        self.query_id = query_id
+        self.query = query
+        self.result_msg = None
+        self.result_message = None
+
+
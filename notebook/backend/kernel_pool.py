@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+from gi.repository import GLib
+
+import collections
+
+from notebook.backend.kernel import Kernel, Query
+
+
+class KernelPool(object):
+    ''' Keeps idle kernels warm for the most used kernelspecs, so opening
+        a notebook or restarting its kernel doesn't have to wait for a cold
+        kernel start. Lives in the main loop. '''
+
+    def __init__(self, kernel_loop, settings, kernelspecs):
+        self.kernel_loop = kernel_loop
+        self.settings = settings
+        self.kernelspecs = kernelspecs
+
+        # kernelspecs by usage, most used first
+        self.ranking = list()
+
+        # kernelname -> list of {'kernel', 'warm_up_query', 'ready'}
+        self.entries = dict()
+        self.refill_scheduled = False
+
+        self.settings.register_observer(self)
+
+    def change_notification(self, change_code, notifying_object, parameter):
+
+        if change_code == 'settings_changed':
+            section, item, value = parameter
+            if section == 'kernel_pool':
+                self.schedule_refill()
+
+    def update_ranking(self, recently_opened_items):
+        ''' rank installed kernelspecs by how often they appear in the
+            recently opened list, ties go to the order of Kernelspecs. '''
+
+        usage = collections.Counter(item['kernelname'] for item in recently_opened_items)
+        names = [name for name in self.kernelspecs.get_list_of_names() if self.kernelspecs.is_installed(name)]
+        ranking = sorted(names, key=lambda name: -usage[name])
+        if ranking != self.ranking:
+            self.ranking = ranking
+            self.schedule_refill()
+
+    def get_wanted_kernelnames(self):
+        if self.settings.get_value('kernel_pool', 'size') <= 0: return list()
+        return self.ranking[:self.settings.get_value('kernel_pool', 'number_of_kernelspecs')]
+
+    def schedule_refill(self):
+        if not self.refill_scheduled:
+            self.refill_scheduled = True
+            GLib.idle_add(self.refill)
+
+    def refill(self):
+        self.refill_scheduled = False
+        size = self.settings.get_value('kernel_pool', 'size')
+        wanted_kernelnames = self.get_wanted_kernelnames()
+
+        for kernelname in list(self.entries.keys()):
+            if kernelname not in wanted_kernelnames:
+                for entry in self.entries[kernelname]:
+                    entry['kernel'].shutdown()
+                del(self.entries[kernelname])
+
+        for kernelname in wanted_kernelnames:
+            entries = self.entries.setdefault(kernelname, list())
+            while len(entries) < size:
+                entries.append(self.start_kernel(kernelname))
+        return False
+
+    def start_kernel(self, kernelname):
+        entry = {'kernel': None, 'warm_up_query': None, 'ready': False}
+        entry['kernel'] = Kernel(kernelname, None, self.kernel_loop, lambda: GLib.idle_add(self.fetch_results, entry))
+
+        warm_up_code = self.settings.get_value('kernel_pool', 'warm_up_code').get(kernelname, '')
+        entry['warm_up_query'] = Query(None, warm_up_code if warm_up_code != '' else 'pass', silent=True)
+        entry['kernel'].add_query(entry['warm_up_query'])
+        return entry
+
+    def fetch_results(self, entry):
+        kernel = entry['kernel']
+        kernel.reset_results_pending()
+        result = kernel.get_result()
+        while result != None:
+            if result.result_message == 'kernel_died':
+                # stops the fetch tasks and cleans up the connection file
+                kernel.shutdown()
+                self.remove_entry(entry)
+            elif result.query == entry['warm_up_query'] and result.result_msg != None:
+                if result.result_msg['header']['msg_type'] == 'status' and result.result_msg['content'].get('execution_state', '') == 'idle':
+                    entry['ready'] = True
+            result = kernel.get_result()
+        return False
+
+    def remove_entry(self, entry):
+        for entries in self.entries.values():
+            if entry in entries:
+                entries.remove(entry)
+
+    def claim(self, kernelname, cwd, on_results):
+        ''' hand a warmed up kernel over to a notebook, or return None if
+            there is none ready. the pool is refilled in the background. '''
+
+        for entry in self.entries.get(kernelname, list()):
+            if entry['ready']:
+                self.remove_entry(entry)
+                entry['kernel'].hand_over(cwd, on_results)
+                self.schedule_refill()
+                return entry['kernel']
+        return None
+
+    def take_kernels(self):
+        ''' empty the pool, returning its kernels. '''
+
+        kernels = list()
+        for entries in self.entries.values():
+            for entry in entries:
+                kernels.append(entry['kernel'])
+        self.entries = dict()
+        return kernels
+
+
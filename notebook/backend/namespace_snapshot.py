@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+''' Code that saves the user namespace of a Python kernel to a file and
+    loads it back, run in the kernel as silent queries. Both print one
+    line starting with report_marker, followed by a JSON report:
+    {'action', 'pathname', 'names', 'skipped': {name: reason}}. '''
+
+import json
+
+
+report_marker = '__porto_namespace_report__ '
+
+snapshot_code = '''
+def _porto_snapshot_namespace(pathname):
+    import json, os, pickle, types
+    try: import dill as pickler
+    except ImportError: pickler = pickle
+
+    shell = get_ipython()
+    modules, values, skipped = dict(), dict(), dict()
+    for name, value in list(shell.user_ns.items()):
+        if name.startswith('_') or name in shell.user_ns_hidden: continue
+        if isinstance(value, types.ModuleType):
+            modules[name] = value.__name__
+            continue
+
+        # plain pickle refers to what's defined in __main__ by name only,
+        # it wouldn't be there when loading.
+        if pickler == pickle and '__main__' in [getattr(value, '__module__', None), getattr(type(value), '__module__', None)]:
+            skipped[name] = 'defined in the notebook'
+            continue
+        try: values[name] = pickler.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e: skipped[name] = type(e).__name__ + ': ' + str(e)
+
+    with open(pathname + '.part', 'wb') as f:
+        pickle.dump({'version': 1, 'pickler': pickler.__name__, 'modules': modules, 'values': values}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(pathname + '.part', pathname)
+    report = {'action': 'snapshot', 'pathname': pathname, 'names': sorted(modules) + sorted(values), 'skipped': skipped}
+    print(%(marker)s + json.dumps(report))
+
+try: _porto_snapshot_namespace(%(pathname)s)
+finally: del _porto_snapshot_namespace
+'''
+
+restore_code = '''
+def _porto_restore_namespace(pathname):
+    import importlib, json, pickle
+    with open(pathname, 'rb') as f:
+        snapshot = pickle.load(f)
+    pickler = importlib.import_module(snapshot['pickler'])
+
+    shell = get_ipython()
+    names, skipped = list(), dict()
+    for name, module_name in snapshot['modules'].items():
+        try: shell.user_ns[name] = importlib.import_module(module_name)
+        except Exception as e: skipped[name] = type(e).__name__ + ': ' + str(e)
+        else: names.append(name)
+    for name, data in snapshot['values'].items():
+        try: shell.user_ns[name] = pickler.loads(data)
+        except Exception as e: skipped[name] = type(e).__name__ + ': ' + str(e)
+        else: names.append(name)
+    report = {'action': 'restore', 'pathname': pathname, 'names': names, 'skipped': skipped}
+    print(%(marker)s + json.dumps(report))
+
+try: _porto_restore_namespace(%(pathname)s)
+finally: del _porto_restore_namespace
+'''
+
+
+def get_snapshot_code(pathname):
+    return snapshot_code % {'marker': repr(report_marker), 'pathname': repr(pathname)}
+
+
+def get_restore_code(pathname):
+    return restore_code % {'marker': repr(report_marker), 'pathname': repr(pathname)}
+
+
+def get_report(text):
+    ''' the report in the output of one of the above, None if there is none. '''
+
+    for line in reversed(text.splitlines()):
+        if line.startswith(report_marker):
+            try: return json.loads(line[len(report_marker):])
+            except ValueError: return None
+    return None
+
+
+def is_supported(language):
+    return language != None and language.lower() == 'python'
+
+
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+# how cells map to and from nbformat nodes, shared by Notebook and the
+# headless runner, so both read and write notebooks the same way
+
+import nbformat
+
+
+def is_markdown_in_edit_mode(node):
+    ''' markdown cells saved unrendered are shown as source. '''
+
+    return node.metadata.get('in_edit_mode', False)
+
+
+def get_execution_info(node):
+    ''' (execution count, 'execution' metadata, cache_output) of a code cell. '''
+
+    execution_metadata = dict(node.metadata.get('execution', dict()))
+    cache_output = node.metadata.get('porto', dict()).get('cache_output', False)
+    return node.get('execution_count', None), execution_metadata, cache_output
+
+
+def split_outputs(outputs):
+    ''' (streams, outputs): the stream outputs as (name, text), and the
+        outputs shown below them, errors and those with data. '''
+
+    streams = list()
+    other_outputs = list()
+    for output in outputs:
+        if output['output_type'] == 'stream':
+            streams.append((output['name'], output['text']))
+        elif output['output_type'] == 'error' or 'data' in output:
+            other_outputs.append(output)
+    return streams, other_outputs
+
+
+def new_code_cell(source, execution_count, execution_metadata, cache_output, outputs):
+    metadata = dict()
+    if len(execution_metadata) > 0:
+        metadata['execution'] = execution_metadata
+    if cache_output:
+        metadata['porto'] = {'cache_output': True}
+    node = nbformat.v4.new_code_cell(
+        source=source,
+        execution_count=execution_count,
+        metadata=metadata
+    )
+    if len(outputs):
+        node.outputs = outputs
+    return node
+
+
+def new_markdown_cell(source, in_edit_mode):
+    return nbformat.v4.new_markdown_cell(
+        source=source,
+        metadata={'in_edit_mode': in_edit_mode}
+    )
+
+
+def new_notebook(cell_nodes, kernelname):
+    nb = nbformat.v4.new_notebook()
+    nb.cells = cell_nodes
+    nb.metadata['kernelspec'] = {'name': kernelname, 'display_name': kernelname, 'language': kernelname}
+    return nb
+
+
+def truncate_text(text, max_length, marker='\n[... output truncated ...]\n\n'):
+    ''' head and tail of text, max_length characters together. '''
+
+    if len(text) <= max_length: return text
+    return text[:max_length // 2] + marker + text[len(text) - max_length // 2:]
+
+
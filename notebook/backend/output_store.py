@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import hashlib
+import json
+import os
+import os.path
+import pickle
+import time
+
+import helpers.metrics as metrics
+
+
+class OutputStore():
+    ''' On-disk cache of cell outputs (lists of nbformat output dicts).
+
+        Outputs are stored once per content, in objects/<sha256>.json, the
+        index maps cache keys to them. Once the objects add up to more than
+        max_size bytes, the least recently used keys are dropped, along
+        with objects no key refers to anymore. '''
+
+    def __init__(self, pathname, max_size=500000000):
+        self.pathname = pathname
+        self.objects_folder = pathname + '/objects'
+        self.max_size = max_size
+
+        # key -> {'object', 'size', 'last_used'}
+        self.index = dict()
+        self.populate_from_disk()
+
+    def set_max_size(self, max_size):
+        self.max_size = max_size
+        if self.evict():
+            self.save_to_disk()
+
+    def get(self, key):
+        ''' outputs stored under key, None if there are none. '''
+
+        try: item = self.index[key]
+        except KeyError: return None
+        try:
+            with open(self.get_object_pathname(item['object']), 'r') as f:
+                outputs = json.load(f)
+        except (OSError, ValueError):
+            del(self.index[key])
+            self.save_to_disk()
+            return None
+        item['last_used'] = time.time()
+        self.save_to_disk()
+        return outputs
+
+    def put(self, key, outputs):
+        ''' returns False if outputs weren't stored, e.g. on a full disk.
+            they are still saved in the notebook then, just not cached. '''
+
+        data = json.dumps(outputs, sort_keys=True).encode('utf-8')
+        if len(data) > self.max_size: return False
+
+        object_hash = hashlib.sha256(data).hexdigest()
+        pathname = self.get_object_pathname(object_hash)
+        if not os.path.isfile(pathname):
+            try:
+                os.makedirs(self.objects_folder, exist_ok=True)
+                with open(pathname + '.part', 'wb') as f:
+                    f.write(data)
+                os.replace(pathname + '.part', pathname)
+            except OSError as e:
+                metrics.get_logger('file_io').warning('could not cache outputs in %s: %s', self.objects_folder, e)
+                try: os.remove(pathname + '.part')
+                except OSError: pass
+                return False
+
+        self.index[key] = {'object': object_hash, 'size': len(data), 'last_used': time.time()}
+        self.evict()
+        self.save_to_disk()
+        return True
+
+    def evict(self):
+        ''' returns True if something was dropped. '''
+
+        sizes = dict((item['object'], item['size']) for item in self.index.values())
+        total_size = sum(sizes.values())
+        if total_size <= self.max_size: return False
+
+        for key, item in sorted(self.index.items(), key=lambda key_item: key_item[1]['last_used']):
+            if total_size <= self.max_size: break
+            del(self.index[key])
+            if not any(other['object'] == item['object'] for other in self.index.values()):
+                total_size -= item['size']
+                try: os.remove(self.get_object_pathname(item['object']))
+                except OSError: pass
+        return True
+
+    def get_object_pathname(self, object_hash):
+        return self.objects_folder + '/' + object_hash + '.json'
+
+    def get_size(self):
+        return sum(dict((item['object'], item['size']) for item in self.index.values()).values())
+
+    def populate_from_disk(self):
+        try: filehandle = open(self.pathname + '/index.pickle', 'rb')
+        except IOError: pass
+        else:
+            with filehandle:
+                try: self.index = pickle.load(filehandle)
+                except (EOFError, pickle.UnpicklingError): pass
+
+    def save_to_disk(self):
+        ''' replaces the index at once, an interrupted write leaves the old
+            one in place. '''
+
+        pathname = self.pathname + '/index.pickle'
+        try:
+            os.makedirs(self.pathname, exist_ok=True)
+            with open(pathname + '.part', 'wb') as f:
+                pickle.dump(self.index, f)
+            os.replace(pathname + '.part', pathname)
+        except OSError as e:
+            metrics.get_logger('file_io').warning('could not write output cache index %s: %s', pathname, e)
+
+
+def get_cache_key(kernelname, source, upstream_sources):
+    ''' upstream_sources: the sources the cells this one depends on were
+        last run with, in notebook order. '''
+
+    data = json.dumps([kernelname, source, upstream_sources])
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import collections
+
+
+class QueryScheduler():
+    ''' Queries waiting to be sent to a kernel, in priority lanes.
+
+        Each lane is an ordered dict used as a deque that also allows
+        removing any query in O(1). Queries are indexed by cell, so
+        cancelling the queries of a cell costs O(1) per query, no matter
+        how long the backlog is. Not thread safe, Kernel uses it from inside
+        the kernel loop only. '''
+
+    # highest priority first. interactive evaluations (shift+enter, ...)
+    # go ahead of the backlog of a run all.
+    lane_names = ['interactive', 'batch']
+
+    def __init__(self):
+        self.lanes = dict()
+        for lane_name in self.lane_names:
+            self.lanes[lane_name] = collections.OrderedDict()
+
+        # cell -> ordered dict of its queries
+        self.queries_by_cell = dict()
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes.values())
+
+    def add(self, query, front=False):
+        lane = self.lanes[query.lane]
+        lane[query] = None
+        if front:
+            lane.move_to_end(query, last=False)
+        self.queries_by_cell.setdefault(query.cell, collections.OrderedDict())[query] = None
+
+    def pop(self):
+        ''' return the next query in line or None. '''
+
+        for lane_name in self.lane_names:
+            lane = self.lanes[lane_name]
+            if len(lane) > 0:
+                query = lane.popitem(last=False)[0]
+                self.remove_from_index(query)
+                return query
+        return None
+
+    def remove_from_index(self, query):
+        queries = self.queries_by_cell[query.cell]
+        del(queries[query])
+        if len(queries) == 0:
+            del(self.queries_by_cell[query.cell])
+
+    def remove_by_cell(self, cell):
+        ''' remove all queries of cell, returns them in queue order. '''
+
+        queries = list(self.queries_by_cell.pop(cell, ()))
+        for query in queries:
+            del(self.lanes[query.lane][query])
+        return queries
+
+    def remove_all(self):
+        ''' remove all queries, returns them in the order they'd have run. '''
+
+        queries = list()
+        for lane_name in self.lane_names:
+            queries.extend(self.lanes[lane_name])
+            self.lanes[lane_name] = collections.OrderedDict()
+        self.queries_by_cell = dict()
+        return queries
+
+    def has_queries_of_cell(self, cell):
+        return cell in self.queries_by_cell
+
+
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import time
+
+
+class RateLimiter():
+    ''' Token buckets for the stream output of a kernel, one for messages
+        and one for characters, each holding one second worth of tokens.
+        A limit <= 0 means no limit. Not thread safe, Kernel uses it from
+        inside the kernel loop only. '''
+
+    def __init__(self, messages_per_second=500, bytes_per_second=1000000, max_pending_bytes=1000000):
+        self.messages_per_second = messages_per_second
+        self.bytes_per_second = bytes_per_second
+
+        # output held back per stream of a query, beyond that it's dropped
+        self.max_pending_bytes = max_pending_bytes
+
+        self.message_tokens = max(messages_per_second, 0)
+        self.byte_tokens = max(bytes_per_second, 0)
+        self.last_refill = time.monotonic()
+
+        self.counters = {'messages_passed': 0, 'bytes_passed': 0, 'messages_coalesced': 0, 'messages_dropped': 0, 'bytes_dropped': 0}
+
+    def set_limits(self, messages_per_second, bytes_per_second, max_pending_bytes):
+        self.messages_per_second = messages_per_second
+        self.bytes_per_second = bytes_per_second
+        self.max_pending_bytes = max_pending_bytes
+        self.message_tokens = min(self.message_tokens, max(messages_per_second, 0))
+        self.byte_tokens = min(self.byte_tokens, max(bytes_per_second, 0))
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        if self.messages_per_second > 0:
+            self.message_tokens = min(self.messages_per_second, self.message_tokens + elapsed * self.messages_per_second)
+        if self.bytes_per_second > 0:
+            self.byte_tokens = min(self.bytes_per_second, self.byte_tokens + elapsed * self.bytes_per_second)
+
+    def allow(self, length):
+        ''' True if a message of length characters may pass now. messages
+            longer than a second worth of characters pass once the bucket is
+            full, leaving it in debt. '''
+
+        self.refill()
+        if self.messages_per_second > 0 and self.message_tokens < 1: return False
+        if self.bytes_per_second > 0 and self.byte_tokens < min(length, self.bytes_per_second): return False
+
+        self.message_tokens -= 1
+        self.byte_tokens -= length
+        self.counters['messages_passed'] += 1
+        self.counters['bytes_passed'] += length
+        return True
+
+    def force(self, length):
+        ''' let a message pass regardless of the limits. '''
+
+        self.refill()
+        self.message_tokens -= 1
+        self.byte_tokens -= length
+        self.counters['messages_passed'] += 1
+        self.counters['bytes_passed'] += length
+
+    def count_coalesced(self):
+        self.counters['messages_coalesced'] += 1
+
+    def count_dropped(self, length):
+        self.counters['messages_dropped'] += 1
+        self.counters['bytes_dropped'] += length
+
+    def get_counters(self):
+        return dict(self.counters)
+
+
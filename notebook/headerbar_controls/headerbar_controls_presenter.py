@@ -48,6 +48,9 @@ class HeaderbarControlsPresenter(object):
             self.update_stop_button()
             self.update_subtitle()
 
+        if change_code == 'batch_progress_changed':
+            self.update_subtitle()
+
         if change_code == 'save_state_change':
             self.update_save_button()
             self.update_title()
@@ -61,7 +64,10 @@ class HeaderbarControlsPresenter(object):
 
     def update_subtitle(self):
         busy_cell_count = self.notebook.get_busy_cell_count()
-        if busy_cell_count > 0:
+        batch_progress = self.notebook.get_batch_progress()
+        if batch_progress != None and busy_cell_count > 0:
+            subtitle = 'evaluating ' + str(batch_progress['done'] + 1) + ' of ' + str(batch_progress['total']) + ' cells.'
+        elif busy_cell_count > 0:
             plural = 's' if busy_cell_count > 1 else ''
             subtitle = 'evaluating ' + str(busy_cell_count) + ' cell' + plural + '.'
         elif self.notebook.get_kernel_state() == 'starting':
@@ -22,16 +22,19 @@ from gi.repository import GLib
 from gi.repository import GtkSource
 import datetime
 import os, os.path
+import time
 import nbformat
 
 import notebook.notebook_viewgtk as notebook_viewgtk
 import notebook.notebook_controller as notebook_controller
 import notebook.notebook_presenter as notebook_presenter
 import notebook.notebook_evaluator as notebook_evaluator
+import notebook.backend.notebook_format as notebook_format
 import notebook.notebook_list_item.notebook_list_item as list_item_model
 import notebook.headerbar_controls.headerbar_controls as headerbar_controls
 import cell.cell as model_cell
 from helpers.observable import Observable
+import helpers.metrics as metrics
 from app.service_locator import ServiceLocator
 
 
@@ -45,9 +48,11 @@ class Notebook(Observable):
         self.cells = []
         self.active_cell = None
         self.busy_cells = set()
+        self.busy_cells_update_level = 0
+        self.busy_cells_changed = False
+        self.batch_progress = None
         self.modified_cells = set()
         self.kernel_state = None
-        self.result_factory = ServiceLocator.get_result_factory()
 
         self.save_state = 'saved'
         try: self.last_saved = datetime.datetime.fromtimestamp(os.path.getmtime(pathname))
@@ -180,6 +185,7 @@ class Notebook(Observable):
         return len(self.cells)
 
     def load_from_disk(self):
+        start_time = time.time()
         nb = nbformat.read(self.pathname, nbformat.current_nbformat)
         if self.get_cell_count() == 0:
             kernelname = nb.metadata['kernelspec']['name']
@@ -191,65 +197,86 @@ class Notebook(Observable):
             for cell in nb.cells:
                 if cell.cell_type == 'markdown':
                     new_cell = self.create_markdowncell('last', cell.source)
-                    try: in_edit_mode = cell.metadata['in_edit_mode']
-                    except KeyError: in_edit_mode = False
-                    if len(cell.source) > 0 and in_edit_mode == False:
+                    if len(cell.source) > 0 and not notebook_format.is_markdown_in_edit_mode(cell):
                         new_cell.evaluate_now()
                 elif cell.cell_type == 'code':
                     new_cell = self.create_cell('last', cell.source)
                     if is_first_cell == True:
                         is_first_cell = False
                         self.set_active_cell(new_cell)
-                    for output in cell.outputs:
-                        if output['output_type'] == 'error':
-                            result = self.result_factory.get_error_from_nbformat_dict(output)
-                            new_cell.set_result(result)
-                        elif output['output_type'] == 'execute_result' or output['output_type'] == 'display_data':
-                            try: data = output['data']
-                            except KeyError: pass
-                            else:
-                                result = self.result_factory.get_result_from_blob(data)
-                                new_cell.set_result(result)
-                        elif output['output_type'] == 'stream':
-                            new_cell.add_to_stream(output['name'], output['text'])
+                    execution_count, execution_metadata, cache_output = notebook_format.get_execution_info(cell)
+                    new_cell.set_execution_info(execution_count, execution_metadata)
+                    new_cell.set_cache_output(cache_output)
+                    self.add_outputs_to_cell(new_cell, cell.outputs)
+        metrics.histogram('file_io', 'load_ms').observe((time.time() - start_time) * 1000)
         self.set_save_state('saved')
+
+    def add_outputs_to_cell(self, cell, outputs):
+        ''' outputs is a list of nbformat output dicts. '''
+
+        streams, outputs = notebook_format.split_outputs(outputs)
+        for name, text in streams:
+            cell.add_to_stream(name, text)
+        for output in outputs:
+            cell.add_output(output)
+
+    def get_cell_outputs(self, cell, apply_save_policy=False):
+        ''' outputs of cell as a list of nbformat output dicts. '''
+
+        outputs = list()
+        for stream in cell.get_streams():
+            if stream.get_length() == 0: continue
+            if apply_save_policy:
+                outputs.append(self.export_stream(cell, stream))
+            else:
+                outputs.append(stream.export_nbformat())
+        outputs += [output.export_nbformat() for output in cell.get_outputs()]
+        return outputs
         
     def save_to_disk(self):
+        start_time = time.time()
         try: filehandle = open(self.pathname, 'w+')
-        except IOError: pass
+        except IOError as e:
+            metrics.counter('file_io', 'save_errors').inc()
+            metrics.get_logger('file_io').warning('could not save %s: %s', self.pathname, e)
         else:
-            nb = nbformat.v4.new_notebook()
+            cell_nodes = list()
             for cell in self.cells:
                 if isinstance(cell, model_cell.CodeCell):
-                    cell_node = nbformat.v4.new_code_cell(
-                        source=cell.get_all_text(),
-                        execution_count=0
-                    )
-                    outputs = list()
-                    for stream in cell.get_streams():
-                        outputs.append(stream.export_nbformat())
-                    result = cell.get_result()
-                    if result != None:
-                        outputs.append(result.export_nbformat())
-                    if len(outputs):
-                        cell_node.outputs = outputs
-
+                    outputs = self.get_cell_outputs(cell, apply_save_policy=True)
+                    cell_node = notebook_format.new_code_cell(cell.get_all_text(), cell.get_execution_count(), cell.get_execution_metadata(), cell.get_cache_output(), outputs)
                 elif isinstance(cell, model_cell.MarkdownCell):
-                    result = cell.get_result()
-                    metadata = {'in_edit_mode': (result == None)}
-                    cell_node = nbformat.v4.new_markdown_cell(
-                        source=cell.get_all_text(),
-                        metadata=metadata
-                    )
-                nb.cells.append(cell_node)
-
-            kernelspec_meta = {'name': self.kernelname, 'display_name': self.kernelname, 'language': self.kernelname}
-            nb.metadata['kernelspec'] = kernelspec_meta
+                    cell_node = notebook_format.new_markdown_cell(cell.get_all_text(), cell.get_result() == None)
+                cell_nodes.append(cell_node)
+
+            nb = notebook_format.new_notebook(cell_nodes, self.kernelname)
             nbformat.write(nb, filehandle)
             self.last_saved = datetime.datetime.now()
             self.reset_modified_cells()               
             self.set_save_state('saved')
             filehandle.close()
+            metrics.histogram('file_io', 'save_ms').observe((time.time() - start_time) * 1000)
+
+    def export_stream(self, cell, stream):
+        ''' apply the save policy of the output settings to long streams. '''
+
+        settings = ServiceLocator.get_settings()
+        save_policy = settings.get_value('output', 'save_policy')
+        max_length = settings.get_value('output', 'max_saved_length')
+        if save_policy == 'keep' or stream.get_length() <= max_length:
+            return stream.export_nbformat()
+
+        if save_policy == 'externalise':
+            folder = os.path.splitext(self.pathname)[0] + '_outputs'
+            filename = 'cell_' + str(cell.get_notebook_position()) + '_' + stream.stream_type + '.txt'
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            stream.write_full_text(folder + '/' + filename)
+            marker = '\n[... output truncated, full output in ' + os.path.basename(folder) + '/' + filename + ' ...]\n\n'
+        else:
+            marker = '\n[... output truncated ...]\n\n'
+
+        return stream.export_nbformat(notebook_format.truncate_text(stream.get_text(), max_length, marker))
 
     def remove_from_disk(self):
         os.remove(self.pathname)
@@ -320,12 +347,32 @@ class Notebook(Observable):
     def restart_kernel(self):
         self.add_change_code('kernel_to_restart', None)
 
+    def get_namespace_snapshot_pathname(self):
+        return os.path.splitext(self.pathname)[0] + '_namespace.pickle'
+
+    def has_namespace_snapshot(self):
+        return os.path.isfile(self.get_namespace_snapshot_pathname())
+
+    def snapshot_namespace(self):
+        self.add_change_code('namespace_to_snapshot', self.get_namespace_snapshot_pathname())
+
+    def restore_namespace(self):
+        self.add_change_code('namespace_to_restore', self.get_namespace_snapshot_pathname())
+
+    def can_restore_namespace(self):
+        ''' there is a snapshot, the kernel supports it and didn't keep its
+            namespace anyway. '''
+
+        return self.has_namespace_snapshot() and self.evaluator.can_restore_namespace()
+
+    def set_namespace_report(self, report):
+        ''' report: {'report', 'error'}, see BackendCode. '''
+
+        self.add_change_code('namespace_report', report)
+
     def shutdown_kernel(self):
         self.add_change_code('kernel_to_shutdown', None)
 
-    def shutdown_kernel_now(self):
-        self.add_change_code('kernel_to_shutdown_now', None)
-
     def evaluate_active_cell(self):
         active_cell = self.active_cell
         if not (isinstance(active_cell, model_cell.MarkdownCell) and active_cell.get_result() != None):
@@ -346,6 +393,33 @@ class Notebook(Observable):
             self.set_active_cell(new_active_cell)
             new_active_cell.place_cursor(new_active_cell.get_start_iter())
 
+    def evaluate_all_cells(self):
+        self.evaluate_cells(self.cells)
+
+    def evaluate_cells_above_active_cell(self):
+        position = self.get_active_cell().get_notebook_position()
+        self.evaluate_cells(self.cells[:position])
+
+    def evaluate_cells_below_active_cell(self):
+        position = self.get_active_cell().get_notebook_position()
+        self.evaluate_cells(self.cells[position:])
+
+    def evaluate_stale_cells(self):
+        self.evaluate_cells([cell for cell in self.cells if isinstance(cell, model_cell.CodeCell) and cell.is_stale()])
+
+    def toggle_cache_output_of_active_cell(self):
+        cell = self.get_active_cell()
+        if isinstance(cell, model_cell.CodeCell):
+            cell.set_cache_output(not cell.get_cache_output())
+            self.set_save_state('modified')
+
+    def evaluate_cells(self, cells):
+        ''' evaluate code cells as one batch, see NotebookEvaluator. '''
+
+        code_cells = [cell for cell in cells if isinstance(cell, model_cell.CodeCell)]
+        if len(code_cells) > 0:
+            self.add_change_code('cells_to_evaluate', code_cells)
+
     def add_codecell_below_active_cell(self):
         position = self.get_active_cell().get_notebook_position() + 1
         self.create_cell(position, '', activate=True, set_unmodified=False)
@@ -391,16 +465,70 @@ class Notebook(Observable):
         self.add_change_code('nb_evaluation_to_stop', None)
         
     def add_busy_cell(self, cell):
-        self.busy_cells.add(cell)
-        self.add_change_code('busy_cell_count_changed', self.get_busy_cell_count())
+        if cell not in self.busy_cells:
+            self.busy_cells.add(cell)
+            self.notify_busy_cell_count_changed()
         
     def remove_busy_cell(self, cell):
-        self.busy_cells.discard(cell)
-        self.add_change_code('busy_cell_count_changed', self.get_busy_cell_count())
+        if cell in self.busy_cells:
+            self.busy_cells.discard(cell)
+            self.notify_busy_cell_count_changed()
+
+    def notify_busy_cell_count_changed(self):
+        if self.busy_cells_update_level > 0:
+            self.busy_cells_changed = True
+        else:
+            self.add_change_code('busy_cell_count_changed', self.get_busy_cell_count())
+
+    def begin_busy_cells_update(self):
+        ''' hold back busy_cell_count_changed until the matching
+            end_busy_cells_update, which notifies once. '''
+
+        self.busy_cells_update_level += 1
+
+    def end_busy_cells_update(self):
+        self.busy_cells_update_level -= 1
+        if self.busy_cells_update_level == 0 and self.busy_cells_changed:
+            self.busy_cells_changed = False
+            self.add_change_code('busy_cell_count_changed', self.get_busy_cell_count())
 
     def get_busy_cell_count(self):
         return len(self.busy_cells)
 
+    def set_batch_progress(self, progress):
+        ''' progress is {'done', 'total'} or None if no batch is running. '''
+
+        if progress != self.batch_progress:
+            self.batch_progress = progress
+            self.add_change_code('batch_progress_changed', progress)
+
+    def get_batch_progress(self):
+        return self.batch_progress
+
+    def get_execution_stats(self):
+        return self.evaluator.get_execution_stats()
+
+    def get_queue_depth(self):
+        return self.evaluator.get_queue_depth()
+
+    def get_output_counters(self):
+        return self.evaluator.get_output_counters()
+
+    def take_kernel(self):
+        return self.evaluator.take_kernel()
+
+    def get_cached_completions(self, code, cursor_pos):
+        return self.evaluator.get_cached_completions(code, cursor_pos)
+
+    def request_completions(self, code, cursor_pos, callback):
+        return self.evaluator.request_completions(code, cursor_pos, callback)
+
+    def request_inspection(self, code, cursor_pos, callback):
+        return self.evaluator.request_inspection(code, cursor_pos, callback)
+
+    def has_detachable_kernel(self):
+        return self.evaluator.has_detachable_kernel()
+
     def add_modified_cell(self, cell):
         self.modified_cells.add(cell)
         
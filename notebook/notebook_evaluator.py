@@ -15,8 +15,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>
 
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GLib
+
 import notebook.backend.backend_code as backend_code
 import notebook.backend.backend_markdown as backend_markdown
+import notebook.backend.output_store as output_store
+from notebook.backend.dependency_graph import DependencyGraph, CellAnalysis
 import cell.cell as cell_model
 from app.service_locator import ServiceLocator
 
@@ -28,6 +34,11 @@ class NotebookEvaluator(object):
         self.notebook.register_observer(self)
 
         self.result_factory = ServiceLocator.get_result_factory()
+        self.settings = ServiceLocator.get_settings()
+
+        # cells of the last run all / above / below
+        self.batch = None
+        self.queueing_batch = False
 
         self.backend_code = backend_code.BackendCode(notebook)
         self.backend_code.register_observer(self)
@@ -35,9 +46,27 @@ class NotebookEvaluator(object):
         self.markdown_compute_queue = backend_markdown.ComputeQueue()
         self.markdown_compute_queue.register_observer(self)
 
+        # source of each code cell when it was last sent to the kernel,
+        # edits are checked against it a moment after typing stopped
+        self.dependency_graph = DependencyGraph()
+        self.evaluated_sources = dict()
+        self.edited_cells = set()
+        self.stale_update_scheduled = False
+
+        # source of each code cell when it was last run in the current
+        # kernel, for the keys of cached outputs. cell -> (key, query) for
+        # outputs to store once the query is done.
+        self.session_sources = dict()
+        self.pending_cache_keys = dict()
+        self.output_store = ServiceLocator.get_output_store()
+
+        # display_id -> (cell, result) for update_display_data
+        self.displays = dict()
+
     def change_notification(self, change_code, notifying_object, parameter):
 
         if change_code == 'kernel_state_changed' and parameter == 'kernel_to_start':
+            self.session_sources = dict()
             self.backend_code.start_kernel()
             self.notebook.set_kernel_state('starting')
 
@@ -49,17 +78,31 @@ class NotebookEvaluator(object):
             self.notebook.set_kernel_state('running')
             
         if change_code == 'kernel_to_restart':
+            self.session_sources = dict()
             self.backend_code.restart()
             self.notebook.set_kernel_state('starting')
         
         if change_code == 'kernel_to_shutdown':
+            self.session_sources = dict()
             self.backend_code.shutdown()
         
-        if change_code == 'kernel_to_shutdown_now':
-            self.backend_code.shutdown_now()
-        
+        if change_code in ['namespace_to_snapshot', 'namespace_to_restore']:
+            pathname = parameter
+            if not self.backend_code.is_namespace_snapshot_supported():
+                self.notebook.set_namespace_report({'report': None, 'error': 'Only Python kernels support this.'})
+            elif change_code == 'namespace_to_snapshot':
+                self.backend_code.snapshot_namespace(pathname)
+            else:
+                self.backend_code.restore_namespace(pathname)
+
+        if change_code == 'namespace_query_done':
+            self.notebook.set_namespace_report(parameter)
+
         if change_code == 'nb_evaluation_to_stop':
             self.backend_code.stop_evaluation()
+
+        if change_code == 'cells_to_evaluate':
+            self.evaluate_batch(parameter)
         
         if change_code == 'cell_state_change' and parameter == 'ready_for_evaluation':
             cell = notifying_object
@@ -67,8 +110,19 @@ class NotebookEvaluator(object):
                 query_string = cell.get_text(cell.get_start_iter(), cell.get_end_iter(), False)
                 query = backend_markdown.MarkdownQuery(cell, query_string)
                 self.markdown_compute_queue.add_query(query)
+            elif not cell.get_cache_output():
+                self.forget_displays(cell)
+                self.backend_code.run_cell(cell, 'batch' if self.queueing_batch else 'interactive')
             else:
-                self.backend_code.run_cell(cell)
+                self.forget_displays(cell)
+                key = self.get_cache_key(cell)
+                outputs = self.output_store.get(key) if key != None else None
+                if outputs != None:
+                    self.restore_cached_outputs(cell, outputs)
+                else:
+                    query = self.backend_code.run_cell(cell, 'batch' if self.queueing_batch else 'interactive')
+                    if key != None:
+                        self.pending_cache_keys[cell] = (key, query)
 
         if change_code == 'cell_state_change' and parameter == 'ready_for_evaluation_quickly_please':
             cell = notifying_object
@@ -88,18 +142,58 @@ class NotebookEvaluator(object):
         if change_code == 'query_queued':
             cell = parameter.cell
             cell.change_state('queued_for_evaluation')
+            self.session_sources[cell] = cell.get_all_text()
+            self.on_cell_queued(cell)
+
+        if change_code == 'source_changed':
+            cell = notifying_object
+            if cell in self.evaluated_sources:
+                self.edited_cells.add(cell)
+                if not self.stale_update_scheduled:
+                    self.stale_update_scheduled = True
+                    GLib.timeout_add(300, self.update_stale_cells)
+
+        if change_code == 'deleted_cell':
+            cell = parameter
+            self.dependency_graph.remove_cell(cell)
+            self.evaluated_sources.pop(cell, None)
+            self.edited_cells.discard(cell)
+            self.session_sources.pop(cell, None)
+            self.pending_cache_keys.pop(cell, None)
+            self.forget_displays(cell)
     
         if change_code == 'evaluation_started':
             cell = parameter.cell
             cell.change_state('evaluation_in_progress')
 
-        if change_code == 'evaluation_result':
+        if change_code == 'output':
+            self.add_output(parameter)
+
+        if change_code == 'update_display_data' and parameter['data'] != None:
+            self.update_display_data(parameter['display_id'], parameter['data'])
+
+        if change_code == 'clear_output':
+            cell = parameter['cell']
+            if parameter['wait']:
+                cell.set_clear_output_pending(True)
+            else:
+                cell.set_clear_output_pending(False)
+                self.clear_output(cell)
+
+        if change_code == 'execution_info':
             cell = parameter['cell']
-            cell.set_result(parameter['result'])
-            cell.change_state('idle')
+            cell.set_execution_info(parameter['execution_count'], parameter['execution'])
+
+            # errors may well come from what other cells left in the kernel
+            key, query = self.pending_cache_keys.get(cell, (None, None))
+            if query == parameter['query']:
+                del(self.pending_cache_keys[cell])
+                if not cell.has_error():
+                    self.output_store.put(key, self.notebook.get_cell_outputs(cell))
 
         if change_code == 'stream_output':
             cell = parameter['cell']
+            self.apply_pending_clear(cell)
             cell.add_to_stream(parameter['stream_type'], parameter['text'])
 
         if change_code == 'cell_evaluation_stopped':
@@ -107,8 +201,12 @@ class NotebookEvaluator(object):
             if isinstance(cell, cell_model.MarkdownCell):
                 cell.change_state('edit')
             else:
+                if cell.get_all_text() == self.evaluated_sources.get(cell, None):
+                    cell.set_stale(False)
+                self.pending_cache_keys.pop(cell, None)
                 cell.change_state('idle')
                 self.notebook.set_kernel_state('running')
+                self.on_batch_cell_done(cell)
 
         if change_code == 'evaluation_finished':
             result_blob = parameter
@@ -116,4 +214,197 @@ class NotebookEvaluator(object):
             result_blob['cell'].set_result(result)
             result_blob['cell'].change_state('display')
 
+    def take_kernel(self):
+        return self.backend_code.take_kernel()
+
+    def get_cached_completions(self, code, cursor_pos):
+        return self.backend_code.get_cached_completions(code, cursor_pos)
+
+    def request_completions(self, code, cursor_pos, callback):
+        return self.backend_code.request_completions(code, cursor_pos, callback)
+
+    def request_inspection(self, code, cursor_pos, callback):
+        return self.backend_code.request_inspection(code, cursor_pos, callback)
+
+    def has_detachable_kernel(self):
+        return self.backend_code.has_detachable_kernel()
+
+    def can_restore_namespace(self):
+        return self.backend_code.is_namespace_snapshot_supported() and not self.backend_code.has_attached_kernel()
+
+    def get_execution_stats(self):
+        return self.backend_code.execution_stats
+
+    def get_queue_depth(self):
+        return self.backend_code.get_queue_depth()
+
+    def get_output_counters(self):
+        return self.backend_code.get_output_counters()
+
+    def add_output(self, parameter):
+        cell, query = parameter['cell'], parameter['query']
+        self.apply_pending_clear(cell)
+        output = cell.add_output(parameter['output'], parameter['display_id'], query)
+        if output.display_id != None:
+            self.displays.setdefault(output.display_id, list()).append((cell, output))
+        cell.change_state('idle')
+
+        if output.is_error():
+            self.on_batch_cell_failed(cell)
+
+    def update_display_data(self, display_id, data):
+        ''' the display may be in any cell, as long as it's still shown. '''
+
+        displays = [(cell, output) for cell, output in self.displays.get(display_id, list()) if not output.removed]
+        if len(displays) == 0:
+            self.displays.pop(display_id, None)
+            return
+        self.displays[display_id] = displays
+        for cell, output in displays:
+            cell.update_output(output, data)
+
+    def forget_displays(self, cell):
+        for display_id, displays in list(self.displays.items()):
+            displays = [item for item in displays if item[0] != cell]
+            if len(displays) > 0:
+                self.displays[display_id] = displays
+            else:
+                del(self.displays[display_id])
+
+    def apply_pending_clear(self, cell):
+        if cell.is_clear_output_pending():
+            cell.set_clear_output_pending(False)
+            self.clear_output(cell)
+
+    def clear_output(self, cell):
+        cell.reset_streams()
+        cell.remove_result()
+
+    def get_cache_key(self, cell):
+        ''' key of the outputs of cell in the output store: its source and
+            the sources the cells it depends on were run with in this
+            kernel. None if one of them wasn't run yet, or if the cell reads
+            a name before binding it itself (like x = x + 1), so running it
+            again gives other outputs. names only read after the cell bound
+            them, like loop variables or 'with ... as f', don't count. '''
+
+        source = cell.get_all_text()
+        analysis = self.dependency_graph.get_analysis(cell, source)
+        if len(analysis.uses & analysis.definitions) > 0: return None
+
+        cells_and_sources = [(other_cell, other_cell.get_all_text()) for other_cell in self.notebook.cells if isinstance(other_cell, cell_model.CodeCell)]
+        upstream_sources = list()
+        for dependency in self.dependency_graph.get_dependencies(cell, cells_and_sources):
+            if dependency not in self.session_sources: return None
+            upstream_sources.append(self.session_sources[dependency])
+        return output_store.get_cache_key(self.notebook.get_kernelname(), source, upstream_sources)
+
+    def restore_cached_outputs(self, cell, outputs):
+        ''' show outputs as if cell had been run, without the kernel. '''
+
+        self.session_sources[cell] = cell.get_all_text()
+        self.on_cell_queued(cell)
+        self.notebook.add_outputs_to_cell(cell, outputs)
+        cell.set_execution_info(None, dict(), output_from_cache=True)
+        cell.set_stale(False)
+        cell.change_state('idle')
+        self.on_batch_cell_done(cell)
+
+    def on_cell_queued(self, cell):
+        ''' what the cell binds is about to change, so are the outputs of
+            cells depending on it. '''
+
+        source = cell.get_all_text()
+        old_source = self.evaluated_sources.get(cell, None)
+        self.evaluated_sources[cell] = source
+        self.edited_cells.discard(cell)
+        changed_names = CellAnalysis(old_source).definitions if old_source != None else None
+        self.mark_dependents_stale(cell, changed_names)
+
+    def update_stale_cells(self):
+        ''' cells edited since they were evaluated are stale, and so are
+            their dependents, by what the cells bind now or bound before. '''
+
+        self.stale_update_scheduled = False
+        for cell in self.edited_cells:
+            old_source = self.evaluated_sources.get(cell, None)
+            if old_source != None and cell.get_all_text() != old_source:
+                cell.set_stale(True)
+                self.mark_dependents_stale(cell, CellAnalysis(old_source).definitions)
+        self.edited_cells = set()
+        return False
+
+    def mark_dependents_stale(self, cell, changed_names=None):
+        cells_and_sources = [(other_cell, other_cell.get_all_text()) for other_cell in self.notebook.cells if isinstance(other_cell, cell_model.CodeCell)]
+        if cell not in [item[0] for item in cells_and_sources]: return
+
+        # only cells with output can have outdated output
+        for dependent in self.dependency_graph.get_dependents(cell, cells_and_sources, changed_names):
+            if dependent in self.evaluated_sources or dependent.get_execution_count() != None:
+                dependent.set_stale(True)
+
+    def evaluate_batch(self, cells):
+        self.batch = EvaluationBatch(cells, self.settings.get_value('preferences', 'stop_batch_on_error'))
+        self.notebook.begin_busy_cells_update()
+        self.queueing_batch = True
+        for cell in cells:
+            cell.evaluate()
+        self.queueing_batch = False
+        self.notebook.end_busy_cells_update()
+        self.update_batch_progress()
+
+    def on_batch_cell_done(self, cell):
+        if self.batch != None and self.batch.set_cell_done(cell):
+            self.update_batch_progress()
+
+    def on_batch_cell_failed(self, cell):
+        ''' with stop_on_error, drop the cells of the batch queued after the
+            failing one. '''
+
+        if self.batch == None or not self.batch.stop_on_error or not self.batch.is_pending(cell): return
+
+        self.notebook.begin_busy_cells_update()
+        for pending_cell in self.batch.get_pending_cells():
+            if pending_cell != cell:
+                self.backend_code.drop_evaluation_of_cell(pending_cell)
+                pending_cell.change_state('idle')
+                self.batch.set_cell_done(pending_cell)
+        self.notebook.end_busy_cells_update()
+        self.update_batch_progress()
+
+    def update_batch_progress(self):
+        if self.batch == None or self.batch.is_finished():
+            self.batch = None
+            self.notebook.set_batch_progress(None)
+        else:
+            self.notebook.set_batch_progress(self.batch.get_progress())
+
+
+class EvaluationBatch(object):
+    ''' Cells evaluated in one go (run all, above, below). '''
+
+    def __init__(self, cells, stop_on_error):
+        self.cells = cells
+        self.pending_cells = set(cells)
+        self.stop_on_error = stop_on_error
+
+    def set_cell_done(self, cell):
+        ''' returns True if cell was pending. '''
+
+        if cell in self.pending_cells:
+            self.pending_cells.discard(cell)
+            return True
+        return False
+
+    def is_pending(self, cell):
+        return cell in self.pending_cells
+
+    def get_pending_cells(self):
+        return [cell for cell in self.cells if cell in self.pending_cells]
+
+    def is_finished(self):
+        return len(self.pending_cells) == 0
+
+    def get_progress(self):
+        return {'done': len(self.cells) - len(self.pending_cells), 'total': len(self.cells)}
 
@@ -37,6 +37,9 @@ class NotebookPresenter(object):
 
     def change_notification(self, change_code, notifying_object, parameter):
 
+        if change_code == 'namespace_report':
+            ServiceLocator.get_dialog('namespace_report').run(parameter)
+
         if change_code == 'new_cell':
             cell = parameter
             self.add_cell_view(cell)
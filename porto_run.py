@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+
+''' Runs notebooks without the user interface, in parallel processes,
+    and writes their outputs back, see notebook/backend/headless.py.
+
+    usage: python3 porto_run.py [-j JOBS] [-t TIMEOUT] [-o OUTPUT_DIR] NOTEBOOK [...] '''
+
+import os.path
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from notebook.backend.headless import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
@@ -24,7 +24,6 @@ import app.service_locator as service_locator
 
 import subprocess
 import re
-import nbformat
 
 
 class ResultError(Result):
@@ -87,13 +86,4 @@ class ResultError(Result):
         rise_units = 6144
         self.label.set_markup('<span rise="' + str(rise_units) + '"><span font_desc="">' + text + '</span></span>')
 
-    def export_nbformat(self):
-        return nbformat.v4.new_output(
-            output_type='error',
-            data=None,
-            ename=self.error_type,
-            evalue=self.error_message,
-            traceback=self.traceback
-        )
-
 
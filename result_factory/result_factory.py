@@ -15,6 +15,9 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>
 
+import time
+
+import helpers.metrics as metrics
 from result_factory.result_error.result_error import ResultError
 from result_factory.result_image.result_image import ResultImage
 from result_factory.result_html.result_html import ResultHtml
@@ -25,7 +28,11 @@ from result_factory.result_text.result_text import ResultText
 class ResultFactory():
 
     def __init__(self):
-        pass
+        self.logger = metrics.get_logger('results')
+        self.built_counter = metrics.counter('results', 'built')
+        self.updated_counter = metrics.counter('results', 'updated')
+        self.unknown_counter = metrics.counter('results', 'unknown_bundles')
+        self.build_histogram = metrics.histogram('results', 'build_ms')
 
     def get_error_from_result_message(self, result_message):
         return ResultError(
@@ -53,7 +60,46 @@ class ResultFactory():
         elif text != None:
             return ResultText(text)
         else:
-            print(blob)
+            self.unknown_counter.inc()
+            self.logger.info('no view for mime types %s', list(blob.keys()))
+
+    def get_result_from_output(self, node):
+        ''' node is an nbformat output dict (not a stream). '''
+
+        start_time = time.time()
+        if node['output_type'] == 'error':
+            result = self.get_error_from_nbformat_dict(node)
+        else:
+            result = self.get_result_from_blob(node.get('data', dict()))
+        if result != None:
+            self.built_counter.inc()
+            self.build_histogram.observe((time.time() - start_time) * 1000)
+        return result
+
+    def update_result_from_output(self, result, node):
+        ''' like update_result_from_blob, errors aren't updated. '''
+
+        if node['output_type'] == 'error' or isinstance(result, ResultError): return False
+        if not self.update_result_from_blob(result, node.get('data', dict())): return False
+        self.updated_counter.inc()
+        return True
+
+    def update_result_from_blob(self, result, blob):
+        ''' show blob in result if get_result_from_blob would make a result
+            of the same kind, returns False if it wouldn't. '''
+
+        if blob.get('image/png', None) != None:
+            result_class = ResultImage
+        elif blob.get('text/html', None) != None:
+            result_class = ResultHtml
+        elif blob.get('text/plain', None) != None:
+            result_class = ResultText
+        else:
+            return False
+
+        if type(result) != result_class: return False
+        result.update_data(blob)
+        return True
 
     def get_markdown_result_from_blob(self, blob):
         return MarkdownResult(blob)
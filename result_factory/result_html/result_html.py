@@ -24,7 +24,6 @@ from gi.repository import Gdk
 from gi.repository import WebKit2
 
 import webbrowser
-import nbformat
 
 from result_factory.result import Result
 import app.service_locator as service_locator
@@ -54,11 +53,11 @@ class ResultHtml(Result):
 
         self.content.load_html(self.html, 'file://' + service_locator.ServiceLocator.get_base_path())
 
-    def export_nbformat(self):
-        return nbformat.v4.new_output(
-            output_type='display_data',
-            data={'text/html': self.data}
-        )
+    def update_data(self, data):
+        if data['text/html'] != self.data:
+            self.data = data['text/html']
+            self.html = self.data.replace('/nbextensions', '/usr/share/jupyter/nbextensions')
+            self.content.load_html(self.html, 'file://' + service_locator.ServiceLocator.get_base_path())
 
     def on_mouse_click(self, web_view, click_event):
         if click_event.type == Gdk.EventType.DOUBLE_BUTTON_PRESS:
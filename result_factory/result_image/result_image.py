@@ -20,33 +20,39 @@ import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, GLib, Gio, GdkPixbuf
 
-import base64
-import nbformat
-
 from result_factory.result import Result
 
 
 class ResultImage(Result):
     
-    def __init__(self, image_base64):
+    def __init__(self, image_data):
+        ''' image_data is the decoded png, shared with the Output it shows,
+            not copied. '''
+
         Result.__init__(self)
 
         self.get_style_context().add_class('resultimageview')
 
-        self.image_base64 = image_base64
-        image_bytes = GLib.Bytes(base64.b64decode(self.image_base64))
-        image_stream = Gio.MemoryInputStream.new_from_bytes(image_bytes)
-        self.pixbuf = GdkPixbuf.Pixbuf.new_from_stream(image_stream)
+        self.image_data = image_data
+        self.pixbuf = self.get_pixbuf(image_data)
 
         self.image = Gtk.Image.new_from_pixbuf(self.pixbuf)
         self.centerbox.set_center_widget(self.image)
         self.show_all()
 
-    def export_nbformat(self):
-        return nbformat.v4.new_output(
-            output_type='execute_result',
-            data={'image/png': self.image_base64},
-            execution_count=0
-        )
+    def get_pixbuf(self, image_data):
+
+        # GLib.Bytes takes bytes, a memoryview would go element by element
+        if not isinstance(image_data, bytes):
+            image_data = bytes(image_data)
+        image_bytes = GLib.Bytes(image_data)
+        image_stream = Gio.MemoryInputStream.new_from_bytes(image_bytes)
+        return GdkPixbuf.Pixbuf.new_from_stream(image_stream)
+
+    def update_data(self, data):
+        if data['image/png'] is not self.image_data and data['image/png'] != self.image_data:
+            self.image_data = data['image/png']
+            self.pixbuf = self.get_pixbuf(self.image_data)
+            self.image.set_from_pixbuf(self.pixbuf)
 
 
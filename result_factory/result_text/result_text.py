@@ -21,8 +21,6 @@ from gi.repository import Gtk, GLib, Pango
 
 from result_factory.result import Result
 
-import nbformat
-
 
 class ResultText(Result):
     
@@ -66,11 +64,8 @@ class ResultText(Result):
     def get_text(self):
         return self.result_text
 
-    def export_nbformat(self):
-        return nbformat.v4.new_output(
-            output_type='execute_result',
-            data={'text/plain': self.result_text},
-            execution_count=0
-        )
+    def update_data(self, data):
+        self.result_text = data['text/plain'].rstrip()
+        self.set_text(self.result_text)
 
 
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# coding: utf-8
+
+# Copyright (C) 2017, 2018 Robert Griesel
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>
+
+import os.path
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)) + '/..')
+
+from notebook.backend.execution_stats import ExecutionStats
+from notebook.backend.kernel import Query
+
+
+class ExecutionStatsTest(unittest.TestCase):
+
+    def run_query(self, stats):
+        ''' timestamps of a query as the kernel sets them, then handed to
+            stats when it goes idle. '''
+
+        query = Query(None, 'print(1)')
+        for name in ['enqueued', 'sent', 'execute_input', 'first_output', 'idle']:
+            query.set_timestamp(name)
+        stats.add_query(query)
+        return query
+
+    def get_count(self, stats, phase):
+        return sum(count for bucket, count in stats.get_histograms()[phase])
+
+    def test_rendering_after_idle(self):
+        ''' widgets are built and shown after the query went idle. '''
+
+        stats = ExecutionStats()
+        query = self.run_query(stats)
+        self.assertEqual(self.get_count(stats, 'rendering'), 0)
+
+        query.set_timestamp('result_built')
+        query.set_timestamp('revealed')
+        self.assertEqual(self.get_count(stats, 'delivery'), 1)
+        self.assertEqual(self.get_count(stats, 'rendering'), 1)
+        self.assertEqual(self.get_count(stats, 'total'), 1)
+
+    def test_timestamps_counted_once(self):
+        stats = ExecutionStats()
+        query = Query(None, 'print(1)')
+        for name in ['enqueued', 'sent', 'execute_input', 'first_output', 'result_built', 'revealed', 'idle']:
+            query.set_timestamp(name)
+        stats.add_query(query)
+        query.set_timestamp('revealed')
+        self.assertEqual(self.get_count(stats, 'rendering'), 1)
+        self.assertEqual(len(stats.get_phase_durations(query)), len(stats.phases))
+
+
+if __name__ == '__main__':
+    unittest.main()
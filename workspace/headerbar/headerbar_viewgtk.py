@@ -115,10 +115,22 @@ class HeaderBarRight(Gtk.HeaderBar):
         self.options_menu = Gio.Menu()
 
         kernel_section = Gio.Menu()
+        item = Gio.MenuItem.new('Re-run Stale Cells', 'win.evaluate_stale_cells')
+        kernel_section.append_item(item)
+        item = Gio.MenuItem.new('Cache Output of Active Cell', 'win.toggle_cache_output')
+        kernel_section.append_item(item)
         item = Gio.MenuItem.new('Restart Language Kernel', 'win.restart_kernel')
         kernel_section.append_item(item)
         self.change_kernel_menu = Gio.Menu()
         kernel_section.append_submenu('Change Language', self.change_kernel_menu)
+        item = Gio.MenuItem.new('Save Kernel Namespace', 'win.snapshot_namespace')
+        kernel_section.append_item(item)
+        item = Gio.MenuItem.new('Restore Kernel Namespace', 'win.restore_namespace')
+        kernel_section.append_item(item)
+        item = Gio.MenuItem.new('Export Execution Trace ...', 'win.export_execution_trace')
+        kernel_section.append_item(item)
+        item = Gio.MenuItem.new('Export Main Loop Stalls ...', 'win.export_stalls')
+        kernel_section.append_item(item)
 
         save_section = Gio.Menu()
         item = Gio.MenuItem.new('Save As ...', 'win.save_as')
@@ -51,6 +51,10 @@ class Shortcuts(object):
         self.accel_group.connect(Gdk.keyval_from_name('Return'), c_mask, flags, self.shortcut_eval_go_next)
         self.accel_group.connect(Gdk.keyval_from_name('Return'), m1_mask, flags, self.shortcut_add_codecell_below)
         self.accel_group.connect(Gdk.keyval_from_name('Return'), m1_mask | s_mask, flags, self.shortcut_eval_add)
+        self.accel_group.connect(Gdk.keyval_from_name('Return'), c_mask | s_mask, flags, self.shortcut_eval_all)
+        self.accel_group.connect(Gdk.keyval_from_name('Up'), c_mask | s_mask, flags, self.shortcut_eval_above)
+        self.accel_group.connect(Gdk.keyval_from_name('Down'), c_mask | s_mask, flags, self.shortcut_eval_below)
+        self.accel_group.connect(Gdk.keyval_from_name('Return'), c_mask | m1_mask, flags, self.shortcut_eval_stale)
         self.accel_group.connect(Gdk.keyval_from_name('m'), c_mask, flags, self.shortcut_add_markdown_cell)
         self.accel_group.connect(Gdk.keyval_from_name('h'), c_mask, flags, self.shortcut_stop_computation)
         self.accel_group.connect(Gdk.keyval_from_name('Up'), c_mask, flags, self.shortcut_move_cell_up)
@@ -104,6 +108,26 @@ class Shortcuts(object):
             self.workspace.active_notebook.add_codecell_below_active_cell()
         return True
 
+    def shortcut_eval_all(self, accel_group=None, window=None, key=None, mask=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.evaluate_all_cells()
+        return True
+
+    def shortcut_eval_above(self, accel_group=None, window=None, key=None, mask=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.evaluate_cells_above_active_cell()
+        return True
+
+    def shortcut_eval_below(self, accel_group=None, window=None, key=None, mask=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.evaluate_cells_below_active_cell()
+        return True
+
+    def shortcut_eval_stale(self, accel_group=None, window=None, key=None, mask=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.evaluate_stale_cells()
+        return True
+
     def shortcut_add_markdown_cell(self, accel_group=None, window=None, key=None, mask=None):
         if self.workspace.active_notebook != None:
             self.workspace.active_notebook.add_markdowncell_below_active_cell()
@@ -46,6 +46,10 @@ class Workspace(Observable):
 
         self.set_pretty_print(self.settings.get_value('preferences', 'pretty_print'))
 
+        self.kernel_pool = ServiceLocator.get_kernel_pool()
+        self.kernel_pool.update_ranking(self.recently_opened_notebooks.items.values())
+        ServiceLocator.get_detached_kernels().collect_garbage()
+
     def change_notification(self, change_code, notifying_object, parameter):
 
         if change_code == 'save_state_change' and parameter == 'saved':
@@ -69,6 +73,7 @@ class Workspace(Observable):
         self.open_notebooks_list.add_item_by_notebook(notebook)
         item = {'pathname': notebook.pathname, 'kernelname': notebook.kernelname, 'date': notebook.get_last_saved()}
         self.recently_opened_notebooks.add_item(item)
+        self.kernel_pool.update_ranking(self.recently_opened_notebooks.items.values())
         self.add_change_code('new_notebook', notebook)
         notebook.register_observer(self)
 
@@ -138,8 +143,26 @@ class Workspace(Observable):
     def set_pretty_print(self, value):
         self.add_change_code('set_pretty_print', value)
 
-    def shutdown_all_kernels(self):
+    def get_number_of_detachable_kernels(self):
+        return len([notebook for notebook in self.open_notebooks if notebook.has_detachable_kernel()])
+
+    def shutdown_all_kernels(self, detach=False):
+        ''' shut down all kernels at once in the kernel loop. blocks for at
+            most shutdown_timeout seconds plus the time needed to kill what's
+            left. with detach, detachable kernels are left running. '''
+
+        kernels = self.kernel_pool.take_kernels()
+        detach_futures = list()
         for notebook in self.open_notebooks:
-            notebook.shutdown_kernel_now()
+            kernel = notebook.take_kernel()
+            if kernel == None: continue
+            if detach and kernel.connection_file != None:
+                detach_futures.append(kernel.detach())
+            else:
+                kernels.append(kernel)
+        future = ServiceLocator.get_kernel_loop().shutdown_kernels(kernels, self.settings.get_value('preferences', 'kernel_shutdown_timeout'))
+        for detach_future in detach_futures:
+            detach_future.result()
+        future.result()
 
 
@@ -21,6 +21,7 @@ from gi.repository import GLib
 
 from app.service_locator import ServiceLocator
 import notebook.notebook as model_notebook
+import notebook.backend.execution_stats as execution_stats
 
 import os.path
 
@@ -38,8 +39,14 @@ class WorkspaceController(object):
         self.main_window.show_shortcuts_window_action.connect('activate', self.show_shortcuts_window)
         self.main_window.sidebar.connect('size-allocate', self.on_sidebar_size_allocate)
 
+        self.main_window.evaluate_stale_cells_action.connect('activate', self.on_evaluate_stale_cells_action)
+        self.main_window.toggle_cache_output_action.connect('activate', self.on_toggle_cache_output_action)
         self.main_window.restart_kernel_action.connect('activate', self.on_restart_kernel_action)
         self.main_window.change_kernel_action.connect('activate', self.on_change_kernel_action)
+        self.main_window.snapshot_namespace_action.connect('activate', self.on_snapshot_namespace_action)
+        self.main_window.restore_namespace_action.connect('activate', self.on_restore_namespace_action)
+        self.main_window.export_execution_trace_action.connect('activate', self.on_export_execution_trace_action)
+        self.main_window.export_stalls_action.connect('activate', self.on_export_stalls_action)
         self.main_window.save_all_action.connect('activate', self.on_save_all_action)
         self.main_window.save_as_action.connect('activate', self.on_save_as_action)
         self.main_window.delete_action.connect('activate', self.on_delete_action)
@@ -49,6 +56,7 @@ class WorkspaceController(object):
         self.main_window.create_action.connect('activate', self.on_create_action)
 
         self.settings.register_observer(self)
+        self.update_watchdog()
 
     def change_notification(self, change_code, notifying_object, parameter):
 
@@ -56,6 +64,14 @@ class WorkspaceController(object):
             section, item, value = parameter
             if (section, item) == ('preferences', 'pretty_print'):
                 self.workspace.set_pretty_print(self.settings.get_value('preferences', 'pretty_print'))
+            if (section, item) == ('preferences', 'stall_watchdog'):
+                self.update_watchdog()
+
+    def update_watchdog(self):
+        if self.settings.get_value('preferences', 'stall_watchdog'):
+            ServiceLocator.get_watchdog().start()
+        elif ServiceLocator.watchdog != None:
+            ServiceLocator.watchdog.stop()
 
     def on_sidebar_size_allocate(self, paned, paned_size):
         self.workspace.sidebar_position = self.main_window.paned.get_position()
@@ -64,21 +80,37 @@ class WorkspaceController(object):
         if pathname == None:
             pathname = ServiceLocator.get_dialog('open_notebook').run()
         if pathname != None:
-            notebook = self.workspace.get_notebook_by_pathname(pathname)
-            if notebook == None:
-                if pathname.split('.')[-1] == 'ipynb':
-                    notebook = model_notebook.Notebook(pathname)
-                    try:
-                        notebook.load_from_disk()
-                    except FileNotFoundError:
-                        notebook = None
-                    except model_notebook.KernelMissing as e:
-                        ServiceLocator.get_dialog('kernel_missing').run(str(e))
-                    else:
-                        self.workspace.add_notebook(notebook)
-                        self.workspace.set_active_notebook(notebook)
+            is_open = self.workspace.get_notebook_by_pathname(pathname) != None
+            try:
+                notebook = self.open_notebook(pathname)
+            except FileNotFoundError:
+                pass
+            except model_notebook.KernelMissing as e:
+                ServiceLocator.get_dialog('kernel_missing').run(str(e))
             else:
-                self.workspace.set_active_notebook(notebook)
+                if notebook != None and not is_open:
+                    self.offer_namespace_restore(notebook)
+
+    def offer_namespace_restore(self, notebook):
+        ''' only on opening, a restarted kernel starts out empty. '''
+
+        if self.settings.get_value('preferences', 'restore_namespace_on_start') and notebook.can_restore_namespace():
+            if ServiceLocator.get_dialog('restore_namespace').run(notebook.get_name()):
+                notebook.restore_namespace()
+
+    def open_notebook(self, pathname):
+        ''' open pathname or activate it if it's open already. returns the
+            notebook, None if pathname is no notebook. raises
+            FileNotFoundError and KernelMissing. '''
+
+        notebook = self.workspace.get_notebook_by_pathname(pathname)
+        if notebook == None:
+            if pathname.split('.')[-1] != 'ipynb': return None
+            notebook = model_notebook.Notebook(pathname)
+            notebook.load_from_disk()
+            self.workspace.add_notebook(notebook)
+        self.workspace.set_active_notebook(notebook)
+        return notebook
 
     def on_create_action(self, action=None, parameter=None):
         parameters = ServiceLocator.get_dialog('create_notebook').run()
@@ -94,6 +126,14 @@ class WorkspaceController(object):
             self.workspace.add_notebook(notebook)
             self.workspace.set_active_notebook(notebook)
 
+    def on_evaluate_stale_cells_action(self, action=None, parameter=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.evaluate_stale_cells()
+
+    def on_toggle_cache_output_action(self, action=None, parameter=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.toggle_cache_output_of_active_cell()
+
     def on_restart_kernel_action(self, action=None, parameter=None):
         if self.workspace.active_notebook != None:
             self.workspace.active_notebook.restart_kernel()
@@ -106,6 +146,28 @@ class WorkspaceController(object):
                 notebook.set_kernelname(parameter.get_string())
                 notebook.restart_kernel()
 
+    def on_snapshot_namespace_action(self, action=None, parameter=None):
+        if self.workspace.active_notebook != None:
+            self.workspace.active_notebook.snapshot_namespace()
+
+    def on_restore_namespace_action(self, action=None, parameter=None):
+        notebook = self.workspace.active_notebook
+        if notebook != None and notebook.has_namespace_snapshot():
+            notebook.restore_namespace()
+
+    def on_export_execution_trace_action(self, action=None, parameter=None):
+        pathname = ServiceLocator.get_dialog('export_trace').run()
+        if pathname != None:
+            stats_by_name = dict()
+            for notebook in self.workspace.open_notebooks:
+                stats_by_name[notebook.get_pathname()] = notebook.get_execution_stats()
+            execution_stats.write_chrome_trace(pathname, stats_by_name)
+
+    def on_export_stalls_action(self, action=None, parameter=None):
+        pathname = ServiceLocator.get_dialog('export_stalls').run()
+        if pathname != None:
+            ServiceLocator.get_watchdog().write_stalls(pathname)
+
     def on_save_as_action(self, action=None, parameter=None):
         notebook = self.workspace.get_active_notebook()
         if notebook != None:
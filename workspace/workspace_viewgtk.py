@@ -71,6 +71,12 @@ class MainWindow(Gtk.ApplicationWindow):
         self.style_context.add_provider_for_screen(self.get_screen(), self.css_provider, Gtk.STYLE_PROVIDER_PRIORITY_USER)
 
         # actions
+        self.evaluate_stale_cells_action = Gio.SimpleAction.new('evaluate_stale_cells', None)
+        self.add_action(self.evaluate_stale_cells_action)
+
+        self.toggle_cache_output_action = Gio.SimpleAction.new('toggle_cache_output', None)
+        self.add_action(self.toggle_cache_output_action)
+
         self.restart_kernel_action = Gio.SimpleAction.new('restart_kernel', None)
         self.add_action(self.restart_kernel_action)
 
@@ -78,6 +84,18 @@ class MainWindow(Gtk.ApplicationWindow):
         self.change_kernel_action = Gio.SimpleAction.new_stateful('change_kernel', GLib.VariantType('s'), default)
         self.add_action(self.change_kernel_action)
 
+        self.snapshot_namespace_action = Gio.SimpleAction.new('snapshot_namespace', None)
+        self.add_action(self.snapshot_namespace_action)
+
+        self.restore_namespace_action = Gio.SimpleAction.new('restore_namespace', None)
+        self.add_action(self.restore_namespace_action)
+
+        self.export_execution_trace_action = Gio.SimpleAction.new('export_execution_trace', None)
+        self.add_action(self.export_execution_trace_action)
+
+        self.export_stalls_action = Gio.SimpleAction.new('export_stalls', None)
+        self.add_action(self.export_stalls_action)
+
         self.delete_action = Gio.SimpleAction.new('delete', None)
         self.add_action(self.delete_action)
 